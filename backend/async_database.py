@@ -0,0 +1,121 @@
+"""
+Awaitable DynamoDB calls on aioboto3, for the API's latency-sensitive paths.
+
+With DB_ASYNC=true and aioboto3 installed (pip install ".[async]"), /solve
+saves and GET /solution and solution-cache reads await DynamoDB on the
+event loop instead of taking a thread from the I/O pool. Requests are
+built, and items encoded and decoded, by the same code as DynamoDBManager's,
+so both managers read and write the same format. Work that still needs
+boto3 or much CPU runs in a thread: listings, deletes, reads and writes of
+solutions too large to store in one item, and decoding all but small
+payloads.
+"""
+
+from contextlib import AsyncExitStack
+from typing import Dict, List, Optional
+import asyncio
+
+from database import (DynamoDBManager, client_kwargs, first_item, hash_query, inline_payload_size, solution_read,
+                      unexpired)
+from metrics import instrument_client
+from storage import INLINE_VESSEL_LIMIT, solution_fields
+
+try:
+    import aioboto3
+except ImportError:  # Optional dependency
+    aioboto3 = None
+
+# Largest payload (bytes, compressed) decoded on the event loop; larger ones are decoded in a thread
+DECODE_INLINE_LIMIT = 16_384
+
+
+class AsyncDynamoDBManager:
+    """DynamoDB point reads and writes awaited on the event loop."""
+
+    def __init__(self, manager: DynamoDBManager):
+        """
+        Initialize the manager. Call open() before use.
+
+        Args:
+            manager: Synchronous manager whose table, region and endpoint
+                are used, and which handles items it cannot
+        """
+        if aioboto3 is None:
+            raise RuntimeError("DB_ASYNC needs aioboto3; install it with pip install \".[async]\"")
+        self.manager = manager
+        self.table = None
+        self._stack: Optional[AsyncExitStack] = None
+
+    async def open(self):
+        """Create the client; its connection pool uses the same settings as the boto3 client."""
+        kwargs = client_kwargs(self.manager.region, self.manager.endpoint_url)
+        self._stack = AsyncExitStack()
+        resource = await self._stack.enter_async_context(aioboto3.Session().resource('dynamodb', **kwargs))
+        instrument_client(resource.meta.client)
+        self.table = await resource.Table(self.manager.table_name)
+
+    async def close(self):
+        if self._stack is not None:
+            await self._stack.aclose()
+            self._stack = None
+            self.table = None
+
+    async def save_solution(self, problem_id: str, solution_data: Dict) -> bool:
+        """
+        Save a scheduling solution (see DynamoDBManager.save_solution).
+
+        Returns:
+            True if successful
+        """
+        if len(solution_data.get('schedule', {})) > INLINE_VESSEL_LIMIT:
+            # Slow to encode, and the segments may go to the blob bucket
+            return await asyncio.to_thread(self.manager.save_solution, problem_id, solution_data)
+        try:
+            *chunks, item = self.manager.solution_items(problem_id, solution_data)
+            if chunks:
+                async with self.table.batch_writer() as batch:
+                    for chunk in chunks:
+                        await batch.put_item(Item=chunk)
+            await self.table.put_item(Item=item)
+            return True
+        except Exception as e:
+            print(f"Error saving solution: {e}")
+            return False
+
+    async def get_solution(self, problem_id: str, timestamp: Optional[str] = None,
+                           fields: Optional[List[str]] = None, berth: Optional[int] = None,
+                           vessel: Optional[str] = None, as_of: Optional[str] = None) -> Optional[Dict]:
+        """
+        Retrieve a solution (see DynamoDBManager.get_solution).
+
+        Raises:
+            ValueError: If fields contains an unknown name
+        """
+        fields = solution_fields(fields)
+        summary_only = 'schedule' not in fields and 'vessels' not in fields
+        method, kwargs = solution_read(problem_id, timestamp, as_of, summary_only)
+
+        try:
+            item = unexpired(first_item(await getattr(self.table, method)(**kwargs)))
+            if item is None or summary_only:
+                return item
+
+            size = inline_payload_size(item)
+            if size is not None and size <= DECODE_INLINE_LIMIT:
+                return self.manager.decode_payload(item, berth, vessel, fields)
+            # Segment reads block, and large payloads take long to decompress
+            return await asyncio.to_thread(self.manager.decode_payload, item, berth, vessel, fields)
+        except Exception as e:
+            print(f"Error retrieving solution: {e}")
+            return None
+
+    async def find_solution_by_hash(self, problem_hash: str) -> Optional[Dict]:
+        """Retrieve the most recent solution saved for a problem hash (see DynamoDBManager)."""
+        try:
+            item = first_item(await self.table.query(**hash_query(problem_hash)))
+            if item is None:
+                return None
+            return await self.get_solution(item['problem_id'], item['timestamp'])
+        except Exception as e:
+            print(f"Error looking up solution by hash: {e}")
+            return None
@@ -0,0 +1,210 @@
+"""
+Berth capabilities, vessel sizes and berth closures.
+
+With a berth list (BerthSchedulingProblem.berths), a vessel may only use
+berths long and deep enough for it, and no vessel may be at a berth during
+one of its closures. Both checks are precomputed so they stay cheap inside
+the solvers' inner loops:
+
+- compatibility: each vessel gets a bitset of the berths it fits, computed
+  once per distinct (length, draft), so a check is a shift and a mask
+- closures: each berth keeps its closures merged and sorted, and the
+  earliest start clear of them is found with bisect plus a skip over the
+  closures actually in the way
+
+The heuristic picks a vessel's berth with BerthQueue, which keeps one heap
+per class of identical berths, so it looks at the compatible classes rather
+than rescanning every berth.
+"""
+
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+import heapq
+import math
+
+
+class ClosureIndex:
+    """Merged, sorted closure intervals [start, end) of one berth."""
+
+    def __init__(self, closures: Sequence[Tuple[int, int]]):
+        merged: List[List[int]] = []
+        for start, end in sorted((int(s), int(e)) for s, e in closures if e > s):
+            if merged and start < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def __bool__(self) -> bool:
+        return bool(self.starts)
+
+    def earliest_start(self, ready: int, duration: int) -> int:
+        """Earliest t >= ready such that [t, t + duration) meets no closure."""
+        k = bisect_right(self.ends, ready)
+        t = ready
+        while k < len(self.starts) and self.starts[k] < t + duration:
+            t = max(t, self.ends[k])
+            k += 1
+        return t
+
+
+def _fits(length: Optional[float], draft: Optional[float], berth) -> bool:
+    if length is not None and berth.max_length is not None and length > berth.max_length:
+        return False
+    if draft is not None and berth.max_draft is not None and draft > berth.max_draft:
+        return False
+    return True
+
+
+def _size(value) -> Optional[float]:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return float(value)
+
+
+class BerthModel:
+    """
+    Compatibility bitsets and closure indexes for one problem.
+
+    Vessels are referred to by their position in the lengths/drafts
+    sequences given to the constructor.
+    """
+
+    def __init__(self, berths: Sequence, lengths: Optional[Sequence] = None, drafts: Optional[Sequence] = None,
+                 vessel_ids: Optional[Sequence[str]] = None):
+        """
+        Args:
+            berths: BerthData (or objects with max_length, max_draft and
+                closures), one per berth
+            lengths: Length of each vessel, None or NaN when unknown
+            drafts: Draft of each vessel, None or NaN when unknown
+            vessel_ids: Optional vessel identifiers, only used in error messages
+
+        Raises:
+            ValueError: If a vessel fits no berth
+        """
+        self.num_berths = len(berths)
+        self.closures = [ClosureIndex(berth.closures or ()) for berth in berths]
+        self.has_closures = any(self.closures)
+        # Berths with the same limits and closures are interchangeable
+        signatures: Dict[tuple, int] = {}
+        self.berth_class = [
+            signatures.setdefault((berth.max_length, berth.max_draft, tuple(self.closures[b].starts),
+                                   tuple(self.closures[b].ends)), len(signatures))
+            for b, berth in enumerate(berths)
+        ]
+        self.num_classes = len(signatures)
+
+        count = len(lengths) if lengths is not None else len(drafts) if drafts is not None else 0
+        lengths = list(lengths) if lengths is not None else [None] * count
+        drafts = list(drafts) if drafts is not None else [None] * count
+        cache: Dict[Tuple, int] = {}
+        self.masks: List[int] = []
+        for index, (length, draft) in enumerate(zip(lengths, drafts)):
+            key = (_size(length), _size(draft))
+            mask = cache.get(key)
+            if mask is None:
+                mask = sum(1 << b for b, berth in enumerate(berths) if _fits(key[0], key[1], berth))
+                cache[key] = mask
+            if not mask:
+                vessel_id = vessel_ids[index] if vessel_ids is not None else f"at index {index}"
+                raise ValueError(f"Vessel {vessel_id} fits no berth")
+            self.masks.append(mask)
+        self.restricts = any(mask != (1 << self.num_berths) - 1 for mask in cache.values())
+
+    @classmethod
+    def from_problem(cls, problem, vessels: Optional[Sequence] = None) -> Optional['BerthModel']:
+        """
+        Model for a BerthSchedulingProblem, or None when its berths are identical and always open.
+
+        Vessels default to problem.vessels; pass them in another order (e.g.
+        sorted by arrival) to index the bitsets the same way.
+
+        Raises:
+            ValueError: If the berth list does not match num_berths, or a
+                vessel fits no berth
+        """
+        if problem.berths is None:
+            return None
+        if len(problem.berths) != problem.num_berths:
+            raise ValueError(f"berths must describe all {problem.num_berths} berths")
+        vessels = problem.vessels if vessels is None else vessels
+        model = cls(problem.berths, [v.length for v in vessels], [v.draft for v in vessels],
+                    [v.vessel_id for v in vessels])
+        return model if model.restricts or model.has_closures else None
+
+    def fits(self, vessel: int, berth: int) -> bool:
+        """Whether a vessel may use a berth."""
+        return bool(self.masks[vessel] >> berth & 1)
+
+    def start(self, berth: int, ready: int, duration: int) -> int:
+        """Earliest start at or after ready that avoids the berth's closures."""
+        closures = self.closures[berth]
+        return closures.earliest_start(ready, duration) if closures else ready
+
+
+class BerthQueue:
+    """
+    Earliest feasible berth for each vessel under a BerthModel.
+
+    Among the berths a vessel fits, picks the one with the earliest start
+    (closures included), then the earliest free, then the lowest index: the
+    same (start, available_time, berth) order as BerthAvailability when
+    every berth is identical and open. Each class of identical berths keeps
+    a heap of (available_time, berth); only the compatible classes are
+    visited, and within a class only berths that could still start earlier.
+    """
+
+    def __init__(self, model: BerthModel, available: Optional[Sequence[int]] = None):
+        self.model = model
+        available = available if available is not None else [0] * model.num_berths
+        self._heaps: List[List[Tuple[int, int]]] = [[] for _ in range(model.num_classes)]
+        self._class_masks = [0] * model.num_classes
+        for berth in range(model.num_berths):
+            cls = model.berth_class[berth]
+            self._heaps[cls].append((available[berth], berth))
+            self._class_masks[cls] |= 1 << berth
+        for heap in self._heaps:
+            heapq.heapify(heap)
+        # Classes a vessel's bitset allows, cached per bitset
+        self._classes: Dict[int, List[int]] = {}
+
+    def _compatible_classes(self, mask: int) -> List[int]:
+        classes = self._classes.get(mask)
+        if classes is None:
+            classes = [cls for cls, berths in enumerate(self._class_masks) if berths & mask]
+            self._classes[mask] = classes
+        return classes
+
+    def place(self, vessel: int, arrival: int, processing: int) -> Tuple[int, int]:
+        """
+        Choose a berth for a vessel and occupy it.
+
+        Returns:
+            (berth, start_time)
+        """
+        model = self.model
+        best = None
+        visited = []
+        for cls in self._compatible_classes(model.masks[vessel]):
+            heap = self._heaps[cls]
+            popped = []
+            # Heaps pop in (available_time, berth) order, so (ready,
+            # available_time, berth) only grows and bounds the remaining keys
+            while heap:
+                available_time, berth = heap[0]
+                ready = max(arrival, available_time)
+                if best is not None and (ready, available_time, berth) >= best:
+                    break
+                popped.append(heapq.heappop(heap))
+                candidate = (model.start(berth, ready, processing), available_time, berth)
+                if best is None or candidate < best:
+                    best = candidate
+            visited.append((heap, popped))
+
+        start, available_time, berth = best
+        for heap, popped in visited:
+            for entry in popped:
+                heapq.heappush(heap, (start + processing, berth) if entry == (available_time, berth) else entry)
+        return berth, start
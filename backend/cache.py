@@ -0,0 +1,133 @@
+"""
+Content-addressed cache of solved problems.
+
+A problem is identified by a canonical hash of its vessels (sorted, so input
+order does not matter), planning horizon, number of berths and solver
+options. Repeated submissions of the same problem are answered from an
+in-memory LRU without running the solver or writing a new item. An entry
+may also keep the solution's encoded response body, so a hit is answered
+without encoding it again.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def problem_hash(vessels: Iterable[Tuple], planning_horizon: int, num_berths: int,
+                 solver: str = "heuristic", time_limit: Optional[float] = None,
+                 window: Optional[int] = None, window_overlap: Optional[int] = None,
+                 berths: Optional[List[Dict]] = None) -> str:
+    """
+    Canonical SHA-256 hash of a scheduling problem.
+
+    Args:
+        vessels: (vessel_id, arrival_time, processing_time) tuples in any
+            order, optionally followed by more fields such as length and draft
+        planning_horizon: Planning horizon
+        num_berths: Number of berths
+        solver: Solver name
+        time_limit: Solver time limit; ignored for the heuristic, whose
+            result does not depend on it
+        window: Rolling-horizon window, if any
+        window_overlap: Rolling-horizon window overlap
+        berths: Berth limits and closures, if any
+
+    Returns:
+        Hex digest
+    """
+    canonical = {
+        'vessels': sorted([str(v), int(a), int(p), *rest] for v, a, p, *rest in vessels),
+        'planning_horizon': planning_horizon,
+        'num_berths': num_berths,
+        'solver': solver,
+        'time_limit': None if solver == "heuristic" else time_limit
+    }
+    if window is not None:
+        canonical['window'] = [window, window_overlap]
+    if berths is not None:
+        canonical['berths'] = berths
+    encoded = json.dumps(canonical, separators=(',', ':'), sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class SolutionCache:
+    """Thread-safe LRU of solved problems with a time-to-live."""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached problems (defaults to env
+                SOLUTION_CACHE_SIZE or 1024); 0 disables the cache
+            ttl: Seconds an entry stays valid (defaults to env
+                SOLUTION_CACHE_TTL or 3600)
+        """
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('SOLUTION_CACHE_SIZE', 1024))
+        self.ttl = ttl if ttl is not None else float(os.getenv('SOLUTION_CACHE_TTL', 3600))
+        self._entries: OrderedDict = OrderedDict()
+        self._by_problem: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached solution for key, or None if missing or expired."""
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Dict, Optional[bytes]]]:
+        """Return the cached (solution, encoded body or None) for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, solution, body = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return solution, body
+
+    def put(self, key: str, solution: Dict, body: Optional[bytes] = None):
+        """
+        Cache a solution (a dict with a problem_id), evicting the least recently used.
+
+        Args:
+            key: Problem hash
+            solution: Solution dict
+            body: The solution encoded as a JSON response body, if already encoded
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, solution, body)
+            self._by_problem[solution['problem_id']] = key
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_problem(self, problem_id: str):
+        """Drop the entry for a problem_id, e.g. after its solution is deleted."""
+        with self._lock:
+            key = self._by_problem.get(problem_id)
+            if key is not None:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_problem.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        """Remove an entry. Caller holds the lock."""
+        _, solution, _ = self._entries.pop(key)
+        if self._by_problem.get(solution['problem_id']) == key:
+            del self._by_problem[solution['problem_id']]
@@ -0,0 +1,135 @@
+"""
+gzip and brotli compression of API responses.
+
+JSON and text responses of at least COMPRESSION_MIN_SIZE bytes are
+compressed with the client's preferred encoding from Accept-Encoding:
+brotli when the brotli package is installed (pip install ".[compression]"),
+otherwise gzip. Streamed responses are passed through as they are.
+
+An ETag names one representation, so the middleware gives a compressed
+response its own tag (the ETag with -br or -gzip appended) and strips the
+suffix from If-None-Match before the request reaches the routes, which
+therefore only deal with the tags of uncompressed bodies. Responses
+carrying an ETag are compressed whatever their size, so a 304 can tell
+which tag the full response would have had.
+"""
+
+from typing import Optional
+import asyncio
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+# Server preference, best first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+# 4 to 5 suits responses compressed on every request; 11 is for static files
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+# Larger bodies are compressed in a thread, off the event loop
+THREAD_SIZE = 1 << 18
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The supported encoding the client prefers, from an Accept-Encoding value, or None."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            accepted[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body; the output depends on the body alone, so its ETag stays valid."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The ETag of a representation compressed with encoding."""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses responses and keeps their ETags per encoding."""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else MIN_SIZE
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is not None:
+            # Routes compare If-None-Match with the tags of uncompressed bodies
+            suffix = f'-{encoding}"'.encode('latin-1')
+            scope = {**scope, 'headers': [
+                (name, value.replace(suffix, b'"') if name == b'if-none-match' else value)
+                for name, value in scope['headers']
+            ]}
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if start is None or message['type'] != 'http.response.body':
+                await send(message)
+                return
+            response_start, start = start, None
+            if message.get('more_body', False):
+                # Streamed (e.g. server-sent events): not buffered
+                await send(response_start)
+                await send(message)
+                return
+            await self._send_whole(send, response_start, message.get('body', b''), encoding)
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _send_whole(self, send, start, body: bytes, encoding: Optional[str]):
+        headers = MutableHeaders(raw=list(start.get('headers', [])))
+        etag = headers.get('etag')
+        if start['status'] == 304:
+            if etag is not None:
+                headers.add_vary_header('Accept-Encoding')
+                if encoding is not None:
+                    headers['etag'] = encoded_etag(etag, encoding)
+        elif headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES) and 'content-encoding' not in headers:
+            headers.add_vary_header('Accept-Encoding')
+            if encoding is not None and (len(body) >= self.minimum_size or etag is not None):
+                if len(body) >= THREAD_SIZE:
+                    body = await asyncio.to_thread(compress, body, encoding)
+                else:
+                    body = compress(body, encoding)
+                headers['content-encoding'] = encoding
+                headers['content-length'] = str(len(body))
+                if etag is not None:
+                    headers['etag'] = encoded_etag(etag, encoding)
+        await send({**start, 'headers': headers.raw})
+        await send({'type': 'http.response.body', 'body': body})
@@ -1,14 +1,118 @@
 """
 Database operations for DynamoDB.
+
+All threads share one low-level DynamoDB client, which is thread-safe and
+owns the HTTP connection pool. boto3 resources are not thread-safe, so each
+thread gets its own Table resource built on that client (see
+DynamoDBManager.table). The pool size, timeouts and retry mode are set
+with DB_MAX_POOL_CONNECTIONS, DB_CONNECT_TIMEOUT, DB_READ_TIMEOUT,
+DB_MAX_ATTEMPTS and DB_RETRY_MODE.
 """
 
 import boto3
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.config import Config
+import base64
+import binascii
 import os
 import json
-from typing import Dict, List, Optional
-from datetime import datetime, timezone
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from metrics import instrument_client
+from storage import (INLINE_VESSEL_LIMIT, SOLUTION_FIELDS, SUMMARY_FIELDS, VERSION_FIELDS, SolutionStorage, expires_at,
+                     solution_fields, solution_view, summary_item)
+from storage_format import (decode_segment, decode_solution, encode_segments, encode_solution,
+                            join_segments, vessel_bucket)
+
+# Global secondary index on the canonical problem hash (see cache.problem_hash)
+PROBLEM_HASH_INDEX = 'problem_hash-index'
+# Global secondary index listing all solutions newest first. Every item has the
+# same record_type, so one partition holds the whole listing sorted by timestamp.
+RECENT_INDEX = 'recent-index'
+RECORD_TYPE = 'solution'
+# Largest compressed payload stored in one item, keeping every item under
+# DynamoDB's 400 KB limit
+INLINE_PAYLOAD_LIMIT = 350_000
+# Attributes copied into the listing index, enough for solution summaries
+SUMMARY_ATTRIBUTES = ['makespan', 'solving_time', 'num_vessels']
+# Item attributes describing how the payload is stored
+STORAGE_ATTRIBUTES = ('record_type', 'schedule_json', 'vessels_json', 'solution_bin', 'solution_blob',
+                      'solution_berths', 'vessel_buckets')
+# Epoch-seconds attribute DynamoDB's TTL deletes items by (see SOLUTION_RETENTION_DAYS)
+TTL_ATTRIBUTE = 'expires_at'
+# Attributes read for fields=['summary'] (with the expiry, so expired items are skipped) and for version listings
+SUMMARY_PROJECTION = ', '.join(['#ts' if field == 'timestamp' else field for field in SUMMARY_FIELDS] + [TTL_ATTRIBUTE])
+VERSION_PROJECTION = ', '.join('#ts' if field == 'timestamp' else field for field in VERSION_FIELDS)
+# Most index items a filtered listing reads per call; a filter that rarely
+# matches returns a short page and a next_token instead of reading on
+LISTING_MAX_READS = int(os.getenv('LISTING_MAX_READS', 1000))
+# Most keys per S3 DeleteObjects call
+BLOB_DELETE_BATCH = 1000
+# Attributes of the pagination cursors of the listing index and of a problem's versions
+LISTING_KEY = frozenset({'record_type', 'timestamp', 'problem_id'})
+VERSION_KEY = frozenset({'problem_id', 'timestamp'})
+
+ATTRIBUTE_DEFINITIONS = [
+    {'AttributeName': 'problem_id', 'AttributeType': 'S'},
+    {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+    {'AttributeName': 'problem_hash', 'AttributeType': 'S'},
+    {'AttributeName': 'record_type', 'AttributeType': 'S'}
+]
+
+GLOBAL_SECONDARY_INDEXES = [
+    {
+        'IndexName': PROBLEM_HASH_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'problem_hash', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'KEYS_ONLY'}
+    },
+    {
+        'IndexName': RECENT_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'record_type', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': SUMMARY_ATTRIBUTES}
+    }
+]
+
+
+def client_config() -> Config:
+    """
+    botocore settings shared by the DynamoDB and S3 clients.
+
+    The connection pool should be at least as large as the number of
+    threads making calls (DB_THREADS plus job workers and the write-behind
+    flusher), or calls wait for a free connection. Adaptive retries back
+    off client-side when DynamoDB throttles.
+    """
+    return Config(
+        max_pool_connections=int(os.getenv('DB_MAX_POOL_CONNECTIONS', 32)),
+        connect_timeout=float(os.getenv('DB_CONNECT_TIMEOUT', 2)),
+        read_timeout=float(os.getenv('DB_READ_TIMEOUT', 10)),
+        retries={'mode': os.getenv('DB_RETRY_MODE', 'adaptive'),
+                 'total_max_attempts': int(os.getenv('DB_MAX_ATTEMPTS', 5))},
+        tcp_keepalive=True
+    )
 
-class DynamoDBManager:
+
+def client_kwargs(region: str, endpoint_url: Optional[str]) -> Dict:
+    """Keyword arguments for creating a client, with LocalStack credentials when an endpoint is set."""
+    kwargs = {'region_name': region, 'config': client_config()}
+    if endpoint_url:
+        kwargs.update(
+            endpoint_url=endpoint_url,
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test')
+        )
+    return kwargs
+
+
+class DynamoDBManager(SolutionStorage):
     """Manager for DynamoDB operations."""
     
     def __init__(self, table_name: str = "berth-scheduling-solutions", 
@@ -25,22 +129,28 @@ class DynamoDBManager:
         self.region = region or os.getenv('AWS_REGION', 'us-east-1')
         self.endpoint_url = endpoint_url or os.getenv('DYNAMODB_ENDPOINT_URL', None)
         
-        # Create DynamoDB resource
-        if self.endpoint_url:
-            self.dynamodb = boto3.resource(
-                'dynamodb',
-                region_name=self.region,
-                endpoint_url=self.endpoint_url,
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'test'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'test')
-            )
-        else:
-            self.dynamodb = boto3.resource('dynamodb', region_name=self.region)
+        # One pooled client for all threads; resources are created per thread on top of it
+        self.dynamodb = boto3.resource('dynamodb', **client_kwargs(self.region, self.endpoint_url))
+        self.client = self.dynamodb.meta.client
+        self._local = threading.local()
+        # Latency, retry and error metrics for every DynamoDB call
+        instrument_client(self.client)
         
-        self.table = self.dynamodb.Table(table_name)
+        # Optional S3-compatible bucket for payloads too large to store inline
+        self.blob_bucket = os.getenv('SOLUTION_BLOB_BUCKET') or None
+        self._s3 = None
+        self._s3_lock = threading.Lock()
+    
+    @property
+    def table(self):
+        """This thread's Table resource, sharing the pooled client."""
+        table = getattr(self._local, 'table', None)
+        if table is None:
+            table = self._local.table = type(self.dynamodb)(client=self.client).Table(self.table_name)
+        return table
     
     def create_table(self):
-        """Create the DynamoDB table if it doesn't exist."""
+        """Create the DynamoDB table if it doesn't exist, and add any missing indexes."""
         try:
             table = self.dynamodb.create_table(
                 TableName=self.table_name,
@@ -48,18 +158,194 @@ class DynamoDBManager:
                     {'AttributeName': 'problem_id', 'KeyType': 'HASH'},
                     {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
                 ],
-                AttributeDefinitions=[
-                    {'AttributeName': 'problem_id', 'AttributeType': 'S'},
-                    {'AttributeName': 'timestamp', 'AttributeType': 'S'}
-                ],
+                AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+                GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
                 BillingMode='PAY_PER_REQUEST'
             )
             print(f"Created table {self.table_name}")
+            self.ensure_ttl()
             return table
         except Exception as e:
             print(f"Table creation error (may already exist): {e}")
+            self.ensure_indexes()
+            self.ensure_ttl()
             return self.table
     
+    def ensure_indexes(self):
+        """Add secondary indexes missing from an existing table (e.g. one created by init-aws.sh)."""
+        try:
+            self.table.reload()
+            existing = {index['IndexName'] for index in self.table.global_secondary_indexes or []}
+            for index in GLOBAL_SECONDARY_INDEXES:
+                if index['IndexName'] in existing:
+                    continue
+                # One index per UpdateTable call. AWS refuses a second while the
+                # first backfills; it is then added on a later start.
+                self.table.meta.client.update_table(
+                    TableName=self.table_name,
+                    AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+                    GlobalSecondaryIndexUpdates=[{'Create': index}]
+                )
+                print(f"Creating index {index['IndexName']} on {self.table_name}")
+        except Exception as e:
+            print(f"Index creation error: {e}")
+    
+    def ensure_ttl(self):
+        """Turn on TTL expiry by expires_at when a retention policy is configured."""
+        if expires_at() is None:
+            return
+        try:
+            # TTL cannot be configured while a new table is still being created
+            self.client.get_waiter('table_exists').wait(TableName=self.table_name)
+            description = self.client.describe_time_to_live(TableName=self.table_name)['TimeToLiveDescription']
+            if description.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+                return
+            self.client.update_time_to_live(
+                TableName=self.table_name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE}
+            )
+            print(f"Enabled TTL on {self.table_name}.{TTL_ATTRIBUTE}")
+        except Exception as e:
+            print(f"TTL configuration error: {e}")
+    
+    def solution_items(self, problem_id: str, solution_data: Dict) -> List[Dict]:
+        """
+        DynamoDB items for a solution: the solution item, preceded by segment
+        items when it is too large to store inline.
+        """
+        vessels = solution_data.get('vessels', [])
+        schedule = solution_data.get('schedule', {})
+        item = {**summary_item(problem_id, solution_data), 'record_type': RECORD_TYPE}
+        # Chunks expire with their solution item, so TTL never leaves a solution half deleted
+        expiry = expires_at()
+        if expiry is not None:
+            item[TTL_ATTRIBUTE] = expiry
+        
+        # Larger solutions go to segment items, or to SOLUTION_BLOB_BUCKET
+        small = len(schedule) <= INLINE_VESSEL_LIMIT
+        payload = encode_solution(schedule, vessels) if small else None
+        if payload is not None and len(payload) <= INLINE_PAYLOAD_LIMIT:
+            item['solution_bin'] = payload
+            return [item]
+        segments = (encode_segments(schedule, vessels, max_bucket_bytes=INLINE_PAYLOAD_LIMIT)
+                    if payload is not None or not small else None)
+        if segments is None:
+            # Not representable in columns (e.g. partial schedules): keep JSON
+            item['schedule_json'] = json.dumps(schedule)
+            item['vessels_json'] = json.dumps([v.dict() if hasattr(v, 'dict') else v for v in vessels])
+            return [item]
+        
+        # Segment items live in their own partition so they never show up as solutions
+        berths, buckets = segments
+        timestamp = item['timestamp']
+        parts = []
+        for berth, segment in berths.items():
+            if self.blob_bucket:
+                self._blob_client().put_object(Bucket=self.blob_bucket, Key=_berth_blob_key(problem_id, timestamp, berth),
+                                               Body=segment)
+                continue
+            for index, offset in enumerate(range(0, len(segment), INLINE_PAYLOAD_LIMIT)):
+                parts.append({
+                    'problem_id': _chunk_partition(problem_id),
+                    'timestamp': f"{timestamp}#berth#{berth:05d}#{index:05d}",
+                    'data': segment[offset:offset + INLINE_PAYLOAD_LIMIT]
+                })
+        for bucket, segment in enumerate(buckets):
+            parts.append({
+                'problem_id': _chunk_partition(problem_id),
+                'timestamp': f"{timestamp}#vessel#{bucket:05d}",
+                'data': segment
+            })
+        item['solution_berths'] = sorted(berths)
+        item['vessel_buckets'] = len(buckets)
+        if self.blob_bucket:
+            item['solution_blob'] = _blob_prefix(problem_id, timestamp)
+        if expiry is not None:
+            for part in parts:
+                part[TTL_ATTRIBUTE] = expiry
+        return parts + [item]
+    
+    def _blob_client(self):
+        """S3 client for the blob bucket, created on first use."""
+        with self._s3_lock:
+            if self._s3 is None:
+                self._s3 = instrument_client(boto3.client('s3', **client_kwargs(self.region, self.endpoint_url)))
+        return self._s3
+    
+    def decode_payload(self, item: Dict, berth: Optional[int] = None, vessel: Optional[str] = None,
+                       fields: Optional[List[str]] = None) -> Dict:
+        """
+        Replace the stored payload attributes of an item with schedule and
+        vessels, restricted to one berth and/or vessel if given, and to
+        fields (validated names, see storage.solution_fields) if given.
+        """
+        if 'solution_berths' in item:
+            schedule, vessels = join_segments(self._read_segments(item, berth, vessel))
+        elif 'solution_bin' in item:
+            schedule, vessels = decode_solution(_binary(item['solution_bin']))
+        else:
+            # Items written before the binary format
+            schedule = json.loads(item.get('schedule_json', '{}'))
+            vessels = json.loads(item.get('vessels_json', '[]'))
+        
+        # Remove storage fields - return clean object
+        for field in STORAGE_ATTRIBUTES:
+            item.pop(field, None)
+        return solution_view(item, schedule, vessels, SOLUTION_FIELDS if fields is None else fields, berth, vessel)
+    
+    def _read_segments(self, item: Dict, berth: Optional[int], vessel: Optional[str]) -> List:
+        """Decoded segments holding the requested part of a segmented solution."""
+        if vessel is not None:
+            # One lookup bucket holds the vessel wherever it is scheduled
+            bucket = vessel_bucket(vessel, int(item['vessel_buckets']))
+            response = self.table.get_item(
+                Key={'problem_id': _chunk_partition(item['problem_id']),
+                     'timestamp': f"{item['timestamp']}#vessel#{bucket:05d}"},
+                ProjectionExpression='#data',
+                ExpressionAttributeNames={'#data': 'data'}
+            )
+            part = response.get('Item')
+            return [decode_segment(_binary(part['data']))] if part else []
+        
+        stored = [int(b) for b in item['solution_berths']]
+        berths = stored if berth is None else [b for b in stored if b == berth]
+        if 'solution_blob' in item:
+            return [
+                decode_segment(self._blob_client().get_object(
+                    Bucket=self.blob_bucket, Key=_berth_blob_key(item['problem_id'], item['timestamp'], b)
+                )['Body'].read())
+                for b in berths
+            ]
+        if not berths:
+            return []
+        
+        # Chunks sort by berth, then by position within the berth's segment
+        prefix = 'berth#' if berth is None else f"berth#{berth:05d}#"
+        chunks: Dict[int, List[bytes]] = {}
+        for part in self._parts(item, prefix):
+            chunks.setdefault(int(part['timestamp'].split('#')[-2]), []).append(_binary(part['data']))
+        if sorted(chunks) != berths:
+            raise ValueError(f"Missing berth segments for {item['problem_id']}")
+        return [decode_segment(b''.join(chunks[b])) for b in berths]
+    
+    def _parts(self, item: Dict, prefix: str):
+        """Yield the items in the chunk partition of a solution item whose sort key continues with prefix."""
+        return self._query_all(
+            KeyConditionExpression=Key('problem_id').eq(_chunk_partition(item['problem_id']))
+            & Key('timestamp').begins_with(f"{item['timestamp']}#{prefix}"),
+            ProjectionExpression='#ts, #data',
+            ExpressionAttributeNames={'#ts': 'timestamp', '#data': 'data'}
+        )
+    
+    def _query_all(self, **kwargs):
+        """Yield every item of a query, following pagination."""
+        while True:
+            response = self.table.query(**kwargs)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
     def save_solution(self, problem_id: str, solution_data: Dict) -> bool:
         """
         Save a scheduling solution to DynamoDB.
@@ -72,104 +358,233 @@ class DynamoDBManager:
             True if successful
         """
         try:
-            item = {
-                'problem_id': problem_id,
-                'timestamp': solution_data.get('timestamp', datetime.now(timezone.utc).isoformat()),
-                'makespan': solution_data.get('makespan', 0),
-                'solving_time': str(solution_data.get('solving_time', 0)),
-                'num_vessels': len(solution_data.get('vessels', [])),
-                'schedule_json': json.dumps(solution_data.get('schedule', {})),
-                'vessels_json': json.dumps([v.dict() if hasattr(v, 'dict') else v 
-                                          for v in solution_data.get('vessels', [])])
-            }
-            
+            *chunks, item = self.solution_items(problem_id, solution_data)
+            if chunks:
+                with self.table.batch_writer() as batch:
+                    for chunk in chunks:
+                        batch.put_item(Item=chunk)
+            # Written last, so readers never see a solution whose chunks are missing
             self.table.put_item(Item=item)
             return True
         except Exception as e:
             print(f"Error saving solution: {e}")
             return False
     
-    def get_solution(self, problem_id: str, timestamp: Optional[str] = None) -> Optional[Dict]:
+    def save_solutions(self, solutions: List[Tuple[str, Dict]]) -> bool:
+        """
+        Save several solutions with batched writes.
+        
+        Args:
+            solutions: (problem_id, solution_data) pairs
+        
+        Returns:
+            True if successful
+        """
+        try:
+            # batch_writer sends 25 items per BatchWriteItem and resends unprocessed ones
+            with self.table.batch_writer() as batch:
+                for problem_id, solution_data in solutions:
+                    for item in self.solution_items(problem_id, solution_data):
+                        batch.put_item(Item=item)
+            return True
+        except Exception as e:
+            print(f"Error saving solutions: {e}")
+            return False
+    
+    def get_solution(self, problem_id: str, timestamp: Optional[str] = None,
+                     fields: Optional[List[str]] = None, berth: Optional[int] = None,
+                     vessel: Optional[str] = None, as_of: Optional[str] = None) -> Optional[Dict]:
         """
         Retrieve a solution from DynamoDB.
         
         Args:
             problem_id: Problem identifier
             timestamp: Optional timestamp for composite key (if multiple solutions per ID)
+            as_of: Return the most recent version saved at or before this
+                ISO 8601 UTC timestamp
+            fields: Parts to return, from SOLUTION_FIELDS (default all). The
+                summary attributes are always included; ['summary'] alone
+                reads no schedule data.
+            berth: Only return the schedule and vessels of this berth
+            vessel: Only return this vessel's schedule entry and vessel
         
         Returns:
             Solution dictionary or None if not found
+        
+        Raises:
+            ValueError: If fields contains an unknown name
         """
+        fields = solution_fields(fields)
+        summary_only = 'schedule' not in fields and 'vessels' not in fields
+        method, kwargs = solution_read(problem_id, timestamp, as_of, summary_only)
+        
         try:
-            # Get the most recent solution if timestamp not specified
-            if timestamp is None:
-                response = self.table.query(
-                    KeyConditionExpression='problem_id = :pid',
-                    ExpressionAttributeValues={':pid': problem_id},
-                    ScanIndexForward=False,
-                    Limit=1
-                )
-                items = response.get('Items', [])
-                if not items:
-                    return None
-                item = items[0]
-            else:
-                response = self.table.get_item(
-                    Key={'problem_id': problem_id, 'timestamp': timestamp}
-                )
-                item = response.get('Item')
-                if not item:
-                    return None
+            item = unexpired(first_item(getattr(self.table, method)(**kwargs)))
+            if item is None or summary_only:
+                return item
             
-            # Parse JSON fields
-            item['schedule'] = json.loads(item.get('schedule_json', '{}'))
-            item['vessels'] = json.loads(item.get('vessels_json', '[]'))
-            
-            # Remove JSON string fields - return clean object
-            item.pop('schedule_json', None)
-            item.pop('vessels_json', None)
-            
-            return item
+            # Decode binary, segmented, blob or legacy JSON payloads
+            return self.decode_payload(item, berth, vessel, fields)
         except Exception as e:
             print(f"Error retrieving solution: {e}")
             return None
     
-    def list_solutions(self, limit: int = 10) -> List[Dict]:
+    def find_solution_by_hash(self, problem_hash: str) -> Optional[Dict]:
+        """
+        Retrieve the most recent solution saved for a problem hash.
+        
+        Args:
+            problem_hash: Canonical problem hash (see cache.problem_hash)
+        
+        Returns:
+            Solution dictionary or None if no identical problem was saved
+        """
+        try:
+            item = first_item(self.table.query(**hash_query(problem_hash)))
+            if item is None:
+                return None
+            return self.get_solution(item['problem_id'], item['timestamp'])
+        except Exception as e:
+            print(f"Error looking up solution by hash: {e}")
+            return None
+    
+    def list_solutions_page(self, limit: int = 10, next_token: Optional[str] = None,
+                            min_vessels: Optional[int] = None, max_vessels: Optional[int] = None,
+                            min_makespan: Optional[int] = None, max_makespan: Optional[int] = None) -> Dict:
         """
-        List recent solutions from DynamoDB.
+        List one page of solutions, newest first, from the listing index.
         
         Args:
             limit: Maximum number of solutions to return
+            next_token: Cursor returned with the previous page
+            min_vessels, max_vessels: Inclusive range on num_vessels
+            min_makespan, max_makespan: Inclusive range on makespan
         
         Returns:
-            List of solution summaries
+            Dictionary with 'solutions' (list of summaries) and 'next_token'
+            (None on the last page). With filters at most LISTING_MAX_READS
+            items are read, so a page may hold fewer than limit solutions
+            and still have a next_token.
+        
+        Raises:
+            ValueError: If limit is not positive or next_token is malformed
         """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        start_key = _decode_token(next_token, LISTING_KEY) if next_token else None
+        
+        conditions = []
+        for attribute, low, high in (('num_vessels', min_vessels, max_vessels),
+                                     ('makespan', min_makespan, max_makespan)):
+            if low is not None and high is not None:
+                conditions.append(Attr(attribute).between(low, high))
+            elif low is not None:
+                conditions.append(Attr(attribute).gte(low))
+            elif high is not None:
+                conditions.append(Attr(attribute).lte(high))
+        
+        filter_expression = None
+        for condition in conditions:
+            filter_expression = condition if filter_expression is None else filter_expression & condition
+        
         try:
-            response = self.table.scan(Limit=limit)
-            items = response.get('Items', [])
-            
-            # Parse and summarize
             solutions = []
-            for item in items:
-                solutions.append({
-                    'problem_id': item.get('problem_id'),
-                    'timestamp': item.get('timestamp'),
-                    'makespan': item.get('makespan'),
-                    'solving_time': item.get('solving_time'),
-                    'num_vessels': item.get('num_vessels')
-                })
-            
-            # Sort by timestamp descending
-            solutions.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            
-            return solutions
+            read = 0
+            while True:
+                kwargs = {
+                    'IndexName': RECENT_INDEX,
+                    'KeyConditionExpression': Key('record_type').eq(RECORD_TYPE),
+                    'ScanIndexForward': False,
+                    # Limit counts items read before filtering, so read ahead when filtering
+                    'Limit': limit - len(solutions) if filter_expression is None
+                    else min(max(limit, 100), LISTING_MAX_READS - read)
+                }
+                if filter_expression is not None:
+                    kwargs['FilterExpression'] = filter_expression
+                if start_key:
+                    kwargs['ExclusiveStartKey'] = start_key
+                response = self.table.query(**kwargs)
+                
+                items = response.get('Items', [])
+                last_key = response.get('LastEvaluatedKey')
+                read += response.get('ScannedCount', len(items))
+                for index, item in enumerate(items):
+                    solutions.append({
+                        'problem_id': item.get('problem_id'),
+                        'timestamp': item.get('timestamp'),
+                        'makespan': item.get('makespan'),
+                        'solving_time': item.get('solving_time'),
+                        'num_vessels': item.get('num_vessels')
+                    })
+                    if len(solutions) == limit:
+                        # Resume right after the last returned item, which may
+                        # be mid-page when the filter matched more than needed
+                        more = index < len(items) - 1 or last_key is not None
+                        token = _encode_token({'record_type': RECORD_TYPE, 'timestamp': item['timestamp'],
+                                               'problem_id': item['problem_id']}) if more else None
+                        return {'solutions': solutions, 'next_token': token}
+                if last_key is None:
+                    return {'solutions': solutions, 'next_token': None}
+                if filter_expression is not None and read >= LISTING_MAX_READS:
+                    # The client continues from the last item read
+                    return {'solutions': solutions, 'next_token': _encode_token(last_key)}
+                start_key = last_key
         except Exception as e:
             print(f"Error listing solutions: {e}")
-            return []
+            return {'solutions': [], 'next_token': None}
+    
+    def list_versions(self, problem_id: str, limit: int = 10, next_token: Optional[str] = None) -> Dict:
+        """
+        List one page of a solution's versions, newest first.
+        
+        Reads only the summary attributes of each version item, never its
+        payload or chunks.
+        
+        Args:
+            problem_id: Problem identifier
+            limit: Maximum number of versions to return
+            next_token: Cursor returned with the previous page
+        
+        Returns:
+            Dictionary with 'versions' (list of version summaries) and
+            'next_token' (None on the last page)
+        
+        Raises:
+            ValueError: If limit is not positive or next_token is malformed
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        kwargs = {
+            'KeyConditionExpression': Key('problem_id').eq(problem_id),
+            'ProjectionExpression': VERSION_PROJECTION,
+            'ExpressionAttributeNames': {'#ts': 'timestamp'},
+            'ScanIndexForward': False,
+            # TTL deletes expired items up to a few days late
+            'FilterExpression': Attr(TTL_ATTRIBUTE).not_exists() | Attr(TTL_ATTRIBUTE).gt(int(time.time())),
+            'Limit': limit
+        }
+        if next_token:
+            start_key = _decode_token(next_token, VERSION_KEY)
+            if start_key['problem_id'] != problem_id:
+                raise ValueError("Invalid next_token")
+            kwargs['ExclusiveStartKey'] = start_key
+        
+        try:
+            response = self.table.query(**kwargs)
+            last_key = response.get('LastEvaluatedKey')
+            return {'versions': response.get('Items', []),
+                    'next_token': _encode_token(last_key) if last_key else None}
+        except Exception as e:
+            print(f"Error listing versions: {e}")
+            return {'versions': [], 'next_token': None}
     
     def delete_solution(self, problem_id: str) -> bool:
         """
-        Delete a solution from DynamoDB.
+        Delete every version of a solution from DynamoDB.
+        
+        Pages through the versions and then their chunks with keys-only
+        queries, deleting each page with batched writes as it is read, so
+        memory stays flat however many versions a problem has.
         
         Args:
             problem_id: Problem identifier
@@ -178,23 +593,119 @@ class DynamoDBManager:
             True if successful
         """
         try:
-            # Get all items with this problem_id first
-            response = self.table.query(
-                KeyConditionExpression='problem_id = :pid',
-                ExpressionAttributeValues={':pid': problem_id}
-            )
-            
-            # Delete each item
+            keys = {'ProjectionExpression': 'problem_id, #ts, solution_blob, solution_berths',
+                    'ExpressionAttributeNames': {'#ts': 'timestamp'}}
+            blob_keys = []
             with self.table.batch_writer() as batch:
-                for item in response.get('Items', []):
-                    batch.delete_item(
-                        Key={
-                            'problem_id': item['problem_id'],
-                            'timestamp': item['timestamp']
-                        }
-                    )
+                for partition in (problem_id, _chunk_partition(problem_id)):
+                    for item in self._query_all(KeyConditionExpression=Key('problem_id').eq(partition), **keys):
+                        batch.delete_item(Key={'problem_id': item['problem_id'], 'timestamp': item['timestamp']})
+                        if 'solution_blob' in item:
+                            blob_keys.extend(_berth_blob_key(item['problem_id'], item['timestamp'], int(berth))
+                                             for berth in item['solution_berths'])
+            
+            for start in range(0, len(blob_keys), BLOB_DELETE_BATCH):
+                self._blob_client().delete_objects(
+                    Bucket=self.blob_bucket,
+                    Delete={'Objects': [{'Key': key} for key in blob_keys[start:start + BLOB_DELETE_BATCH]],
+                            'Quiet': True}
+                )
             
             return True
         except Exception as e:
             print(f"Error deleting solution: {e}")
             return False
+
+
+def solution_read(problem_id: str, timestamp: Optional[str] = None, as_of: Optional[str] = None,
+                  summary_only: bool = False) -> Tuple[str, Dict]:
+    """
+    The Table method ('get_item' or 'query') and its arguments that read a
+    solution item: the version at timestamp if given, else the most recent
+    one (saved at or before as_of, if given). With summary_only only the
+    summary attributes are read.
+    """
+    projection = {'ProjectionExpression': SUMMARY_PROJECTION,
+                  'ExpressionAttributeNames': {'#ts': 'timestamp'}} if summary_only else {}
+    if timestamp is not None:
+        return 'get_item', {'Key': {'problem_id': problem_id, 'timestamp': timestamp}, **projection}
+    condition = Key('problem_id').eq(problem_id)
+    if as_of is not None:
+        condition = condition & Key('timestamp').lte(as_of)
+    return 'query', {'KeyConditionExpression': condition, 'ScanIndexForward': False, 'Limit': 1, **projection}
+
+
+def hash_query(problem_hash: str) -> Dict:
+    """Query arguments for the key of the most recent solution saved for a problem hash."""
+    return {
+        'IndexName': PROBLEM_HASH_INDEX,
+        'KeyConditionExpression': Key('problem_hash').eq(problem_hash),
+        'ScanIndexForward': False,
+        'Limit': 1
+    }
+
+
+def first_item(response: Dict) -> Optional[Dict]:
+    """The item of a get_item response, or the first item of a query response, or None."""
+    if 'Items' in response:
+        return response['Items'][0] if response['Items'] else None
+    return response.get('Item')
+
+
+def unexpired(item: Optional[Dict]) -> Optional[Dict]:
+    """
+    A solution item without its TTL attribute, or None if it is None or has
+    expired; DynamoDB's TTL deletes expired items up to a few days late.
+    """
+    if item is None:
+        return None
+    expiry = item.pop(TTL_ATTRIBUTE, None)
+    return None if expiry is not None and int(expiry) <= time.time() else item
+
+
+def inline_payload_size(item: Dict) -> Optional[int]:
+    """
+    Bytes of a solution item's payload when it is stored in the item itself,
+    or None when decoding it reads segments from the table or blob bucket.
+    """
+    if 'solution_bin' in item:
+        return len(_binary(item['solution_bin']))
+    if 'solution_berths' in item:
+        return None
+    return len(item.get('schedule_json', '')) + len(item.get('vessels_json', ''))
+
+
+def _encode_token(key: Dict) -> str:
+    """Opaque pagination cursor from the key of the last item returned."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_token(token: str, attributes: frozenset) -> Dict:
+    """ExclusiveStartKey, made of the given attributes, for a cursor produced by _encode_token."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid next_token")
+    if not isinstance(key, dict) or set(key) != attributes or not all(isinstance(v, str) for v in key.values()):
+        raise ValueError("Invalid next_token")
+    return key
+
+
+def _chunk_partition(problem_id: str) -> str:
+    """Partition key holding the payload chunks and segments of a problem's solutions."""
+    return f"{problem_id}#chunks"
+
+
+def _blob_prefix(problem_id: str, timestamp: str) -> str:
+    """S3 key prefix of a segmented solution stored in the blob bucket."""
+    return f"solutions/{problem_id}/{timestamp}/"
+
+
+def _berth_blob_key(problem_id: str, timestamp: str, berth: int) -> str:
+    """S3 key of one berth segment."""
+    return f"{_blob_prefix(problem_id, timestamp)}berth-{berth:05d}.bin"
+
+
+def _binary(value) -> bytes:
+    """Bytes of a Binary attribute as returned by boto3."""
+    return value.value if hasattr(value, 'value') else bytes(value)
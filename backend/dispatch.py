@@ -0,0 +1,158 @@
+"""
+Solver dispatch for API requests.
+
+Runs the solver selected by a request on plain column data. Everything here
+is importable without side effects and takes picklable arguments, so it can
+run in a worker process of the solver pool.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from solver import (
+    solve_berth_scheduling_columnar,
+    schedule_from_columns,
+    BerthData,
+    BerthSchedulingProblem,
+    ProgressCallback,
+    VesselData,
+)
+from exact_solver import solve_berth_scheduling_exact
+from local_search import improve_schedule
+from rolling import solve_rolling
+from portfolio import solve_portfolio
+
+
+def _size(values: Optional[np.ndarray], index: int) -> Optional[float]:
+    if values is None or np.isnan(values[index]):
+        return None
+    return float(values[index])
+
+
+def _build_problem(vessel_ids: Sequence[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+                   num_berths: int, planning_horizon: int, berths: Optional[List[BerthData]] = None,
+                   lengths: Optional[np.ndarray] = None,
+                   drafts: Optional[np.ndarray] = None) -> BerthSchedulingProblem:
+    return BerthSchedulingProblem(
+        vessels=[
+            VesselData(vessel_id=vessel_id, arrival_time=arrival, processing_time=processing,
+                       length=_size(lengths, index), draft=_size(drafts, index))
+            for index, (vessel_id, arrival, processing) in enumerate(zip(vessel_ids, arrival_times.tolist(),
+                                                                         processing_times.tolist()))
+        ],
+        planning_horizon=planning_horizon,
+        num_berths=num_berths,
+        berths=berths
+    )
+
+
+def solve_heuristic(vessel_ids: Sequence[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+                    num_berths: int, planning_horizon: int, berths: Optional[List[BerthData]] = None,
+                    lengths: Optional[np.ndarray] = None, drafts: Optional[np.ndarray] = None) -> Dict:
+    """Run the FCFS heuristic on column arrays; the schedule dict is only built for the response."""
+    result = solve_berth_scheduling_columnar(
+        arrival_times,
+        processing_times,
+        num_berths=num_berths,
+        planning_horizon=planning_horizon,
+        vessel_ids=vessel_ids,
+        berths=berths,
+        lengths=lengths,
+        drafts=drafts
+    )
+    result['schedule'] = schedule_from_columns(vessel_ids, arrival_times, processing_times, result)
+    return result
+
+
+def solve_exact(vessel_ids: Sequence[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+                num_berths: int, planning_horizon: int, time_limit: float,
+                callback: Optional[ProgressCallback] = None, **berth_model) -> Dict:
+    """Run branch-and-bound, warm-started from the heuristic when it finds a feasible schedule."""
+    try:
+        warm_start = solve_heuristic(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon,
+                                     **berth_model)
+    except ValueError:
+        warm_start = None
+
+    problem = _build_problem(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon,
+                             **berth_model)
+    return solve_berth_scheduling_exact(problem, time_limit=time_limit, warm_start=warm_start, callback=callback)
+
+
+def solve_local_search(vessel_ids: Sequence[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+                       num_berths: int, planning_horizon: int, time_limit: float,
+                       callback: Optional[ProgressCallback] = None, **berth_model) -> Dict:
+    """Improve the heuristic schedule with local search until the time limit."""
+    initial = solve_heuristic(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon,
+                              **berth_model)
+    problem = _build_problem(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon,
+                             **berth_model)
+    result = improve_schedule(problem, initial, time_limit=time_limit, callback=callback)
+    result['solving_time'] += initial['solving_time']
+    return result
+
+
+def run_solver(vessel_ids: Sequence[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+               num_berths: int = 2, planning_horizon: int = 72, solver: str = "heuristic",
+               time_limit: float = 10.0, channel=None, window: Optional[int] = None,
+               window_overlap: Optional[int] = None, berths: Optional[List[Dict]] = None,
+               lengths: Optional[np.ndarray] = None, drafts: Optional[np.ndarray] = None) -> Dict:
+    """
+    Solve one problem with the named solver.
+
+    Args:
+        vessel_ids: Vessel identifiers
+        arrival_times: Arrival time of each vessel
+        processing_times: Processing time of each vessel
+        num_berths: Number of berths
+        planning_horizon: Latest allowed start time (exclusive)
+        solver: 'heuristic', 'exact', 'local_search' or 'portfolio'
+        time_limit: Time budget in seconds for 'exact', 'local_search' and
+            'portfolio'
+        channel: Optional executor.SolveChannel that receives progress
+            updates and can cancel 'exact', 'local_search' and 'portfolio'
+            early
+        window: Solve in rolling-horizon windows of this many hours (see
+            rolling.solve_rolling) instead of all at once
+        window_overlap: Hours shared by consecutive windows
+        berths: Optional limits and closures per berth, as BerthData fields
+            (not combined with window or 'portfolio')
+        lengths: Optional length of each vessel (NaN when unknown)
+        drafts: Optional draft of each vessel (NaN when unknown)
+
+    Returns:
+        Result dictionary with schedule, makespan and solving_time, plus
+        lower_bound and optimality_gap for 'exact', 'local_search' and
+        'portfolio', and the strategy report for 'portfolio'
+
+    Raises:
+        ValueError: If the problem is infeasible, or berths are combined
+            with window or 'portfolio'
+    """
+    callback = channel.report if channel is not None else None
+    berth_model = {}
+    if berths is not None:
+        if window is not None or solver == "portfolio":
+            raise ValueError("berths cannot be combined with window or the portfolio solver")
+        berth_model = {
+            'berths': [BerthData(berth.get('max_length'), berth.get('max_draft'),
+                                 [tuple(closure) for closure in berth.get('closures') or []])
+                       for berth in berths],
+            'lengths': lengths,
+            'drafts': drafts
+        }
+    if window is not None:
+        return solve_rolling(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon, window,
+                             window_overlap, solver, time_limit, callback)
+    if solver == "exact":
+        return solve_exact(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon, time_limit,
+                           callback, **berth_model)
+    if solver == "portfolio":
+        return solve_portfolio(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon,
+                               time_limit, callback)
+    if solver == "local_search":
+        return solve_local_search(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon,
+                                  time_limit, callback, **berth_model)
+    return solve_heuristic(vessel_ids, arrival_times, processing_times, num_berths, planning_horizon,
+                           **berth_model)
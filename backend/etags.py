@@ -0,0 +1,101 @@
+"""
+ETags and conditional GETs for stored solutions.
+
+A saved version of a solution never changes, so its ETag is derived from
+problem_id, timestamp and the requested view (fields, berth, vessel)
+without reading or hashing the body. Listings are tagged by a hash of
+their encoded body.
+
+ETagIndex remembers recently served tags: the latest version timestamp
+of each problem and the tag of each listing. A request whose
+If-None-Match holds a remembered tag is answered 304 Not Modified without
+a database call. Entries are updated when this process saves or deletes
+solutions and expire after ETAG_INDEX_TTL seconds, which bounds how long
+a change made by another API process can go unnoticed.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import os
+import threading
+import time
+
+
+def solution_etag(problem_id: str, timestamp: str, view: str = '') -> str:
+    """Strong ETag of one view of a saved solution version."""
+    digest = hashlib.sha256(f"{problem_id}\n{timestamp}\n{view}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag of an encoded response body."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header value matches an ETag.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so
+    W/-prefixed tags match their strong counterparts.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(','))
+    return any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in candidates)
+
+
+class ETagIndex:
+    """Thread-safe LRU of values by key with a time-to-live."""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialize the index.
+
+        Args:
+            max_entries: Maximum entries (defaults to env ETAG_INDEX_SIZE or
+                10000); 0 disables the index
+            ttl: Seconds an entry stays valid (defaults to env ETAG_INDEX_TTL
+                or 30)
+        """
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('ETAG_INDEX_SIZE', 10000))
+        self.ttl = ttl if ttl is not None else float(os.getenv('ETAG_INDEX_TTL', 30))
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str):
+        """Remember a value, evicting the least recently used entry."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
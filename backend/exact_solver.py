@@ -0,0 +1,282 @@
+"""
+Exact makespan optimization for the berth scheduling problem.
+
+Branch-and-bound over berth assignments. On a single berth, serving vessels
+in arrival order never increases the makespan, so a schedule is fully
+determined by which berth each vessel goes to. Vessels are assigned in
+arrival order and each node of the search tree is the vector of times at
+which every berth becomes free.
+
+The search is warm-started with the FCFS heuristic's schedule, stops at a
+wall-clock time limit and reports the remaining optimality gap.
+
+With berth limits (see berth_model), a vessel only branches to the berths
+its compatibility bitset allows, and only berths of the same class are
+treated as interchangeable. With berth closures, start times step over
+them; arrival order on a berth is then no longer always best, so
+'optimal' means optimal over schedules that serve each berth in arrival
+order.
+
+The planning horizon breaks the same argument: serving a short later
+arrival first can let both vessels start within the horizon. When the
+horizon cut off part of the search, a completed search reports
+'horizon_limited' instead of 'optimal' (unless the makespan meets the root
+lower bound), and finding no schedule only means that none serves each
+berth in arrival order.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import time
+
+import numpy as np
+
+from solver import BerthSchedulingProblem, ProgressCallback, solve_berth_scheduling
+from berth_model import BerthModel
+
+# How many nodes to expand between wall-clock checks
+_TIME_CHECK_INTERVAL = 1024
+# Upper bound on remembered search states, to keep memory bounded
+_MAX_VISITED_STATES = 500_000
+
+
+def _ceil_div(a: int, b: int) -> int:
+    return -(-a // b)
+
+
+def lower_bound(arrival_times: np.ndarray, processing_times: np.ndarray, num_berths: int,
+                berth_available: Optional[Sequence[int]] = None) -> int:
+    """
+    Lower bound on the makespan of any feasible schedule, from column arrays.
+
+    No vessel can leave before arrival + processing, and no berth can work
+    before the first arrival (or before it becomes free), so the total work
+    spread evenly over all berths from that point on is also a bound.
+    """
+    if not len(arrival_times):
+        return 0
+    available = berth_available or [0] * num_berths
+    first_arrival = max(0, int(arrival_times.min()))
+    total_work = int(processing_times.sum())
+    return max(
+        int((arrival_times + processing_times).max()),
+        max(available),
+        _ceil_div(sum(max(first_arrival, a) for a in available) + total_work, num_berths)
+    )
+
+
+def makespan_lower_bound(problem: BerthSchedulingProblem) -> int:
+    """lower_bound for a problem instance."""
+    count = len(problem.vessels)
+    return lower_bound(
+        np.fromiter((v.arrival_time for v in problem.vessels), dtype=np.int64, count=count),
+        np.fromiter((v.processing_time for v in problem.vessels), dtype=np.int64, count=count),
+        problem.num_berths,
+        problem.berth_available
+    )
+
+
+def solve_berth_scheduling_exact(problem: BerthSchedulingProblem, time_limit: float = 10.0,
+                                 warm_start: Optional[Dict] = None,
+                                 callback: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Minimize the makespan with branch-and-bound.
+
+    Args:
+        problem: Problem instance
+        time_limit: Wall-clock budget in seconds
+        warm_start: Optional result of solve_berth_scheduling used as the
+            initial incumbent. Computed here when not given.
+        callback: Optional progress callback, called on every new incumbent
+            and periodically; returning False stops the search
+
+    Returns:
+        Dictionary with the same keys as solve_berth_scheduling plus:
+        - lower_bound: Best proven lower bound on the makespan
+        - optimality_gap: (makespan - lower_bound) / makespan
+        - status: 'optimal' if the search completed, 'horizon_limited' if
+          it completed but the planning horizon cut off schedules (so one
+          serving a berth out of arrival order may be better), 'time_limit'
+          if it ran out of time, 'stopped' if the callback stopped it
+
+    Raises:
+        ValueError: If no schedule that serves each berth in arrival order
+            fits within the planning horizon
+    """
+    start_time = time.time()
+    deadline = start_time + time_limit
+
+    if not problem.vessels:
+        return {
+            'schedule': {},
+            'makespan': 0,
+            'solving_time': time.time() - start_time,
+            'lower_bound': 0,
+            'optimality_gap': 0.0,
+            'status': 'optimal'
+        }
+    if problem.num_berths < 1:
+        raise ValueError("At least one berth is required")
+
+    vessels = sorted(problem.vessels, key=lambda v: v.arrival_time)
+    num_vessels = len(vessels)
+    num_berths = problem.num_berths
+    horizon = problem.planning_horizon
+    initial = tuple(problem.berth_available) if problem.berth_available else (0,) * num_berths
+    arrivals = [v.arrival_time for v in vessels]
+    processing = [v.processing_time for v in vessels]
+    model = BerthModel.from_problem(problem, vessels)
+    masks = model.masks if model is not None else None
+    berth_class = model.berth_class if model is not None else [0] * num_berths
+    closed = model.start if model is not None and model.has_closures else None
+
+    # Suffix aggregates over the vessels not yet assigned at depth k
+    remaining_work = [0] * (num_vessels + 1)
+    remaining_due = [0] * (num_vessels + 1)
+    for k in range(num_vessels - 1, -1, -1):
+        remaining_work[k] = remaining_work[k + 1] + processing[k]
+        remaining_due[k] = max(remaining_due[k + 1], arrivals[k] + processing[k])
+
+    def node_bound(k: int, availability: Tuple[int, ...]) -> int:
+        bound = max(max(availability), remaining_due[k])
+        if k < num_vessels:
+            # No berth can start the remaining vessels before the next arrival
+            ready = sum(max(a, arrivals[k]) for a in availability)
+            bound = max(bound, _ceil_div(ready + remaining_work[k], num_berths))
+        return bound
+
+    root_bound = makespan_lower_bound(problem)
+
+    # Incumbent from the warm start (the FCFS heuristic by default)
+    if warm_start is None:
+        try:
+            warm_start = solve_berth_scheduling(problem)
+        except ValueError:
+            warm_start = None
+    best_makespan = warm_start['makespan'] if warm_start else float('inf')
+    best_berths: Optional[List[int]] = None
+
+    # Depth-first search; each entry is (depth, availability, assignment path)
+    # where the path is a linked list of (berth, parent) to avoid copying.
+    stack = [(0, initial, None)]
+    visited = set()
+    nodes = 0
+    status = 'optimal'
+    # Whether a vessel could not start within the horizon on some branch
+    horizon_cut = False
+
+    def incumbent_schedule() -> Dict:
+        if best_berths is None:
+            return warm_start['schedule']
+        schedule = {}
+        availability = list(initial)
+        for vessel, berth in zip(vessels, best_berths):
+            start = max(vessel.arrival_time, availability[berth])
+            if closed is not None:
+                start = closed(berth, start, vessel.processing_time)
+            end = start + vessel.processing_time
+            availability[berth] = end
+            schedule[vessel.vessel_id] = {
+                'berth': berth,
+                'start_time': start,
+                'end_time': end,
+                'arrival_time': vessel.arrival_time,
+                'processing_time': vessel.processing_time
+            }
+        return schedule
+
+    def report() -> bool:
+        if callback is None or best_makespan == float('inf'):
+            return True
+        return callback({
+            'makespan': int(best_makespan),
+            'lower_bound': root_bound,
+            'elapsed': time.time() - start_time,
+            'schedule': incumbent_schedule
+        })
+
+    while stack:
+        if best_makespan <= root_bound:
+            break
+
+        nodes += 1
+        if nodes % _TIME_CHECK_INTERVAL == 0:
+            if time.time() > deadline:
+                status = 'time_limit'
+                break
+            if not report():
+                status = 'stopped'
+                break
+
+        k, availability, path = stack.pop()
+        if node_bound(k, availability) >= best_makespan:
+            continue
+
+        if k == num_vessels:
+            best_makespan = max(availability)
+            best_berths = []
+            while path is not None:
+                berth, path = path
+                best_berths.append(berth)
+            best_berths.reverse()
+            if not report():
+                status = 'stopped'
+                break
+            continue
+
+        # Berths of one class with equal availability are interchangeable from here on
+        if model is None:
+            state = (k, tuple(sorted(availability)))
+        else:
+            state = (k, tuple(sorted(zip(berth_class, availability))))
+        if state in visited:
+            continue
+        if len(visited) < _MAX_VISITED_STATES:
+            visited.add(state)
+
+        children = []
+        seen_times = set()
+        for berth, available_time in enumerate(availability):
+            if masks is not None and not masks[k] >> berth & 1:
+                continue
+            if (available_time, berth_class[berth]) in seen_times:
+                continue
+            seen_times.add((available_time, berth_class[berth]))
+            start = max(arrivals[k], available_time)
+            if closed is not None:
+                start = closed(berth, start, processing[k])
+            if start >= horizon:
+                horizon_cut = True
+                continue
+            end = start + processing[k]
+            if end >= best_makespan:
+                continue
+            children.append((end, berth))
+
+        # Push the most promising child last so it is expanded first
+        children.sort(reverse=True)
+        for end, berth in children:
+            child = availability[:berth] + (end,) + availability[berth + 1:]
+            stack.append((k + 1, child, (berth, path)))
+
+    if status == 'optimal' and horizon_cut and best_makespan > root_bound:
+        status = 'horizon_limited'
+    if best_berths is not None or warm_start is not None:
+        schedule = incumbent_schedule()
+    elif status == 'optimal':
+        raise ValueError("No schedule fits within the planning horizon")
+    elif status == 'horizon_limited':
+        raise ValueError("No schedule serving each berth in arrival order fits within the planning horizon")
+    else:
+        raise ValueError("No feasible schedule found within the time limit")
+
+    makespan = int(best_makespan)
+    bound = makespan if status == 'optimal' else min(root_bound, makespan)
+
+    return {
+        'schedule': schedule,
+        'makespan': makespan,
+        'solving_time': time.time() - start_time,
+        'lower_bound': bound,
+        'optimality_gap': (makespan - bound) / makespan if makespan else 0.0,
+        'status': status
+    }
@@ -0,0 +1,246 @@
+"""
+Executors that keep CPU-bound solving and blocking DynamoDB calls off the
+asyncio event loop.
+
+Solves run in a process pool so a long solve cannot stall /health or other
+requests on the same worker. DynamoDB calls run in a thread pool that should not be larger
+than the client's connection pool (see database.client_config). Admission to the solver pool is bounded: once
+every worker is busy and the wait queue is full, new solves are rejected
+with SolverBusyError instead of piling up.
+
+Solves are timed in the worker, so the metrics tell time spent solving
+from time spent waiting for a worker (see metrics). For a profiled request
+the worker also samples its own stack (see profiling).
+"""
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import metrics
+import profiling
+
+
+class SolverBusyError(Exception):
+    """Raised when the solver pool and its wait queue are full."""
+
+
+class SolveChannel:
+    """
+    Progress updates and cancellation shared between a running solve and
+    the API process.
+
+    Pass channel.report as a solver's progress callback. Updates are
+    throttled so a solver improving many times per second does not flood
+    the channel; the final result always comes back with the solve itself.
+    A channel opened with schedules=True also publishes the solver's best
+    schedule so far, built only for published updates whose makespan
+    differs from the last one published with a schedule.
+    """
+
+    def __init__(self, updates, cancel_event, min_interval: float = 0.1, schedules: bool = False):
+        self._updates = updates
+        self._cancel_event = cancel_event
+        self._min_interval = min_interval
+        self._schedules = schedules
+        self._schedule_makespan = None
+        self._last_report = 0.0
+
+    def __getstate__(self):
+        # Sent to a worker process: the throttle clock starts fresh there
+        return {'_updates': self._updates, '_cancel_event': self._cancel_event,
+                '_min_interval': self._min_interval, '_schedules': self._schedules,
+                '_schedule_makespan': None, '_last_report': 0.0}
+
+    def report(self, update: Dict) -> bool:
+        """Publish a progress update. Returns False once the solve is cancelled."""
+        now = time.monotonic()
+        if now - self._last_report < self._min_interval:
+            return True
+        self._last_report = now
+        update = dict(update)
+        schedule = update.pop('schedule', None)
+        if self._schedules and schedule is not None and update.get('makespan') != self._schedule_makespan:
+            # A solver's best schedule only changes when its makespan improves
+            self._schedule_makespan = update.get('makespan')
+            update['schedule'] = schedule() if callable(schedule) else schedule
+        self._updates.put(update)
+        return not self._cancel_event.is_set()
+
+    def cancel(self):
+        """Ask the solve to stop at its next progress report."""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def drain(self) -> List[Dict]:
+        """Return the updates published since the last call."""
+        updates = []
+        while True:
+            try:
+                updates.append(self._updates.get_nowait())
+            except queue.Empty:
+                return updates
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: Dict) -> Tuple[float, Any]:
+    """Run fn in a solver worker and return (seconds it ran, result)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+class SolverExecutor:
+    """Process pool for solves plus a thread pool for DynamoDB I/O."""
+
+    def __init__(self, solver_workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 db_threads: Optional[int] = None):
+        """
+        Initialize the executors.
+
+        Args:
+            solver_workers: Solver processes (defaults to env SOLVER_WORKERS or
+                the CPU count). 0 runs solves in a thread of this process.
+            queue_size: Solves allowed to wait for a free worker (defaults to
+                env SOLVER_QUEUE_SIZE or 2 per worker)
+            db_threads: Threads for DynamoDB calls (defaults to env DB_THREADS or 10)
+        """
+        if solver_workers is None:
+            solver_workers = int(os.getenv('SOLVER_WORKERS', os.cpu_count() or 1))
+        if queue_size is None:
+            queue_size = int(os.getenv('SOLVER_QUEUE_SIZE', 2 * max(solver_workers, 1)))
+        if db_threads is None:
+            db_threads = int(os.getenv('DB_THREADS', 10))
+
+        self.solver_workers = solver_workers
+        self.queue_size = queue_size
+        self.db_threads = db_threads
+        self.capacity = max(solver_workers, 1) + queue_size
+        self.in_flight = 0
+        self._solve_pool = None
+        self._io_pool = None
+        self._manager = None
+
+    def _get_solve_pool(self):
+        if self._solve_pool is None:
+            if self.solver_workers > 0:
+                # "spawn" avoids forking a parent that already runs event-loop
+                # and I/O threads; worker processes start on first use
+                self._solve_pool = ProcessPoolExecutor(max_workers=self.solver_workers,
+                                                       mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._solve_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='solver')
+        return self._solve_pool
+
+    def _get_io_pool(self):
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.db_threads, thread_name_prefix='dynamodb')
+        return self._io_pool
+
+    async def _run_timed(self, pool, fn: Callable, args: tuple, kwargs: Dict) -> Any:
+        """Run fn in the pool and record its queue and solve time."""
+        loop = asyncio.get_running_loop()
+        profile = profiling.current()
+        submitted = time.perf_counter()
+        try:
+            if profile is None:
+                busy, result = await loop.run_in_executor(pool, functools.partial(_timed_call, fn, args, kwargs))
+            else:
+                busy, result, stacks = await loop.run_in_executor(
+                    pool, functools.partial(profiling.profiled_call, fn, args, kwargs, profile.interval))
+                profile.merge(stacks, 'solver')
+        except BaseException:
+            metrics.record('solve', time.perf_counter() - submitted)
+            raise
+        metrics.record('queue', max(0.0, time.perf_counter() - submitted - busy))
+        metrics.record('solve', busy)
+        return result
+
+    async def solve(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) in the solver pool.
+
+        fn and its arguments must be picklable when the pool uses processes.
+
+        Raises:
+            SolverBusyError: If the pool and wait queue are full
+        """
+        if self.in_flight >= self.capacity:
+            raise SolverBusyError("Solver queue is full, retry later")
+        # Only the event loop thread touches the counter, so no lock is needed
+        self.in_flight += 1
+        try:
+            return await self._run_timed(self._get_solve_pool(), fn, args, kwargs)
+        finally:
+            self.in_flight -= 1
+
+    async def solve_many(self, fn: Callable, calls: List[Tuple[tuple, Dict]]) -> List[Any]:
+        """
+        Run fn(*args, **kwargs) for each (args, kwargs) in calls in the solver pool.
+
+        The batch takes one admission slot and keeps at most one solve per
+        worker in flight, so single solves still get a turn while it runs.
+
+        Returns:
+            Results in call order; a call that raised gives its exception
+
+        Raises:
+            SolverBusyError: If the pool and wait queue are full
+        """
+        if self.in_flight >= self.capacity:
+            raise SolverBusyError("Solver queue is full, retry later")
+        self.in_flight += 1
+        try:
+            pool = self._get_solve_pool()
+            slots = asyncio.Semaphore(max(self.solver_workers, 1))
+
+            async def run(args, kwargs):
+                async with slots:
+                    return await self._run_timed(pool, fn, args, kwargs)
+
+            return await asyncio.gather(*(run(args, kwargs) for args, kwargs in calls), return_exceptions=True)
+        finally:
+            self.in_flight -= 1
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Submit fn(*args, **kwargs) to the solver pool from a non-async caller.
+
+        Used by background job workers, which do their own queueing and so
+        bypass the admission limit applied to /solve.
+        """
+        return self._get_solve_pool().submit(fn, *args, **kwargs)
+
+    def open_channel(self, min_interval: float = 0.1, schedules: bool = False) -> SolveChannel:
+        """Create a progress/cancellation channel usable from solver workers (see SolveChannel)."""
+        if self.solver_workers > 0:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context('spawn').Manager()
+            return SolveChannel(self._manager.Queue(), self._manager.Event(), min_interval, schedules)
+        return SolveChannel(queue.Queue(), threading.Event(), min_interval, schedules)
+
+    async def io(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking DynamoDB call in the I/O thread pool, in the caller's context."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_io_pool(), functools.partial(context.run, fn, *args, **kwargs))
+
+    def shutdown(self):
+        """Stop both pools, cancelling work that has not started. They restart on next use."""
+        for pool in (self._solve_pool, self._io_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+        self._solve_pool = None
+        self._io_pool = None
+        self._manager = None
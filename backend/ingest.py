@@ -0,0 +1,196 @@
+"""
+Streaming ingest of large vessel files.
+
+NDJSON uploads are parsed line by line as the body arrives. Each vessel is
+validated on its own and appended to a VesselStore, which keeps arrival and
+processing times in packed integer arrays, so the whole file is never held
+in memory as raw bytes, a parsed document and model objects at once.
+
+Format: one JSON object per line. The first line may hold problem options
+instead of a vessel; it is read as options if it has no vessel_id:
+
+    {"planning_horizon": 8760, "num_berths": 6, "solver": "heuristic"}
+    {"vessel_id": "V1", "arrival_time": 0, "processing_time": 5}
+    {"vessel_id": "V2", "arrival_time": 3, "processing_time": 7}
+"""
+
+from array import array
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+
+import numpy as np
+
+# Options allowed on the first line, with their types
+OPTION_TYPES = {
+    'planning_horizon': (int,),
+    'num_berths': (int,),
+    'solver': (str,),
+    'time_limit': (int, float),
+    'window': (int,),
+    'window_overlap': (int,)
+}
+VESSEL_FIELDS = ('vessel_id', 'arrival_time', 'processing_time')
+
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 256 * 1024 * 1024))
+MAX_UPLOAD_VESSELS = int(os.getenv('MAX_UPLOAD_VESSELS', 1_000_000))
+# Longest accepted line; a vessel record is far shorter
+MAX_LINE_BYTES = 64 * 1024
+
+
+class IngestError(ValueError):
+    """Raised for a malformed record; line is 1-based, None for whole-file errors."""
+
+    def __init__(self, message: str, line: Optional[int] = None):
+        super().__init__(f"Line {line}: {message}" if line is not None else message)
+        self.line = line
+
+
+class IngestLimitError(IngestError):
+    """Raised when an upload exceeds the size or vessel-count limit."""
+
+
+class VesselStore:
+    """Vessels in packed arrays: 8 bytes per time value plus the id string."""
+
+    def __init__(self):
+        self.vessel_ids: List[str] = []
+        self.arrival_times = array('q')
+        self.processing_times = array('q')
+        self._seen = set()
+
+    def append(self, vessel_id: str, arrival_time: int, processing_time: int):
+        """
+        Add a vessel.
+
+        Raises:
+            ValueError: If vessel_id is already in the store
+        """
+        if vessel_id in self._seen:
+            raise ValueError(f"Duplicate vessel_id {vessel_id!r}")
+        self._seen.add(vessel_id)
+        self.vessel_ids.append(vessel_id)
+        self.arrival_times.append(arrival_time)
+        self.processing_times.append(processing_time)
+
+    def __len__(self) -> int:
+        return len(self.vessel_ids)
+
+    def columns(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Vessel ids and int64 arrival/processing arrays (sharing the store's buffers)."""
+        return (
+            self.vessel_ids,
+            np.frombuffer(self.arrival_times, dtype=np.int64) if self.arrival_times else np.zeros(0, np.int64),
+            np.frombuffer(self.processing_times, dtype=np.int64) if self.processing_times else np.zeros(0, np.int64)
+        )
+
+    def records(self) -> Iterator[Tuple[str, int, int]]:
+        """(vessel_id, arrival_time, processing_time) tuples in upload order."""
+        return zip(self.vessel_ids, self.arrival_times, self.processing_times)
+
+    def vessel_dicts(self) -> List[Dict]:
+        """Vessels in the API's vessel format."""
+        return [
+            {'vessel_id': vessel_id, 'arrival_time': arrival, 'processing_time': processing}
+            for vessel_id, arrival, processing in self.records()
+        ]
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_options(record: Dict, line: int) -> Dict:
+    for name, value in record.items():
+        if name not in OPTION_TYPES:
+            raise IngestError(f"Unknown option {name!r}", line)
+        if isinstance(value, bool) or not isinstance(value, OPTION_TYPES[name]):
+            raise IngestError(f"Option {name!r} has the wrong type", line)
+    return record
+
+
+def _add_vessel(store: VesselStore, record: Dict, line: int):
+    if set(record) != set(VESSEL_FIELDS):
+        missing = [field for field in VESSEL_FIELDS if field not in record]
+        extra = sorted(set(record) - set(VESSEL_FIELDS))
+        raise IngestError(f"Missing fields {missing}" if missing else f"Unknown fields {extra}", line)
+    vessel_id = record['vessel_id']
+    if not isinstance(vessel_id, str) or not vessel_id:
+        raise IngestError("vessel_id must be a non-empty string", line)
+    for field in ('arrival_time', 'processing_time'):
+        if not _is_int(record[field]):
+            raise IngestError(f"{field} must be an integer", line)
+        if not -2**63 <= record[field] < 2**63:
+            raise IngestError(f"{field} is out of range", line)
+    try:
+        store.append(vessel_id, record['arrival_time'], record['processing_time'])
+    except ValueError as e:
+        raise IngestError(str(e), line)
+
+
+async def read_ndjson(chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None,
+                      max_vessels: Optional[int] = None) -> Tuple[Dict, VesselStore]:
+    """
+    Parse an NDJSON vessel stream as it arrives.
+
+    Args:
+        chunks: Body chunks, e.g. Request.stream()
+        max_bytes: Largest accepted body (defaults to env MAX_UPLOAD_BYTES)
+        max_vessels: Most vessels accepted (defaults to env MAX_UPLOAD_VESSELS)
+
+    Returns:
+        (options from the first line or {}, vessel store)
+
+    Raises:
+        IngestError: On the first malformed record, with its line number
+        IngestLimitError: When a limit is exceeded
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    max_vessels = MAX_UPLOAD_VESSELS if max_vessels is None else max_vessels
+
+    options: Dict = {}
+    store = VesselStore()
+    received = 0
+    line = 0
+    pending = b''
+
+    def parse_line(raw: bytes):
+        nonlocal options
+        if not raw.strip():
+            return
+        try:
+            record = json.loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise IngestError(f"Invalid JSON ({e.msg if hasattr(e, 'msg') else e})", line)
+        if not isinstance(record, dict):
+            raise IngestError("Expected a JSON object", line)
+        if line == 1 and 'vessel_id' not in record:
+            options = _parse_options(record, line)
+            return
+        if len(store) >= max_vessels:
+            raise IngestLimitError(f"More than {max_vessels} vessels")
+        _add_vessel(store, record, line)
+
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise IngestLimitError(f"Upload larger than {max_bytes} bytes")
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b'\n', start)
+            if end < 0:
+                break
+            line += 1
+            parse_line(pending[start:end])
+            start = end + 1
+        pending = pending[start:]
+        if len(pending) > MAX_LINE_BYTES:
+            raise IngestError("Line too long", line + 1)
+
+    if pending:
+        line += 1
+        parse_line(pending)
+    if not len(store):
+        raise IngestError("No vessels in upload")
+    return options, store
@@ -0,0 +1,243 @@
+"""
+Background solve jobs.
+
+POST /jobs enqueues a scheduling request and returns at once; clients poll
+GET /jobs/{job_id} for status and progress and may cancel with DELETE.
+JobQueue is the interface the API depends on. InMemoryJobQueue runs jobs on
+worker threads inside the API process; other implementations (for example
+backed by a shared queue service and separate worker machines) can be
+selected with the JOB_QUEUE_BACKEND environment variable.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import os
+import queue
+import threading
+import time
+import uuid
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobQueueFullError(Exception):
+    """Raised when no more jobs can be queued."""
+
+
+class JobCancelledError(Exception):
+    """Raised by a job handler when it stops because the job was cancelled."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Job:
+    """A queued or running solve."""
+    job_id: str
+    request: Any
+    time_limit: Optional[float] = None
+    status: str = QUEUED
+    progress: float = 0.0
+    makespan: Optional[int] = None
+    lower_bound: Optional[int] = None
+    error: Optional[str] = None
+    result: Optional[Dict] = None
+    created_at: str = field(default_factory=_now)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    # Set by the handler while the solve runs, so cancel() can reach it
+    channel: Any = None
+    cancel_requested: bool = False
+    _started: Optional[float] = None
+
+    @property
+    def problem_id(self) -> str:
+        """Results are saved under the job id."""
+        return self.job_id
+
+    def report(self, update: Dict):
+        """Record a progress update from the solver."""
+        self.makespan = update.get('makespan', self.makespan)
+        self.lower_bound = update.get('lower_bound', self.lower_bound)
+        if self.time_limit and 'elapsed' in update:
+            # Time-limited solvers finish by the deadline at the latest
+            self.progress = max(self.progress, min(0.99, update['elapsed'] / self.time_limit))
+
+    def to_dict(self) -> Dict:
+        """Public view of the job for the API."""
+        return {
+            'job_id': self.job_id,
+            'problem_id': self.problem_id,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'makespan': self.makespan,
+            'lower_bound': self.lower_bound,
+            'error': self.error,
+            'result': self.result,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed': (time.monotonic() - self._started) if self._started and not self.finished_at else None
+        }
+
+
+class JobQueue(ABC):
+    """Interface for submitting, inspecting and cancelling solve jobs."""
+
+    @abstractmethod
+    def submit(self, request: Any, time_limit: Optional[float] = None) -> Job:
+        """
+        Queue a scheduling request.
+
+        Raises:
+            JobQueueFullError: If the queue cannot accept more jobs
+        """
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job. Returns None if it is unknown."""
+
+    def shutdown(self):
+        """Stop accepting jobs and release workers."""
+
+
+class InMemoryJobQueue(JobQueue):
+    """
+    Job queue served by worker threads in this process.
+
+    Each worker takes the next job and calls handler(job), which runs the
+    solve (normally in the solver process pool), updates job progress and
+    returns a result summary. Finished jobs are kept for retention seconds.
+    """
+
+    def __init__(self, handler: Callable[[Job], Dict], workers: Optional[int] = None,
+                 max_queued: Optional[int] = None, retention: Optional[float] = None):
+        """
+        Initialize the queue.
+
+        Args:
+            handler: Runs a job and returns its result summary
+            workers: Worker threads (defaults to env JOB_WORKERS or 2)
+            max_queued: Jobs allowed to wait (defaults to env JOB_QUEUE_SIZE or 100)
+            retention: Seconds finished jobs stay visible (defaults to env JOB_RETENTION or 3600)
+        """
+        self.handler = handler
+        self.workers = workers if workers is not None else int(os.getenv('JOB_WORKERS', 2))
+        self.max_queued = max_queued if max_queued is not None else int(os.getenv('JOB_QUEUE_SIZE', 100))
+        self.retention = retention if retention is not None else float(os.getenv('JOB_RETENTION', 3600))
+
+        self._jobs: Dict[str, Job] = {}
+        self._finished: Dict[str, float] = {}
+        self._queue: queue.Queue = queue.Queue()
+        self._waiting = 0  # queued jobs not yet cancelled or picked up
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for _ in range(self.workers - len(self._threads)):
+                thread = threading.Thread(target=self._work, name='job-worker', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.retention
+        with self._lock:
+            for job_id in [j for j, finished in self._finished.items() if finished < cutoff]:
+                self._finished.pop(job_id)
+                self._jobs.pop(job_id, None)
+
+    def submit(self, request: Any, time_limit: Optional[float] = None) -> Job:
+        self._expire()
+        job = Job(job_id=str(uuid.uuid4()), request=request, time_limit=time_limit)
+        with self._lock:
+            if self._waiting >= self.max_queued:
+                raise JobQueueFullError("Job queue is full, retry later")
+            self._waiting += 1
+            self._jobs[job.job_id] = job
+        self._queue.put(job)
+        self._ensure_workers()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                self._waiting -= 1
+                self._finish(job, CANCELLED)
+            elif job.channel is not None:
+                job.channel.cancel()
+            return job
+
+    def _finish(self, job: Job, status: str):
+        """Mark a job finished. Caller holds the lock."""
+        job.status = status
+        job.finished_at = _now()
+        self._finished[job.job_id] = time.monotonic()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != QUEUED:
+                    continue
+                self._waiting -= 1
+                job.status = RUNNING
+                job.started_at = _now()
+                job._started = time.monotonic()
+            try:
+                result = self.handler(job)
+            except JobCancelledError:
+                with self._lock:
+                    self._finish(job, CANCELLED)
+            except Exception as e:
+                with self._lock:
+                    job.error = str(e)
+                    self._finish(job, FAILED)
+            else:
+                with self._lock:
+                    job.result = result
+                    job.progress = 1.0
+                    self._finish(job, COMPLETED)
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == RUNNING and job.channel is not None:
+                    job.channel.cancel()
+            threads = list(self._threads)
+            self._threads = []
+        for _ in threads:
+            self._queue.put(None)
+
+
+def create_job_queue(handler: Callable[[Job], Dict]) -> JobQueue:
+    """Build the job queue selected by env JOB_QUEUE_BACKEND (default 'memory')."""
+    backend = os.getenv('JOB_QUEUE_BACKEND', 'memory')
+    if backend == 'memory':
+        return InMemoryJobQueue(handler)
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {backend}")
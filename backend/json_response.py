@@ -0,0 +1,42 @@
+"""
+JSON responses encoded once, with orjson.
+
+A route that returns a dict has FastAPI walk it with jsonable_encoder and
+then encode it with the stdlib json module; for a schedule of 50k vessels
+that walk costs more than the solve. Routes that return solutions encode
+them with encode_json instead and return the bytes in a FastJSONResponse,
+which FastAPI sends as is. The bytes can be kept and sent again (see
+cache.SolutionCache) without encoding the solution a second time.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import Response
+import orjson
+
+# numpy scalars and arrays from the solver; integer dict keys as strings, like json.dumps
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    # Numbers of items read back from DynamoDB
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON")
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode a response body as compact UTF-8 JSON."""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(Response):
+    """JSON response whose content is encoded with orjson, or already encoded bytes."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return encode_json(content)
@@ -0,0 +1,293 @@
+"""
+Anytime local search for the berth scheduling problem.
+
+Starts from an existing schedule (normally the FCFS heuristic) and moves
+vessels between berths until a wall-clock deadline:
+
+- relocate: move one vessel to another berth
+- swap: exchange two vessels on different berths
+- or-opt: move a run of 2-3 consecutive vessels to another berth
+
+Each berth keeps its vessels in arrival order, which is optimal for a single
+berth, so a move only changes the two berths involved. Their end times are
+recomputed in O(affected berths) and the makespan is read from a running
+top-three of berth end times, never by rebuilding the whole schedule.
+
+With berth limits (see berth_model), moves to a berth a vessel does not fit
+are skipped by a bitset check, and start times step over berth closures.
+"""
+
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional
+import heapq
+import random
+import time
+
+from solver import BerthSchedulingProblem, ProgressCallback
+from berth_model import BerthModel
+from exact_solver import makespan_lower_bound
+
+# Longest run of consecutive vessels moved by one or-opt move
+_MAX_CHAIN = 3
+# Random relocations applied when the search is stuck in a local optimum
+_KICK_SIZE = 3
+
+
+def improve_schedule(problem: BerthSchedulingProblem, initial: Dict, time_limit: float = 1.0,
+                     seed: Optional[int] = 0, callback: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Improve a schedule with local search until the time limit.
+
+    Args:
+        problem: Problem instance
+        initial: Result dict with a feasible 'schedule' for the problem,
+            e.g. from solve_berth_scheduling
+        time_limit: Wall-clock budget in seconds
+        seed: Seed for move order and perturbations
+        callback: Optional progress callback, called on every new best
+            schedule and periodically; returning False stops the search
+
+    Returns:
+        Dictionary with the same keys as solve_berth_scheduling plus
+        lower_bound and optimality_gap. The schedule is the best one found.
+    """
+    start_time = time.time()
+    deadline = start_time + time_limit
+    rng = random.Random(seed)
+
+    vessels = sorted(problem.vessels, key=lambda v: v.arrival_time)
+    arrivals = [v.arrival_time for v in vessels]
+    processing = [v.processing_time for v in vessels]
+    horizon = problem.planning_horizon
+    num_berths = problem.num_berths
+    available = problem.berth_available or [0] * num_berths
+    bound = makespan_lower_bound(problem)
+    model = BerthModel.from_problem(problem, vessels)
+    masks = model.masks if model is not None else None
+    # Closure-aware start times are only needed when some berth has closures
+    closed = model.start if model is not None and model.has_closures else None
+
+    def fits(moved: List[int], berth: int) -> bool:
+        return masks is None or all(masks[i] >> berth & 1 for i in moved)
+
+    # Vessel indices follow arrival order, so sorted berth sequences are in
+    # arrival order too and a vessel's position is found with bisect.
+    sequences: List[List[int]] = [[] for _ in range(num_berths)]
+    for index, vessel in enumerate(vessels):
+        sequences[initial['schedule'][vessel.vessel_id]['berth']].append(index)
+
+    def completion_times(berth: int, sequence: List[int]) -> List[int]:
+        """Time the berth becomes free after each vessel of sequence."""
+        times = []
+        t = available[berth]
+        for i in sequence:
+            start = max(arrivals[i], t)
+            if closed is not None:
+                start = closed(berth, start, processing[i])
+            t = start + processing[i]
+            times.append(t)
+        return times
+
+    completions = [completion_times(berth, sequence) for berth, sequence in enumerate(sequences)]
+    ends = [times[-1] if times else available[berth] for berth, times in enumerate(completions)]
+    # Secondary objective: sum of squared end times, which rewards balancing
+    # load away from busy berths even when the makespan cannot drop yet
+    total = sum(end * end for end in ends)
+
+    def top_three():
+        return heapq.nlargest(3, range(num_berths), key=ends.__getitem__)
+
+    top = top_three()
+    makespan = ends[top[0]] if top else 0
+
+    def makespan_without(a: int, b: int) -> int:
+        """Largest end time over berths other than a and b."""
+        for berth in top:
+            if berth != a and berth != b:
+                return ends[berth]
+        return 0
+
+    def changed_end(berth: int, removed: List[int], inserted: List[int]) -> Optional[int]:
+        """
+        End time of berth after removing and inserting vessels (sorted index
+        lists), None if a start would break the horizon.
+
+        Only the suffix from the first change is replayed, and the replay stops
+        as soon as the berth is free at the same time as before the change,
+        because everything after that point is unchanged.
+        """
+        sequence = sequences[berth]
+        times = completions[berth]
+        n = len(sequence)
+        first = n
+        last_removed = -1
+        if removed:
+            first = bisect_left(sequence, removed[0])
+            last_removed = bisect_left(sequence, removed[-1])
+        if inserted:
+            first = min(first, bisect_left(sequence, inserted[0]))
+        t = times[first - 1] if first else available[berth]
+        k = first
+        j = 0
+        while k < n or j < len(inserted):
+            if j < len(inserted) and (k >= n or inserted[j] < sequence[k]):
+                i = inserted[j]
+                j += 1
+                original = False
+            else:
+                i = sequence[k]
+                k += 1
+                if i in removed:
+                    continue
+                original = True
+            start = arrivals[i] if arrivals[i] > t else t
+            if closed is not None:
+                start = closed(berth, start, processing[i])
+            if start >= horizon:
+                return None
+            t = start + processing[i]
+            if original and j == len(inserted) and k > last_removed and t == times[k - 1]:
+                return ends[berth]
+        return t
+
+    def evaluate(a: int, removed_a: List[int], inserted_a: List[int],
+                 b: int, removed_b: List[int], inserted_b: List[int]):
+        """Objective (makespan, sum of squared end times) and new end times after a move between a and b."""
+        end_a = changed_end(a, removed_a, inserted_a)
+        if end_a is None:
+            return None
+        end_b = changed_end(b, removed_b, inserted_b)
+        if end_b is None:
+            return None
+        new_makespan = max(end_a, end_b, makespan_without(a, b))
+        new_total = total - ends[a] * ends[a] - ends[b] * ends[b] + end_a * end_a + end_b * end_b
+        return (new_makespan, new_total), end_a, end_b
+
+    def apply(a: int, removed_a: List[int], inserted_a: List[int],
+              b: int, removed_b: List[int], inserted_b: List[int]):
+        nonlocal total, top, makespan
+        for berth, removed, inserted in ((a, removed_a, inserted_a), (b, removed_b, inserted_b)):
+            sequence = [i for i in sequences[berth] if i not in removed]
+            for i in inserted:
+                insort(sequence, i)
+            sequences[berth] = sequence
+            completions[berth] = completion_times(berth, sequence)
+            end = completions[berth][-1] if sequence else available[berth]
+            total += end * end - ends[berth] * ends[berth]
+            ends[berth] = end
+        top = top_three()
+        makespan = ends[top[0]]
+
+    def moves_from(a: int):
+        """Candidate moves taking vessels off berth a, as (removed_a, inserted_a, b, removed_b, inserted_b)."""
+        seq_a = sequences[a]
+        others = [b for b in range(num_berths) if b != a]
+        # Least loaded berths first, random among equals
+        rng.shuffle(others)
+        others.sort(key=ends.__getitem__)
+        positions = list(range(len(seq_a)))
+        rng.shuffle(positions)
+        # relocate
+        for pos in positions:
+            moved = [seq_a[pos]]
+            for b in others:
+                if fits(moved, b):
+                    yield moved, [], b, [], moved
+        # or-opt
+        for length in range(2, _MAX_CHAIN + 1):
+            for pos in positions:
+                chain = seq_a[pos:pos + length]
+                if len(chain) == length:
+                    for b in others:
+                        if fits(chain, b):
+                            yield chain, [], b, [], chain
+        # swap with a shorter vessel, which is the only way a swap shortens berth a
+        for b in others:
+            for pos in positions:
+                v = seq_a[pos]
+                for w in sequences[b]:
+                    if processing[w] < processing[v] and fits([v], b) and fits([w], a):
+                        yield [v], [w], b, [w], [v]
+
+    def improve_once() -> Optional[bool]:
+        """Apply the first improving move. False at a local optimum, None on timeout."""
+        current = (makespan, total)
+        critical = [b for b in range(num_berths) if ends[b] == makespan]
+        rng.shuffle(critical)
+        checked = 0
+        for a in critical:
+            for removed_a, inserted_a, b, removed_b, inserted_b in moves_from(a):
+                checked += 1
+                if checked % 256 == 0 and (time.time() > deadline or not report()):
+                    return None
+                outcome = evaluate(a, removed_a, inserted_a, b, removed_b, inserted_b)
+                if outcome is not None and outcome[0] < current:
+                    apply(a, removed_a, inserted_a, b, removed_b, inserted_b)
+                    return True
+        return False
+
+    def kick():
+        """Random feasible relocations to leave a local optimum."""
+        for _ in range(_KICK_SIZE):
+            a = rng.randrange(num_berths)
+            if not sequences[a]:
+                continue
+            b = rng.choice([x for x in range(num_berths) if x != a])
+            moved = [rng.choice(sequences[a])]
+            if fits(moved, b) and evaluate(a, moved, [], b, [], moved) is not None:
+                apply(a, moved, [], b, [], moved)
+
+    best_makespan = makespan
+    best_sequences = [sequence[:] for sequence in sequences]
+    iterations = 0
+
+    def best_schedule() -> Dict:
+        schedule = {}
+        for berth, sequence in enumerate(best_sequences):
+            t = available[berth]
+            for i in sequence:
+                start = max(arrivals[i], t)
+                if closed is not None:
+                    start = closed(berth, start, processing[i])
+                t = start + processing[i]
+                schedule[vessels[i].vessel_id] = {
+                    'berth': berth,
+                    'start_time': start,
+                    'end_time': t,
+                    'arrival_time': arrivals[i],
+                    'processing_time': processing[i]
+                }
+        # Same arrival-ordered keys as the heuristic's schedule
+        return {v.vessel_id: schedule[v.vessel_id] for v in vessels}
+
+    def report() -> bool:
+        if callback is None:
+            return True
+        return callback({
+            'makespan': best_makespan,
+            'lower_bound': bound,
+            'elapsed': time.time() - start_time,
+            'schedule': best_schedule
+        })
+
+    while vessels and num_berths > 1 and best_makespan > bound and time.time() < deadline:
+        iterations += 1
+        improved = improve_once()
+        if improved is None:
+            break
+        if makespan < best_makespan:
+            best_makespan = makespan
+            best_sequences = [sequence[:] for sequence in sequences]
+            if not report():
+                break
+        if not improved:
+            kick()
+
+    return {
+        'schedule': best_schedule(),
+        'makespan': best_makespan,
+        'solving_time': time.time() - start_time,
+        'lower_bound': bound,
+        'optimality_gap': (best_makespan - bound) / best_makespan if best_makespan else 0.0,
+        'iterations': iterations
+    }
@@ -2,22 +2,47 @@
 FastAPI backend for berth scheduling problem solver.
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Header, Request, Response, Body
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError, field_validator
+from typing import Any, Callable, List, Dict, Literal, Optional, Tuple
+import asyncio
 import json
 import os
+import time
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 import uuid
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
-from solver import solve_berth_scheduling, BerthSchedulingProblem, VesselData
+import numpy as np
+
+from dispatch import run_solver
+from cache import SolutionCache, problem_hash
 from database import DynamoDBManager
+from storage import create_storage, unsaved_solution
+from async_database import AsyncDynamoDBManager
+from executor import SolverExecutor, SolverBusyError
+from ingest import IngestError, IngestLimitError, read_ndjson
+from repair import repair_schedule
+from rolling import join_results, split_independent
+from portfolio import pick_best, portfolio_strategies, run_strategy, strategy_budget
+from exact_solver import lower_bound
+from jobs import Job, JobCancelledError, JobQueueFullError, create_job_queue
+from persistence import DEFAULT_MODE as DEFAULT_PERSISTENCE, WriteBehindQueue
+from json_response import FastJSONResponse, encode_json
+from compression import CompressionMiddleware
+from etags import ETagIndex, body_etag, etag_matches, solution_etag
+import metrics
+import profiling
+import streaming
 
 load_dotenv()
 
 app = FastAPI(title="Berth Scheduling Solver API")
+# Stage timings for /metrics and the Server-Timing header on every route
+app.router.route_class = metrics.TimedRoute
 
 # Enable CORS
 app.add_middleware(
@@ -28,13 +53,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database
-db = DynamoDBManager()
+# gzip/brotli for JSON and text responses, with an ETag per encoding
+app.add_middleware(CompressionMiddleware)
+
+# Per-request profiling on demand; not installed at all unless enabled
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Initialize database (backend from env STORAGE_BACKEND)
+db = create_storage()
+# Awaitable DynamoDB calls on aioboto3 instead of the I/O thread pool (optional)
+async_db = AsyncDynamoDBManager(db) if os.getenv('DB_ASYNC', 'false').lower() == 'true' \
+    and isinstance(db, DynamoDBManager) else None
+# Latest version timestamp by problem_id, and ETag by listing query, for 304 answers without reads
+latest_versions = ETagIndex()
+listing_etags = ETagIndex()
+
+def _flush_solutions(solutions: List[Tuple[str, Dict]]) -> bool:
+    """Save solutions queued for write-behind; listings change once they are saved."""
+    saved = db.save_solutions(solutions)
+    listing_etags.clear()
+    return saved
+
+# Saves of solutions solved with persistence "async" (settings from env)
+write_behind = WriteBehindQueue(_flush_solutions)
+
+# Solver process pool and DynamoDB thread pool (sizes from env)
+executor = SolverExecutor()
+
+# Recently solved problems by canonical hash (sizes from env)
+solution_cache = SolutionCache()
+# Also look up identical problems saved by other API processes
+CACHE_DYNAMODB = os.getenv('SOLUTION_CACHE_DYNAMODB', 'false').lower() == 'true'
+
+# Largest number of problems accepted by /solve/batch
+MAX_BATCH_SIZE = int(os.getenv('SOLVE_BATCH_MAX', 1000))
 
 # Create table if it doesn't exist
 try:
     db.create_table()
-    print("DynamoDB table created or already exists")
+    print("Solution tables created or already exist")
 except Exception as e:
     print(f"Note: Table might already exist or error creating: {e}")
 
@@ -44,10 +102,48 @@ class Vessel(BaseModel):
     arrival_time: int
     processing_time: int
 
+class VesselSpec(Vessel):
+    length: Optional[float] = None  # Metres; only checked against berths with a max_length
+    draft: Optional[float] = None  # Metres; only checked against berths with a max_draft
+
+class Berth(BaseModel):
+    max_length: Optional[float] = None  # None accepts any vessel length
+    max_draft: Optional[float] = None  # None accepts any vessel draft
+    closures: List[Tuple[int, int]] = []  # [start, end) hours during which the berth is closed
+
 class SchedulingRequest(BaseModel):
-    vessels: List[Vessel]
+    vessels: List[VesselSpec]
     planning_horizon: Optional[int] = 72  # Default: 3 days in hours
     num_berths: Optional[int] = 2  # Default: 2 berths
+    solver: Literal["heuristic", "exact", "local_search", "portfolio"] = "heuristic"
+    time_limit: Optional[float] = 10.0  # Seconds, for the exact, local_search and portfolio solvers
+    window: Optional[int] = None  # Hours per rolling-horizon window; None solves all at once
+    window_overlap: Optional[int] = None  # Hours shared by consecutive windows (default window // 4)
+    berths: Optional[List[Berth]] = None  # One per berth; None means identical berths that are always open
+    persistence: Literal["sync", "async"] = DEFAULT_PERSISTENCE  # "async" replies before the save completes
+
+    @field_validator('vessels')
+    @classmethod
+    def _unique_vessel_ids(cls, vessels: List[VesselSpec]) -> List[VesselSpec]:
+        # Schedules are keyed by vessel_id, as in NDJSON uploads (see ingest)
+        seen = set()
+        for vessel in vessels:
+            if vessel.vessel_id in seen:
+                raise ValueError(f"Duplicate vessel_id {vessel.vessel_id!r}")
+            seen.add(vessel.vessel_id)
+        return vessels
+
+class VesselUpdate(BaseModel):
+    vessel_id: str
+    arrival_time: Optional[int] = None
+    processing_time: Optional[int] = None
+
+class SolutionPatch(BaseModel):
+    current_time: int = 0  # Vessels that started before this time stay where they are
+    updates: List[VesselUpdate] = []
+    add: List[Vessel] = []
+    remove: List[str] = []
+    planning_horizon: Optional[int] = None  # Defaults to the saved solution's horizon
 
 class SchedulingResult(BaseModel):
     problem_id: str
@@ -56,13 +152,223 @@ class SchedulingResult(BaseModel):
     makespan: int
     solving_time: float
     timestamp: str
+    lower_bound: Optional[int] = None
+    optimality_gap: Optional[float] = None
+    portfolio: Optional[Dict] = None  # Strategy report of the portfolio solver; not stored
+
+def _solver_columns(request: SchedulingRequest):
+    """Vessel ids and arrival/processing arrays for the solver pool."""
+    vessel_ids = [v.vessel_id for v in request.vessels]
+    arrival_times = np.fromiter((v.arrival_time for v in request.vessels),
+                                dtype=np.int64, count=len(vessel_ids))
+    processing_times = np.fromiter((v.processing_time for v in request.vessels),
+                                   dtype=np.int64, count=len(vessel_ids))
+    return vessel_ids, arrival_times, processing_times
+
+def _vessel_dicts(request: SchedulingRequest) -> List[Dict]:
+    """Request vessels as plain dicts, for responses and storage."""
+    return [
+        {'vessel_id': v.vessel_id, 'arrival_time': v.arrival_time, 'processing_time': v.processing_time}
+        for v in request.vessels
+    ]
+
+def _vessel_sizes(request: SchedulingRequest):
+    """Vessel length and draft arrays (NaN when unknown), or (None, None) if no vessel has a size."""
+    if not any(v.length is not None or v.draft is not None for v in request.vessels):
+        return None, None
+    count = len(request.vessels)
+    lengths = np.fromiter((np.nan if v.length is None else v.length for v in request.vessels),
+                          dtype=np.float64, count=count)
+    drafts = np.fromiter((np.nan if v.draft is None else v.draft for v in request.vessels),
+                         dtype=np.float64, count=count)
+    return lengths, drafts
+
+def _problem_key(request: SchedulingRequest) -> str:
+    """Canonical hash of a request for the solution cache."""
+    if request.berths is None:
+        vessels = ((v.vessel_id, v.arrival_time, v.processing_time) for v in request.vessels)
+    else:
+        vessels = ((v.vessel_id, v.arrival_time, v.processing_time, v.length, v.draft) for v in request.vessels)
+    return problem_hash(
+        vessels,
+        request.planning_horizon,
+        request.num_berths,
+        request.solver,
+        request.time_limit,
+        request.window,
+        request.window_overlap,
+        _berth_dicts(request)
+    )
+
+def _berth_dicts(options) -> Optional[List[Dict]]:
+    """Berth limits and closures of a request as plain dicts, or None."""
+    if getattr(options, 'berths', None) is None:
+        return None
+    return [berth.model_dump() for berth in options.berths]
+
+def _solver_options(options: SchedulingRequest) -> Dict:
+    """Keyword arguments for run_solver from a request's options."""
+    kwargs = {
+        "num_berths": options.num_berths,
+        "planning_horizon": options.planning_horizon,
+        "solver": options.solver,
+        "time_limit": options.time_limit,
+        "window": options.window,
+        "window_overlap": options.window_overlap
+    }
+    if options.berths is not None:
+        kwargs["berths"] = _berth_dicts(options)
+        kwargs["lengths"], kwargs["drafts"] = _vessel_sizes(options)
+    return kwargs
+
+def _scheduling_result(problem_id: str, vessels: List[Dict], result: Dict) -> Dict:
+    """Solution dict (the fields of SchedulingResult) for a problem solved now."""
+    solution = {
+        'problem_id': problem_id,
+        'vessels': vessels,
+        'schedule': result['schedule'],
+        'makespan': int(result['makespan']),
+        'solving_time': float(result['solving_time']),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'lower_bound': result.get('lower_bound'),
+        'optimality_gap': result.get('optimality_gap')
+    }
+    if result.get('portfolio') is not None:
+        solution['portfolio'] = result['portfolio']
+    return solution
+
+def _saved_solution(solution: Dict, key: Optional[str], options) -> Dict:
+    """Data saved for a solution: the solution plus its problem hash and problem options."""
+    data = {**solution, 'num_berths': options.num_berths, 'planning_horizon': options.planning_horizon}
+    if getattr(options, 'berths', None) is not None:
+        data['berths'] = _berth_dicts(options)
+    if key is not None:
+        data['problem_hash'] = key
+    return data
+
+def _stored_result(item: Dict) -> Dict:
+    """Response dict (the fields of SchedulingResult) for a solution item read back from the database."""
+    return {
+        'problem_id': item['problem_id'],
+        'vessels': item['vessels'],
+        'schedule': item['schedule'],
+        'makespan': int(item['makespan']),
+        'solving_time': float(item['solving_time']),
+        'timestamp': item['timestamp'],
+        'lower_bound': int(item['lower_bound']) if item.get('lower_bound') is not None else None,
+        'optimality_gap': float(item['optimality_gap']) if item.get('optimality_gap') is not None else None
+    }
+
+def _run_job(job: Job) -> Dict:
+    """Solve a queued request in the solver pool and save it under the job's problem_id; the job fails if the save does."""
+    request = job.request
+    vessel_ids, arrival_times, processing_times = _solver_columns(request)
+    channel = executor.open_channel()
+    job.channel = channel
+    if job.cancel_requested:
+        raise JobCancelledError()
+    future = executor.submit(
+        run_solver,
+        vessel_ids,
+        arrival_times,
+        processing_times,
+        channel=channel,
+        **_solver_options(request)
+    )
+    while True:
+        try:
+            result = future.result(timeout=0.25)
+            break
+        except FuturesTimeoutError:
+            for update in channel.drain():
+                job.report(update)
+    if channel.cancelled:
+        raise JobCancelledError()
+
+    solution = _scheduling_result(job.problem_id, _vessel_dicts(request), result)
+    key = _problem_key(request)
+    if not db.save_solution(job.problem_id, _saved_solution(solution, key, request)):
+        raise RuntimeError("Failed to save the solution")
+    solution_cache.put(key, solution)
+    _forget_etags()
+    job.makespan = solution['makespan']
+    job.lower_bound = solution['lower_bound']
+    return {
+        'makespan': solution['makespan'],
+        'solving_time': solution['solving_time'],
+        'lower_bound': solution['lower_bound'],
+        'optimality_gap': solution['optimality_gap']
+    }
+
+# Background solve jobs (backend from env JOB_QUEUE_BACKEND)
+jobs = create_job_queue(_run_job)
+
+async def _db(method: str, *args, **kwargs) -> Any:
+    """Call a database method, awaited on aioboto3 when enabled and supported, else in the I/O pool."""
+    if async_db is not None and hasattr(async_db, method):
+        return await getattr(async_db, method)(*args, **kwargs)
+    return await executor.io(getattr(db, method), *args, **kwargs)
+
+def _forget_etags(problem_id: Optional[str] = None):
+    """Drop remembered ETags after this process saved or deleted solutions (of problem_id)."""
+    if problem_id is not None:
+        latest_versions.discard(problem_id)
+    listing_etags.clear()
+
+async def _save_solution(problem_id: str, data: Dict, options) -> bool:
+    """Save a solution, or queue it for the write-behind flusher with persistence "async"."""
+    if getattr(options, 'persistence', 'sync') == 'async' and write_behind.enqueue(problem_id, data):
+        return True
+    saved = await _db('save_solution', problem_id, data)
+    if saved:
+        _forget_etags()
+    return saved
+
+def _etag_headers(etag: str) -> Dict[str, str]:
+    """Headers of a response with an ETag; clients revalidate before reusing it."""
+    return {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=_etag_headers(etag))
+
+def _utc_timestamp(value: str) -> str:
+    """An ISO 8601 time as a UTC timestamp comparable with saved ones (naive times are taken as UTC)."""
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid timestamp: {value!r}; expected ISO 8601, e.g. 2026-01-31T12:00:00Z")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+@app.on_event("startup")
+async def start_persistence():
+    """Open the aioboto3 client and replay solutions spilled by earlier runs."""
+    if async_db is not None:
+        await async_db.open()
+    write_behind.start()
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    """Stop job workers, flush queued saves, then stop solver processes and I/O threads."""
+    jobs.shutdown()
+    await asyncio.to_thread(write_behind.shutdown)
+    if async_db is not None:
+        await async_db.close()
+    executor.shutdown()
 
 @app.get("/health")
 def health_check():
     """Health check endpoint."""
     return {"status": "ok"}
 
-@app.post("/solve")
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus metrics: request stage timings, errors and DynamoDB retries."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.post("/solve", response_model=SchedulingResult, response_class=FastJSONResponse)
 async def solve_scheduling(request: SchedulingRequest):
     """
     Solve the berth scheduling problem.
@@ -72,49 +378,288 @@ async def solve_scheduling(request: SchedulingRequest):
         "vessels": [
             {"vessel_id": "V1", "arrival_time": 0, "processing_time": 5},
             ...
-        ]
+        ],
+        "solver": "heuristic" | "exact" | "local_search" | "portfolio",  # optional
+        "time_limit": 10.0,  # optional, seconds for "exact", "local_search" and "portfolio"
+        "window": 48,  # optional, solve in rolling-horizon windows of this many hours
+        "berths": [{"max_length": 300, "max_draft": 14.5, "closures": [[24, 30]]}, ...],  # optional
+        "persistence": "sync" | "async"  # optional
     }
+    
+    With berths, vessels may also carry length and draft (metres); a
+    vessel only goes to berths it fits, and never into a closure.
+    
+    With persistence "async" the response is sent before the solution is
+    saved; it is saved shortly after by the write-behind queue (see
+    persistence) and can be fetched by problem_id meanwhile.
+    
+    An identical problem solved earlier (same vessels in any order and same
+    options) is answered from the solution cache without solving or saving
+    again; the X-Cache response header reports HIT or MISS. The
+    Server-Timing header breaks the request down into stages (see /metrics).
+    
+    The request is validated by pydantic; the response is not. It is
+    encoded once with orjson and sent as is (see json_response).
     """
     try:
-        # Create problem instance
-        problem = BerthSchedulingProblem(
-            vessels=[
-                VesselData(
-                    vessel_id=v.vessel_id,
-                    arrival_time=v.arrival_time,
-                    processing_time=v.processing_time
-                )
-                for v in request.vessels
-            ],
-            planning_horizon=request.planning_horizon,
-            num_berths=request.num_berths
-        )
-        
-        # Solve the problem
-        result = solve_berth_scheduling(problem)
-        
-        # Generate problem ID
-        problem_id = str(uuid.uuid4())
-        
-        # Prepare response
-        response = SchedulingResult(
-            problem_id=problem_id,
-            vessels=request.vessels,
-            schedule=result['schedule'],
-            makespan=result['makespan'],
-            solving_time=result['solving_time'],
-            timestamp=datetime.now(timezone.utc).isoformat()
+        with metrics.stage('convert'):
+            vessel_ids, arrival_times, processing_times = _solver_columns(request)
+            key = _problem_key(request)
+        return await _solve_and_save(
+            key,
+            (vessel_ids, arrival_times, processing_times),
+            lambda: _vessel_dicts(request),
+            request
         )
-        
-        # Save to database
-        db.save_solution(problem_id, response.dict())
-        
-        return response
+    except SolverBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _solve_rolling(columns, options: SchedulingRequest) -> Dict:
+    """
+    Solve a rolling-horizon problem in the solver pool.
+
+    Stretches of the timeline that do not affect each other are solved in
+    parallel and joined; if they turn out to overlap, the problem is solved
+    again in one piece. The stretches run at the same time (there are no
+    more of them than solver workers), so each gets the whole time limit
+    rather than a share of it.
+    """
+    vessel_ids, arrival_times, processing_times = columns
+    started = time.time()
+    parts = await executor.solve(split_independent, arrival_times, processing_times, options.num_berths,
+                                 max(executor.solver_workers, 1))
+    if len(parts) > 1:
+        calls = []
+        for part in parts:
+            calls.append((([vessel_ids[i] for i in part.tolist()], arrival_times[part], processing_times[part]),
+                          _solver_options(options)))
+        results = await executor.solve_many(run_solver, calls)
+        for outcome in results:
+            if isinstance(outcome, Exception):
+                raise outcome
+        joined = join_results(results, [int(arrival_times[part[0]]) for part in parts],
+                              lower_bound(arrival_times, processing_times, options.num_berths))
+        if joined is not None:
+            joined["solving_time"] = time.time() - started
+            return joined
+    return await executor.solve(run_solver, *columns, **_solver_options(options))
+
+async def _solve_portfolio(columns, options: SchedulingRequest) -> Dict:
+    """Run the portfolio strategies in parallel in the solver pool and keep the best schedule."""
+    started = time.time()
+    strategies = portfolio_strategies()
+    budget = strategy_budget(options.time_limit, executor.solver_workers)
+    deadline = started + options.time_limit
+    calls = [((strategy, seed, *columns, options.num_berths, options.planning_horizon, budget),
+              {'deadline': deadline})
+             for strategy, seed in strategies]
+    outcomes = await executor.solve_many(run_strategy, calls)
+    result = pick_best(strategies, outcomes, columns[1], columns[2], options.num_berths)
+    result["solving_time"] = time.time() - started
+    return result
+
+async def _solve_and_save(key: str, columns, vessels: Callable[[], List[Dict]],
+                          options: SchedulingRequest) -> FastJSONResponse:
+    """
+    Answer a problem from the solution cache, or solve it in the solver pool and save it.
+    
+    The solution is encoded once; the cache keeps the encoded body for
+    repeats of the problem.
+    
+    Args:
+        key: Canonical problem hash
+        columns: (vessel_ids, arrival_times, processing_times) for the solver
+        vessels: Builds the vessel list stored with a new solution
+        options: Request carrying num_berths, planning_horizon, solver and time_limit
+    """
+    # Answer repeated problems from the cache
+    body = await _cached_body(key)
+    if body is not None:
+        return FastJSONResponse(body, headers={"X-Cache": "HIT"})
+    
+    # Solve the problem in the solver pool
+    if options.berths is not None:
+        # Berth limits and closures are only supported by the single-run solvers
+        result = await executor.solve(run_solver, *columns, **_solver_options(options))
+    elif options.window is not None and options.solver != "heuristic":
+        result = await _solve_rolling(columns, options)
+    elif options.solver == "portfolio":
+        result = await _solve_portfolio(columns, options)
+    else:
+        result = await executor.solve(run_solver, *columns, **_solver_options(options))
     
+    body = await _save_result(key, vessels, result, options)
+    return FastJSONResponse(body, headers={"X-Cache": "MISS"})
+
+async def _cached_body(key: str) -> Optional[bytes]:
+    """Encoded solution of an earlier solve of the same problem, or None."""
+    cached = solution_cache.get_entry(key)
+    if cached is None and CACHE_DYNAMODB:
+        item = await _db('find_solution_by_hash', key)
+        if item is not None:
+            solution = _stored_result(item)
+            with metrics.stage('serialize'):
+                body = encode_json(solution)
+            solution_cache.put(key, solution, body)
+            cached = (solution, body)
+    if cached is None:
+        return None
+    solution, body = cached
+    profiling.set_problem_id(solution['problem_id'])
+    if body is None:
+        # Cached by /solve/batch, which does not keep bodies
+        with metrics.stage('serialize'):
+            body = encode_json(solution)
+    return body
+
+async def _save_result(key: str, vessels: Callable[[], List[Dict]], result: Dict,
+                       options: SchedulingRequest) -> bytes:
+    """Give a solver result a problem_id, save it and return the encoded solution."""
+    problem_id = str(uuid.uuid4())
+    profiling.set_problem_id(problem_id)
+    solution = _scheduling_result(problem_id, vessels(), result)
+    with metrics.stage('serialize'):
+        body = encode_json(solution)
+    
+    # Save to database, or queue the save with persistence "async"
+    if await _save_solution(problem_id, _saved_solution(solution, key, options), options):
+        solution_cache.put(key, solution, body)
+    return body
+
+@app.post("/solve/stream")
+async def solve_stream(request: SchedulingRequest, http_request: Request):
+    """
+    Solve like /solve and stream the solver's progress as server-sent events.
+    
+    The request body is the same as for /solve. The response is a
+    text/event-stream of:
+    
+    - progress: {"makespan", "lower_bound", "elapsed", "schedule"} of the
+      best schedule so far, at most every STREAM_INTERVAL seconds.
+      "schedule" is sent by "exact", "local_search" and "portfolio" only,
+      and the "heuristic" solver, which does not report progress, sends none.
+    - result: the solution, as /solve returns it; the stream then ends.
+    - error: {"detail"} if the solve failed; the stream then ends.
+    
+    Closing the connection cancels the solve, and nothing is saved. A
+    problem found in the solution cache is answered with its result event
+    at once (X-Cache: HIT).
+    """
+    try:
+        vessel_ids, arrival_times, processing_times = _solver_columns(request)
+        key = _problem_key(request)
+        body = await _cached_body(key)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if body is not None:
+        return StreamingResponse(iter([streaming.server_sent_event('result', body)]), media_type=streaming.MEDIA_TYPE,
+                                 headers={**streaming.HEADERS, "X-Cache": "HIT"})
+    if executor.in_flight >= executor.capacity:
+        raise HTTPException(status_code=503, detail="Solver queue is full, retry later", headers={"Retry-After": "1"})
+    
+    channel = executor.open_channel(min_interval=streaming.INTERVAL, schedules=True)
+    
+    def start():
+        return executor.solve(run_solver, vessel_ids, arrival_times, processing_times, channel=channel,
+                              **_solver_options(request))
+    
+    def finish(result: Dict):
+        return _save_result(key, lambda: _vessel_dicts(request), result, request)
+    
+    events = streaming.solve_events(start, channel, finish, http_request.is_disconnected)
+    return StreamingResponse(events, media_type=streaming.MEDIA_TYPE,
+                             headers={**streaming.HEADERS, "X-Cache": "MISS"})
 
-@app.post("/upload-json")
+@app.post("/solve/batch", response_class=FastJSONResponse)
+async def solve_batch(requests: List[Dict[str, Any]] = Body(...)):
+    """
+    Solve several scheduling problems in one call.
+    
+    The body is a JSON array of /solve request bodies. Problems are solved in
+    parallel in the solver pool and the new solutions are saved with batched
+    writes. Results come back in request order; an invalid or infeasible
+    problem gets an error entry without failing the rest of the batch:
+    {
+        "results": [
+            {"index": 0, "status": "ok", "cached": false, "result": {...}},
+            {"index": 1, "status": "error", "error": "..."}
+        ]
+    }
+    """
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} problems per batch")
+    
+    results: List[Optional[Dict]] = [None] * len(requests)
+    # Problems to solve by hash; identical problems in the batch are solved once
+    pending: Dict[str, tuple] = {}
+    for index, body in enumerate(requests):
+        try:
+            request = SchedulingRequest(**body)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": "error", "error": str(e)}
+            continue
+        key = _problem_key(request)
+        cached = solution_cache.get(key)
+        if cached is not None:
+            results[index] = {"index": index, "status": "ok", "cached": True, "result": cached}
+        elif key in pending:
+            pending[key][1].append(index)
+        else:
+            pending[key] = (request, [index])
+    
+    if CACHE_DYNAMODB and pending:
+        items = await asyncio.gather(*(_db('find_solution_by_hash', key) for key in pending))
+        for key, item in zip(list(pending), items):
+            if item is not None:
+                cached = _stored_result(item)
+                solution_cache.put(key, cached)
+                for index in pending.pop(key)[1]:
+                    results[index] = {"index": index, "status": "ok", "cached": True, "result": cached}
+    
+    calls = []
+    for request, _ in pending.values():
+        vessel_ids, arrival_times, processing_times = _solver_columns(request)
+        calls.append(((vessel_ids, arrival_times, processing_times), _solver_options(request)))
+    try:
+        outcomes = await executor.solve_many(run_solver, calls)
+    except SolverBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    solved = []
+    for (key, (request, indices)), outcome in zip(pending.items(), outcomes):
+        if isinstance(outcome, Exception):
+            for index in indices:
+                results[index] = {"index": index, "status": "error", "error": str(outcome)}
+            continue
+        solution = _scheduling_result(str(uuid.uuid4()), _vessel_dicts(request), outcome)
+        solved.append((key, request, solution))
+        for index in indices:
+            results[index] = {"index": index, "status": "ok", "cached": False, "result": solution}
+    
+    # One batched write for all new solutions not queued for write-behind
+    unsaved = []
+    for key, request, solution in solved:
+        if request.persistence == 'async' and write_behind.enqueue(solution['problem_id'],
+                                                                   _saved_solution(solution, key, request)):
+            solution_cache.put(key, solution)
+        else:
+            unsaved.append((key, request, solution))
+    if unsaved:
+        saved = await _db(
+            'save_solutions',
+            [(solution['problem_id'], _saved_solution(solution, key, request)) for key, request, solution in unsaved]
+        )
+        if saved:
+            for key, _, solution in unsaved:
+                solution_cache.put(key, solution)
+            _forget_etags()
+    
+    with metrics.stage('serialize'):
+        return FastJSONResponse(encode_json({"results": results}))
+
+@app.post("/upload-json", response_model=SchedulingResult, response_class=FastJSONResponse)
 async def upload_json(file: UploadFile = File(...)):
     """
     Upload a JSON file containing vessel data and immediately solve it.
@@ -126,48 +671,321 @@ async def upload_json(file: UploadFile = File(...)):
             ...
         ]
     }
+    
+    Files named *.ndjson or *.jsonl are read as NDJSON (see /upload-ndjson).
     """
+    if file.filename and file.filename.endswith(('.ndjson', '.jsonl')):
+        return await _solve_ndjson(_file_chunks(file), {})
+    
     try:
-        contents = await file.read()
-        data = json.loads(contents)
-        
-        # Validate and create request
-        request = SchedulingRequest(**data)
+        with metrics.stage('parse'):
+            contents = await file.read()
+            data = json.loads(contents)
+            
+            # Validate and create request
+            request = SchedulingRequest(**data)
         
         # Solve directly
-        result = await solve_scheduling(request)
-        return result
+        return await solve_scheduling(request)
     
+    except HTTPException:
+        raise
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/upload-ndjson", response_model=SchedulingResult, response_class=FastJSONResponse)
+async def upload_ndjson(http_request: Request, planning_horizon: Optional[int] = None,
+                        num_berths: Optional[int] = None, solver: Optional[str] = None, time_limit: Optional[float] = None,
+                        window: Optional[int] = None, window_overlap: Optional[int] = None):
+    """
+    Stream a large NDJSON vessel file in the request body and solve it.
+    
+    One vessel object per line; the first line may instead hold options
+    ({"planning_horizon": ..., "num_berths": ..., "solver": ..., "time_limit": ...}),
+    which override the query parameters. Vessels are validated as the body
+    arrives and kept in packed arrays; the first bad record is rejected with
+    its line number.
+    """
+    query = {
+        "planning_horizon": planning_horizon,
+        "num_berths": num_berths,
+        "solver": solver,
+        "time_limit": time_limit,
+        "window": window,
+        "window_overlap": window_overlap
+    }
+    return await _solve_ndjson(http_request.stream(),
+                               {name: value for name, value in query.items() if value is not None})
+
+async def _file_chunks(file: UploadFile, chunk_size: int = 1 << 20):
+    """Read an uploaded file in chunks."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+async def _solve_ndjson(chunks, defaults: Dict) -> FastJSONResponse:
+    """Ingest an NDJSON stream into a VesselStore and solve it."""
+    try:
+        with metrics.stage('parse'):
+            options, store = await read_ndjson(chunks)
+            settings = SchedulingRequest(vessels=[], **{**defaults, **options})
+    except IngestLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (IngestError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        with metrics.stage('convert'):
+            key = problem_hash(store.records(), settings.planning_horizon, settings.num_berths,
+                               settings.solver, settings.time_limit, settings.window, settings.window_overlap)
+            columns = store.columns()
+        return await _solve_and_save(key, columns, store.vessel_dicts, settings)
+    except SolverBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/jobs", status_code=202)
+def create_job(request: SchedulingRequest):
+    """
+    Queue a scheduling request and return immediately.
+
+    The request body is the same as for /solve. Poll /jobs/{job_id} for
+    progress; the finished solution is saved under problem_id == job_id
+    and can be fetched from /solution/{problem_id}.
+    """
+    try:
+        job = jobs.submit(request, time_limit=request.time_limit if request.solver != "heuristic" else None)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return {"job_id": job.job_id, "problem_id": job.problem_id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Report a job's status and progress."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a queued or running job. Nothing is saved for a cancelled job."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @app.get("/solution/{problem_id}")
-def get_solution(problem_id: str):
-    """Retrieve a previously saved solution."""
+async def get_solution(problem_id: str, fields: Optional[str] = None, berth: Optional[int] = None,
+                       vessel: Optional[str] = None, timestamp: Optional[str] = None,
+                       as_of: Optional[str] = None, if_none_match: Optional[str] = Header(None)):
+    """
+    Retrieve a previously saved solution, by default its latest version.
+    
+    fields is a comma-separated subset of summary, schedule and vessels
+    (default all); fields=summary returns only makespan, timing and counts.
+    berth and vessel restrict the schedule and vessel list to one berth or
+    one vessel. Large solutions are stored per berth, so these partial
+    reads do not load the whole solution.
+    
+    timestamp returns the version saved at that timestamp (as listed by
+    /solution/{problem_id}/versions); as_of returns the latest version
+    saved at or before an ISO 8601 time.
+    
+    The response has a strong ETag for the version and view; sending it
+    back in If-None-Match gets 304 Not Modified while they are unchanged.
+    The latest version of recently read problems is remembered (see
+    etags), so such repeat requests for it do not read the database.
+    """
+    field_list = [field.strip() for field in fields.split(',')] if fields else None
+    view = f"{','.join(field_list or [])}|{berth}|{vessel}"
+    # Solutions solved with persistence "async" may not be saved yet
+    pending = write_behind.pending(problem_id)
+    latest = pending['timestamp'] if pending is not None else latest_versions.get(problem_id)
+    if latest is not None and as_of is None and timestamp in (None, latest):
+        etag = solution_etag(problem_id, latest, view)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+    try:
+        as_of = _utc_timestamp(as_of) if as_of is not None else None
+        if pending is not None and timestamp in (None, pending['timestamp']) \
+                and (as_of is None or pending['timestamp'] <= as_of):
+            solution = unsaved_solution(problem_id, pending, field_list, berth, vessel)
+        else:
+            solution = await _db('get_solution', problem_id, timestamp, fields=field_list, berth=berth,
+                                 vessel=vessel, as_of=as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if solution is None:
+        raise HTTPException(status_code=404, detail="Solution not found")
+    if vessel is not None and 'schedule' in solution and vessel not in solution['schedule']:
+        raise HTTPException(status_code=404, detail="Vessel not found in solution")
+    if timestamp is None and as_of is None and pending is None:
+        latest_versions.put(problem_id, solution['timestamp'])
+    
+    etag = solution_etag(problem_id, solution['timestamp'], view)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    with metrics.stage('serialize'):
+        return FastJSONResponse(encode_json(solution), headers=_etag_headers(etag))
+
+@app.get("/solution/{problem_id}/versions")
+async def list_versions(problem_id: str, limit: int = 10, next_token: Optional[str] = None):
+    """
+    List the saved versions of a solution, newest first, without schedules.
+    
+    Each version has its timestamp, makespan, solving time and vessel count;
+    pass a timestamp to GET /solution/{problem_id} to fetch that version.
+    Pass the returned next_token to get the following page; it is null on
+    the last page.
+    """
     try:
-        solution = db.get_solution(problem_id)
-        if solution is None:
-            raise HTTPException(status_code=404, detail="Solution not found")
-        return solution
+        page = await _db('list_versions', problem_id, limit, next_token=next_token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not page['versions'] and next_token is None and write_behind.pending(problem_id) is None:
+        raise HTTPException(status_code=404, detail="Solution not found")
+    return page
+
+@app.patch("/solution/{problem_id}")
+async def patch_solution(problem_id: str, patch: SolutionPatch):
+    """
+    Re-solve a saved solution after vessel changes.
+    
+    Request body (all fields optional):
+    {
+        "current_time": 12,
+        "updates": [{"vessel_id": "V1", "arrival_time": 20}],
+        "add": [{"vessel_id": "V9", "arrival_time": 15, "processing_time": 4}],
+        "remove": ["V3"]
+    }
+    
+    Vessels that started before current_time stay where they are. Only the
+    berths touched by a change are rescheduled, from the first changed
+    vessel on; the rest of the schedule is kept. The result is saved as a
+    new version under the same problem_id and returned with a diff against
+    the previous version.
+    """
+    pending = write_behind.pending(problem_id)
+    try:
+        stored = _pending_solution(pending, None, None, None) if pending is not None \
+            else await _db('get_solution', problem_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Solution not found")
+    if stored.get('berths_json'):
+        # Vessel sizes are not stored, so berth limits cannot be re-checked
+        raise HTTPException(status_code=400, detail="Solutions with berth limits or closures cannot be patched; "
+                                                    "solve the updated problem instead")
+    schedule = stored['schedule']
+    # Solutions saved before the options were stored: infer the berths in use
+    num_berths = int(stored.get('num_berths') or max((entry['berth'] for entry in schedule.values()), default=0) + 1)
+    planning_horizon = patch.planning_horizon or stored.get('planning_horizon')
+    options = SchedulingRequest(vessels=[], num_berths=num_berths,
+                                **({'planning_horizon': int(planning_horizon)} if planning_horizon else {}))
+    
+    try:
+        result = await executor.solve(
+            repair_schedule,
+            schedule,
+            stored['vessels'],
+            options.num_berths,
+            options.planning_horizon,
+            current_time=patch.current_time,
+            updates=[update.model_dump(exclude_none=True) for update in patch.updates],
+            added=[vessel.model_dump() for vessel in patch.add],
+            removed=patch.remove
+        )
+    except SolverBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    solution = _scheduling_result(problem_id, result['vessels'], result)
+    if not await _db('save_solution', problem_id, _saved_solution(solution, None, options)):
+        raise HTTPException(status_code=500, detail="Failed to save the repaired solution")
+    # Identical submissions of the original problem get a new problem_id from now on
+    solution_cache.invalidate_problem(problem_id)
+    _forget_etags(problem_id)
+    return {
+        **solution,
+        'previous_timestamp': stored['timestamp'],
+        'diff': result['diff'],
+        'repaired_berths': result['repaired_berths']
+    }
 
 @app.get("/solutions")
-def list_solutions(limit: int = 10):
-    """List recent solutions."""
+async def list_solutions(limit: int = 10, next_token: Optional[str] = None,
+                         min_vessels: Optional[int] = None, max_vessels: Optional[int] = None,
+                         min_makespan: Optional[int] = None, max_makespan: Optional[int] = None,
+                         if_none_match: Optional[str] = Header(None)):
+    """
+    List recent solutions, newest first.
+    
+    Pass the returned next_token to get the following page; it is null on
+    the last page. min_/max_vessels and min_/max_makespan filter by
+    inclusive ranges.
+    
+    The response has a strong ETag of its content. A page whose tag this
+    process served within ETAG_INDEX_TTL seconds, with no solution saved
+    or deleted since, is answered 304 Not Modified without a query.
+    """
+    query = json.dumps([limit, next_token, min_vessels, max_vessels, min_makespan, max_makespan])
+    etag = listing_etags.get(query)
+    if etag is not None and etag_matches(if_none_match, etag):
+        return _not_modified(etag)
     try:
-        solutions = db.list_solutions(limit)
-        return {"solutions": solutions}
+        page = await _db(
+            'list_solutions_page',
+            limit,
+            next_token=next_token,
+            min_vessels=min_vessels,
+            max_vessels=max_vessels,
+            min_makespan=min_makespan,
+            max_makespan=max_makespan
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    with metrics.stage('serialize'):
+        body = encode_json(page)
+    etag = body_etag(body)
+    listing_etags.put(query, etag)
+    if etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    return FastJSONResponse(body, headers=_etag_headers(etag))
+
+@app.get("/profile/{problem_id}")
+def get_profile(problem_id: str):
+    """
+    Collapsed stacks recorded for a profiled request (see profiling), as
+    text for flamegraph.pl or speedscope.
+    """
+    collapsed = profiling.store.get(problem_id) if profiling.ENABLED else None
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=collapsed, media_type="text/plain")
 
 @app.delete("/solution/{problem_id}")
-def delete_solution(problem_id: str):
-    """Delete a saved solution."""
+async def delete_solution(problem_id: str):
+    """Delete a saved solution and all its versions."""
     try:
-        db.delete_solution(problem_id)
+        write_behind.discard(problem_id)
+        await _db('delete_solution', problem_id)
+        solution_cache.invalidate_problem(problem_id)
+        _forget_etags(problem_id)
         return {"message": "Solution deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
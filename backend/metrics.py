@@ -0,0 +1,238 @@
+"""
+Prometheus metrics and per-request stage timings.
+
+Every API request is split into stages, timed with time.perf_counter:
+
+- parse: reading and validating the request body
+- convert: building solver columns and the problem hash
+- queue: waiting for a solver worker, including pickling to and from it
+- solve: running the solver in the worker
+- serialize: encoding the response body
+- db_put, db_get, db_query, db_delete: storage calls (DynamoDB, S3 or SQLite)
+
+Each stage is observed in the berth_stage_seconds histogram and summed per
+request into a Server-Timing response header. Stage timings reach the
+current request through a context variable, which the I/O thread pool
+copies into its threads (see executor.SolverExecutor.io), so DynamoDB calls
+made on behalf of a request are attributed to it. Work outside a request,
+such as background jobs, is recorded under the route 'background'.
+
+With several API processes, set PROMETHEUS_MULTIPROC_DIR so /metrics
+aggregates all of them.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+import functools
+import inspect
+import os
+import threading
+import time
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+# From half a millisecond (DynamoDB reads) to minutes (long exact solves)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                 60.0, 120.0, 300.0)
+BACKGROUND_ROUTE = 'background'
+
+STAGE_SECONDS = Histogram('berth_stage_seconds', 'Time spent in each request stage',
+                          ['route', 'stage'], buckets=STAGE_BUCKETS)
+REQUEST_SECONDS = Histogram('berth_request_seconds', 'Time to handle an API request',
+                            ['route', 'method', 'status'], buckets=STAGE_BUCKETS)
+REQUEST_ERRORS = Counter('berth_request_errors_total', 'API requests answered with an error status',
+                         ['route', 'status'])
+DB_ERRORS = Counter('berth_db_errors_total', 'DynamoDB and S3 calls that failed',
+                    ['operation', 'code'])
+DB_RETRIES = Counter('berth_db_retries_total', 'Retried DynamoDB and S3 calls',
+                     ['operation', 'reason'])
+
+# Storage operations by stage; operations not listed (e.g. CreateTable) are not timed
+DB_STAGES = {
+    'PutItem': 'db_put', 'UpdateItem': 'db_put', 'BatchWriteItem': 'db_put', 'PutObject': 'db_put',
+    'GetItem': 'db_get', 'BatchGetItem': 'db_get', 'GetObject': 'db_get',
+    'Query': 'db_query', 'Scan': 'db_query', 'ListObjectsV2': 'db_query',
+    'DeleteItem': 'db_delete', 'DeleteObject': 'db_delete', 'DeleteObjects': 'db_delete',
+}
+
+
+class RequestTimings:
+    """Stage durations of one request, summed per stage."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        # DynamoDB calls of one request may run in several I/O threads
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        with self._lock:
+            return ', '.join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items())
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Timings of the request being handled, or None outside a request."""
+    return _current.get()
+
+
+def record(stage: str, seconds: float):
+    """Observe a stage duration and add it to the current request's timings."""
+    timings = _current.get()
+    STAGE_SECONDS.labels(timings.route if timings is not None else BACKGROUND_ROUTE, stage).observe(seconds)
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a request stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def _mark_endpoint(endpoint: Callable) -> Callable:
+    """
+    Wrap an endpoint to note when it starts and returns.
+
+    The time before it starts is parsing (body and validation); the time
+    after it returns, until the route has a response, is serialization.
+    """
+    def started():
+        timings = _current.get()
+        if timings is not None:
+            timings.endpoint_started = time.perf_counter()
+            record('parse', timings.endpoint_started - timings.started)
+        return timings
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def marked(*args, **kwargs):
+            timings = started()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def marked(*args, **kwargs):
+            timings = started()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.endpoint_finished = time.perf_counter()
+    return marked
+
+
+class TimedRoute(APIRoute):
+    """
+    API route that times its request stages.
+
+    Set as the router's route_class before routes are added. Responses
+    get a Server-Timing header, as do errors raised as HTTPException.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _mark_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_handler(request):
+            timings = RequestTimings(route)
+            token = _current.set(timings)
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                if timings.endpoint_finished is not None:
+                    record('serialize', time.perf_counter() - timings.endpoint_finished)
+            except HTTPException as e:
+                status = e.status_code
+                e.headers = {**(e.headers or {}), 'Server-Timing': _finish(timings)}
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                _current.reset(token)
+                elapsed = time.perf_counter() - timings.started
+                REQUEST_SECONDS.labels(route, request.method, str(status)).observe(elapsed)
+                if status >= 400:
+                    REQUEST_ERRORS.labels(route, str(status)).inc()
+            response.headers['Server-Timing'] = _finish(timings)
+            return response
+
+        return timed_handler
+
+
+def _finish(timings: RequestTimings) -> str:
+    timings.add('total', time.perf_counter() - timings.started)
+    return timings.server_timing()
+
+
+def _before_call(model, context, **kwargs):
+    context['metrics_started'] = time.perf_counter()
+
+
+def _after_call(model, parsed, context, **kwargs):
+    stage_name = DB_STAGES.get(model.name)
+    started = context.get('metrics_started')
+    if stage_name is not None and started is not None:
+        record(stage_name, time.perf_counter() - started)
+    if parsed.get('Error'):
+        DB_ERRORS.labels(model.name, parsed['Error'].get('Code') or 'Unknown').inc()
+    retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+    if retries:
+        DB_RETRIES.labels(model.name, 'retry').inc(retries)
+    if parsed.get('UnprocessedItems'):
+        # batch_writer sends these again in its next request
+        DB_RETRIES.labels(model.name, 'unprocessed').inc()
+
+
+def _after_call_error(model, exception, context, **kwargs):
+    stage_name = DB_STAGES.get(model.name)
+    started = context.get('metrics_started')
+    if stage_name is not None and started is not None:
+        record(stage_name, time.perf_counter() - started)
+    code = getattr(exception, 'response', {}).get('Error', {}).get('Code') or type(exception).__name__
+    DB_ERRORS.labels(model.name, code).inc()
+
+
+def instrument_client(client):
+    """Time a boto3 client's calls and count its retries and errors."""
+    events = client.meta.events
+    events.register('before-call', _before_call, unique_id='berth-metrics-before-call')
+    events.register('after-call', _after_call, unique_id='berth-metrics-after-call')
+    events.register('after-call-error', _after_call_error, unique_id='berth-metrics-after-call-error')
+    return client
+
+
+def render() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, and its content type."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,251 @@
+"""
+Write-behind persistence for solutions.
+
+With persistence "async", /solve returns as soon as the solution is queued
+here instead of waiting for DynamoDB. A flusher thread saves queued
+solutions in batches (DynamoDBManager.save_solutions), retrying a failed
+batch with exponential backoff and full jitter. A batch that still fails
+is appended to a spill file in WRITE_BEHIND_SPILL_DIR, one JSON line per
+solution, and saved again once DynamoDB accepts writes: after the next
+successful flush, and when an API process starts.
+
+Queued solutions can be read back before they are saved (see pending), so
+a client fetching its problem_id right after /solve finds it. A solution
+that was spilled becomes readable again once its spill file is replayed.
+Queued solutions are lost only if the process dies before they are
+flushed or spilled; callers that cannot accept that use persistence "sync".
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import glob
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import metrics
+
+PERSISTENCE_MODES = ('sync', 'async')
+# Mode used when a request does not choose one
+DEFAULT_MODE = os.getenv('PERSISTENCE_MODE', 'sync')
+
+SaveMany = Callable[[List[Tuple[str, Dict]]], bool]
+
+
+def _json_default(value):
+    # numpy scalars that slipped into a solution
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__} in the spill file")
+
+
+class WriteBehindQueue:
+    """Saves solutions on a background thread, in batches, spilling to disk when saves keep failing."""
+
+    def __init__(self, save_many: SaveMany, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, max_attempts: Optional[int] = None,
+                 backoff: Optional[float] = None, max_backoff: Optional[float] = None,
+                 queue_size: Optional[int] = None, spill_dir: Optional[str] = None):
+        """
+        Initialize the queue. The flusher thread starts on first use.
+
+        Args:
+            save_many: Saves a list of (problem_id, solution_data) pairs,
+                returning False on failure (DynamoDBManager.save_solutions)
+            batch_size: Most solutions per save (env WRITE_BEHIND_BATCH_SIZE or 25)
+            flush_interval: Seconds to wait for more solutions before saving a
+                partial batch (env WRITE_BEHIND_FLUSH_INTERVAL or 0.05)
+            max_attempts: Saves of a batch before it is spilled (env
+                WRITE_BEHIND_MAX_ATTEMPTS or 5)
+            backoff: Base retry delay in seconds, doubled per attempt (env
+                WRITE_BEHIND_BACKOFF or 0.1)
+            max_backoff: Longest retry delay (env WRITE_BEHIND_MAX_BACKOFF or 5)
+            queue_size: Solutions allowed to wait; enqueue refuses more (env
+                WRITE_BEHIND_QUEUE_SIZE or 10000)
+            spill_dir: Directory of spill files (env WRITE_BEHIND_SPILL_DIR or
+                ./write_behind_spill)
+        """
+        self.save_many = save_many
+        self.batch_size = batch_size or int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 25))
+        self.flush_interval = flush_interval if flush_interval is not None \
+            else float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 0.05))
+        self.max_attempts = max_attempts or int(os.getenv('WRITE_BEHIND_MAX_ATTEMPTS', 5))
+        self.backoff = backoff if backoff is not None else float(os.getenv('WRITE_BEHIND_BACKOFF', 0.1))
+        self.max_backoff = max_backoff if max_backoff is not None \
+            else float(os.getenv('WRITE_BEHIND_MAX_BACKOFF', 5))
+        self.spill_dir = spill_dir or os.getenv('WRITE_BEHIND_SPILL_DIR', 'write_behind_spill')
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size or int(os.getenv('WRITE_BEHIND_QUEUE_SIZE',
+                                                                                    10000)))
+        # Queued and in-flight solutions by problem_id, oldest first, for reads before the save
+        self._pending: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._spilled = False
+
+    def start(self):
+        """Start the flusher thread, which first replays spill files left by earlier runs."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, problem_id: str, solution_data: Dict) -> bool:
+        """
+        Queue a solution to be saved.
+
+        Returns:
+            False if the queue is full or shutting down; the caller should
+            then save the solution itself
+        """
+        if self._stopping.is_set():
+            return False
+        self.start()
+        with self._lock:
+            self._pending.setdefault(problem_id, []).append(solution_data)
+        try:
+            self._queue.put_nowait((problem_id, solution_data))
+        except queue.Full:
+            self._forget([(problem_id, solution_data)])
+            return False
+        return True
+
+    def pending(self, problem_id: str) -> Optional[Dict]:
+        """The newest solution queued for problem_id and not yet saved, or None."""
+        with self._lock:
+            versions = self._pending.get(problem_id)
+            return versions[-1] if versions else None
+
+    def discard(self, problem_id: str):
+        """Drop the queued solutions of a deleted problem so they are not saved."""
+        with self._lock:
+            self._pending.pop(problem_id, None)
+
+    def _queued(self, batch: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        """The solutions of a batch that were not discarded."""
+        with self._lock:
+            return [(problem_id, solution_data) for problem_id, solution_data in batch
+                    if any(version is solution_data for version in self._pending.get(problem_id, ()))]
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def _forget(self, batch: List[Tuple[str, Dict]]):
+        with self._lock:
+            for problem_id, solution_data in batch:
+                versions = [version for version in self._pending.get(problem_id, ())
+                            if version is not solution_data]
+                if versions:
+                    self._pending[problem_id] = versions
+                else:
+                    self._pending.pop(problem_id, None)
+
+    def _next_batch(self) -> List[Tuple[str, Dict]]:
+        """Wait for a solution, then collect more for up to flush_interval seconds."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        self.replay()
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._queued(self._next_batch())
+            if batch and self.flush(batch) and self._spilled:
+                self.replay()
+
+    def flush(self, batch: List[Tuple[str, Dict]]) -> bool:
+        """
+        Save a batch, retrying with jittered backoff, or spill it.
+
+        Returns:
+            True if the batch was saved
+        """
+        for attempt in range(self.max_attempts):
+            if self.save_many(batch):
+                self._forget(batch)
+                return True
+            if attempt + 1 == self.max_attempts or self._stopping.is_set():
+                break
+            metrics.DB_RETRIES.labels('BatchWriteItem', 'write_behind').inc()
+            # Full jitter keeps API processes that failed together from retrying together
+            time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+        self.spill(batch)
+        self._forget(batch)
+        return False
+
+    def _spill_path(self) -> str:
+        return os.path.join(self.spill_dir, f"spill-{os.getpid()}.jsonl")
+
+    def spill(self, batch: List[Tuple[str, Dict]]):
+        """Append solutions to this process's spill file, flushed to disk before returning."""
+        lines = ''.join(json.dumps({'problem_id': problem_id, 'solution': solution_data},
+                                   default=_json_default) + '\n' for problem_id, solution_data in batch)
+        with self._spill_lock:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._spill_path(), 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._spilled = True
+        print(f"Spilled {len(batch)} solutions to {self._spill_path()}")
+
+    def replay(self):
+        """
+        Save the solutions in every spill file of the spill directory.
+
+        A file is claimed by renaming it first, so when several API
+        processes share the directory each file is replayed once. Solutions
+        that still cannot be saved are spilled again.
+        """
+        self._spilled = False
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, '*.jsonl'))):
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # Claimed by another process
+            with open(claimed, encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            batch = [(entry['problem_id'], entry['solution']) for entry in entries]
+            failed = []
+            for start in range(0, len(batch), self.batch_size):
+                part = batch[start:start + self.batch_size]
+                if not self.save_many(part):
+                    failed.extend(part)
+            if failed:
+                self.spill(failed)
+            os.remove(claimed)
+            print(f"Replayed {len(batch) - len(failed)} of {len(batch)} spilled solutions from {path}")
+
+    def shutdown(self, timeout: float = 10.0):
+        """
+        Stop accepting solutions and flush the queue.
+
+        Solutions not saved within timeout seconds are spilled.
+        """
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        leftover = self._queued(leftover)
+        if leftover:
+            self.spill(leftover)
+            self._forget(leftover)
@@ -0,0 +1,293 @@
+"""
+Portfolio solving: several strategies on the same problem, best one wins.
+
+The FCFS heuristic is deterministic, so extra cores do not help it. A
+portfolio runs different sequencing rules side by side in the solver pool
+and keeps the schedule with the smallest makespan:
+
+- fcfs: vessels in arrival order, each to the earliest free berth
+- spt / lpt: whenever a berth frees up, the waiting vessel with the
+  shortest / longest processing time goes next
+- random_greedy: the same dispatching with a random choice among waiting
+  vessels, restarted until the time budget runs out
+- local_search: local search from the FCFS schedule, once per seed
+
+Each strategy reports its makespan and time, so the response shows which
+one won and what the others achieved. A progress callback sees the best
+makespan so far and can stop the portfolio between strategies, between
+random_greedy restarts and during local search.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import heapq
+import math
+import random
+import time
+
+import numpy as np
+
+from solver import (
+    solve_berth_scheduling_columnar,
+    schedule_from_columns,
+    BerthAvailability,
+    BerthSchedulingProblem,
+    ProgressCallback,
+    VesselData,
+)
+from exact_solver import lower_bound
+from local_search import improve_schedule
+
+# Dispatching rules: priority of a waiting vessel, lowest first
+RULES = {
+    'fcfs': lambda arrival, processing, rng: arrival,
+    'spt': lambda arrival, processing, rng: processing,
+    'lpt': lambda arrival, processing, rng: -processing,
+    'random_greedy': lambda arrival, processing, rng: rng.random(),
+}
+LOCAL_SEARCH_SEEDS = (1, 2, 3)
+# Strategies that use the whole time budget; the others finish in one pass
+TIMED_STRATEGIES = ('random_greedy', 'local_search')
+
+
+def portfolio_strategies() -> List[Tuple[str, Optional[int]]]:
+    """(strategy, seed) pairs run by a portfolio, in tie-breaking order."""
+    return ([('fcfs', None), ('spt', None), ('lpt', None), ('random_greedy', 0)]
+            + [('local_search', seed) for seed in LOCAL_SEARCH_SEEDS])
+
+
+def strategy_budget(time_limit: float, workers: int) -> float:
+    """
+    Time budget of each timed strategy so the portfolio ends within time_limit.
+
+    Timed strategies share the workers; with fewer workers than timed
+    strategies they run in rounds and each round gets its share. The
+    untimed strategies and a busy pool can still delay the rounds, so
+    run_strategy also takes the portfolio's deadline.
+    """
+    timed = sum(1 for strategy, _ in portfolio_strategies() if strategy in TIMED_STRATEGIES)
+    return time_limit / math.ceil(timed / max(workers, 1))
+
+
+def greedy_schedule(arrival_times: Sequence[int], processing_times: Sequence[int], num_berths: int,
+                    planning_horizon: int, rule: str, rng: Optional[random.Random] = None,
+                    vessel_ids: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Dispatch vessels to berths with a priority rule.
+
+    Whenever a berth becomes free, the waiting vessel with the lowest
+    priority (see RULES) starts on it; with nobody waiting, the next
+    arrival does. With 'fcfs' this is the heuristic's schedule.
+
+    Returns:
+        Dictionary with berth, start_time and end_time arrays in input order,
+        the arrival order and the makespan
+
+    Raises:
+        ValueError: If a vessel cannot start within the planning horizon
+    """
+    arrivals = np.asarray(arrival_times, dtype=np.int64)
+    processing = np.asarray(processing_times, dtype=np.int64)
+    n = len(arrivals)
+    order = np.argsort(arrivals, kind='stable')
+    priority = RULES[rule]
+    rng = rng or random.Random(0)
+    arrival_list = arrivals.tolist()
+    processing_list = processing.tolist()
+    berth = [0] * n
+    start = [0] * n
+
+    berths = BerthAvailability(num_berths)
+    waiting = []
+    upcoming = order.tolist()
+    next_arrival = 0
+    for _ in range(n):
+        free_at, best_berth = berths.earliest()
+        now = free_at if waiting else max(free_at, arrival_list[upcoming[next_arrival]])
+        while next_arrival < n and arrival_list[upcoming[next_arrival]] <= now:
+            i = upcoming[next_arrival]
+            heapq.heappush(waiting, (priority(arrival_list[i], processing_list[i], rng), arrival_list[i], i))
+            next_arrival += 1
+        _, arrival, i = heapq.heappop(waiting)
+        vessel_start = max(free_at, arrival)
+        if vessel_start >= planning_horizon:
+            name = vessel_ids[i] if vessel_ids is not None else i
+            raise ValueError(f"Vessel {name} cannot be scheduled within planning horizon")
+        berth[i] = best_berth
+        start[i] = vessel_start
+        berths.assign(vessel_start + processing_list[i])
+
+    start_time = np.array(start, dtype=np.int64)
+    end_time = start_time + processing
+    return {
+        'order': order,
+        'berth': np.array(berth, dtype=np.int64),
+        'start_time': start_time,
+        'end_time': end_time,
+        'makespan': int(end_time.max()) if n else 0
+    }
+
+
+def run_strategy(strategy: str, seed: Optional[int], vessel_ids: Sequence[str], arrival_times: np.ndarray,
+                 processing_times: np.ndarray, num_berths: int, planning_horizon: int,
+                 time_limit: float, callback: Optional[ProgressCallback] = None,
+                 deadline: Optional[float] = None) -> Dict:
+    """
+    Run one portfolio strategy.
+
+    A timed strategy runs for time_limit seconds or until deadline (epoch
+    seconds, the end of the whole portfolio), whichever comes first.
+
+    callback gets the strategy's best makespan after each random_greedy
+    restart and during local search; returning False stops the strategy
+    with the best schedule it has.
+
+    Returns:
+        Result dictionary with schedule, makespan and solving_time, plus the
+        number of restarts for random_greedy
+
+    Raises:
+        ValueError: If the strategy breaks the planning horizon
+        TimeoutError: If a timed strategy starts after deadline
+    """
+    start = time.time()
+    if deadline is not None:
+        if strategy in TIMED_STRATEGIES and start >= deadline:
+            raise TimeoutError("Portfolio time limit reached before the strategy started")
+        time_limit = max(0.0, min(time_limit, deadline - start))
+    if strategy == 'local_search':
+        initial = solve_berth_scheduling_columnar(arrival_times, processing_times, num_berths=num_berths,
+                                                  planning_horizon=planning_horizon, vessel_ids=vessel_ids)
+        initial['schedule'] = schedule_from_columns(vessel_ids, arrival_times, processing_times, initial)
+        problem = BerthSchedulingProblem(
+            vessels=[
+                VesselData(vessel_id=vessel_id, arrival_time=arrival, processing_time=processing)
+                for vessel_id, arrival, processing in zip(vessel_ids, arrival_times.tolist(),
+                                                          processing_times.tolist())
+            ],
+            planning_horizon=planning_horizon,
+            num_berths=num_berths
+        )
+        remaining = max(0.0, time_limit - (time.time() - start))
+        result = improve_schedule(problem, initial, time_limit=remaining, seed=seed, callback=callback)
+        return {'schedule': result['schedule'], 'makespan': result['makespan'], 'solving_time': time.time() - start}
+    if strategy not in RULES:
+        raise ValueError(f"Unknown strategy {strategy!r}")
+
+    rng = random.Random(seed)
+    best = greedy_schedule(arrival_times, processing_times, num_berths, planning_horizon, strategy, rng, vessel_ids)
+    restarts = 1
+    deadline = start + time_limit
+    while strategy == 'random_greedy' and time.time() < deadline:
+        candidate = greedy_schedule(arrival_times, processing_times, num_berths, planning_horizon, strategy, rng,
+                                    vessel_ids)
+        restarts += 1
+        if candidate['makespan'] < best['makespan']:
+            best = candidate
+        if callback is not None and not callback({
+            'makespan': best['makespan'],
+            'schedule': lambda best=best: schedule_from_columns(vessel_ids, arrival_times, processing_times, best)
+        }):
+            break
+    result = {
+        'schedule': schedule_from_columns(vessel_ids, arrival_times, processing_times, best),
+        'makespan': best['makespan'],
+        'solving_time': time.time() - start
+    }
+    if strategy == 'random_greedy':
+        result['restarts'] = restarts
+    return result
+
+
+def pick_best(strategies: List[Tuple[str, Optional[int]]], outcomes: List, arrival_times: np.ndarray,
+              processing_times: np.ndarray, num_berths: int) -> Dict:
+    """
+    Combine strategy outcomes into one result.
+
+    Args:
+        strategies: (strategy, seed) pairs
+        outcomes: run_strategy result or exception for each pair
+        arrival_times, processing_times, num_berths: The problem, for the
+            lower bound
+
+    Returns:
+        Result of the strategy with the smallest makespan (the earliest one
+        on ties), with lower_bound, optimality_gap and a 'portfolio' report:
+        {'winner': {'strategy', 'seed'}, 'strategies': [{'strategy', 'seed',
+        'makespan', 'solving_time'} or {'strategy', 'seed', 'error'}]}
+
+    Raises:
+        Exception: The first strategy's error if every strategy failed
+    """
+    report = []
+    best = None
+    for (strategy, seed), outcome in zip(strategies, outcomes):
+        entry = {'strategy': strategy, 'seed': seed}
+        if isinstance(outcome, Exception):
+            entry['error'] = str(outcome)
+        else:
+            entry['makespan'] = outcome['makespan']
+            entry['solving_time'] = outcome['solving_time']
+            if best is None or outcome['makespan'] < best[1]['makespan']:
+                best = (entry, outcome)
+        report.append(entry)
+    if best is None:
+        raise next(outcome for outcome in outcomes if isinstance(outcome, Exception))
+
+    winner, result = best
+    bound = lower_bound(arrival_times, processing_times, num_berths)
+    makespan = result['makespan']
+    return {
+        'schedule': result['schedule'],
+        'makespan': makespan,
+        'solving_time': max(entry.get('solving_time', 0.0) for entry in report),
+        'lower_bound': bound,
+        'optimality_gap': (makespan - bound) / makespan if makespan else 0.0,
+        'portfolio': {'winner': {'strategy': winner['strategy'], 'seed': winner['seed']}, 'strategies': report}
+    }
+
+
+def solve_portfolio(vessel_ids: Sequence[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+                    num_berths: int, planning_horizon: int, time_limit: float = 10.0,
+                    callback: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Run the whole portfolio one strategy after another in this process.
+
+    Used where the problem already occupies a single solver worker (jobs,
+    batches, streamed solves); /solve runs the strategies in parallel
+    instead. callback gets the best makespan and schedule of the strategies
+    so far; returning False skips the strategies not yet run, and the best
+    result among those that ran is returned.
+    """
+    start = time.time()
+    deadline = start + time_limit
+    strategies = portfolio_strategies()
+    budget = strategy_budget(time_limit, 1)
+    bound = lower_bound(arrival_times, processing_times, num_berths)
+    best: Dict = {}
+    stopped = False
+
+    def report(update: Dict) -> bool:
+        nonlocal stopped
+        if not best or update['makespan'] < best['makespan']:
+            best.update(makespan=update['makespan'], schedule=update.get('schedule'))
+        if not callback({'makespan': best['makespan'], 'lower_bound': bound, 'elapsed': time.time() - start,
+                         'schedule': best['schedule']}):
+            stopped = True
+        return not stopped
+
+    outcomes = []
+    for strategy, seed in strategies:
+        try:
+            outcome = run_strategy(strategy, seed, vessel_ids, arrival_times, processing_times, num_berths,
+                                   planning_horizon, budget, report if callback is not None else None, deadline)
+        except (ValueError, TimeoutError) as e:
+            outcomes.append(e)
+            continue
+        outcomes.append(outcome)
+        if callback is not None and not stopped:
+            report(outcome)
+        if stopped:
+            break
+    result = pick_best(strategies[:len(outcomes)], outcomes, arrival_times, processing_times, num_berths)
+    result['solving_time'] = time.time() - start
+    return result
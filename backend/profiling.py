@@ -0,0 +1,225 @@
+"""
+Opt-in sampling profiler for single requests.
+
+With PROFILING_ENABLED=true, a /solve or /upload-json request sent with an
+X-Profile header (or a profile query parameter) is profiled: a sampler
+thread records the stack of the thread handling the request every
+PROFILING_INTERVAL seconds, and the solver worker samples itself the same
+way while it solves. The samples are kept as collapsed stacks, one
+'frame;frame;frame count' line per distinct stack, which flamegraph.pl and
+speedscope read directly. Stacks from the API process start with 'api',
+stacks from the solver with 'solver'.
+
+Profiles are stored by the problem_id of the response and served by
+GET /profile/{problem_id}; the response names it in an X-Profile-Id
+header. With PROFILING_TOKEN set, the header or parameter must carry that
+token instead of 1.
+
+When PROFILING_ENABLED is false the middleware is not installed and
+nothing here runs.
+"""
+
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs
+import os
+import sys
+import threading
+import time
+import uuid
+
+ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+# Required value of the X-Profile header or profile parameter; any true value when unset
+TOKEN = os.getenv('PROFILING_TOKEN') or None
+# Seconds between samples
+INTERVAL = float(os.getenv('PROFILING_INTERVAL', 0.002))
+# Most recent profiles kept in memory
+MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', 20))
+# Also write each profile to <dir>/<problem_id>.collapsed when set
+PROFILE_DIR = os.getenv('PROFILING_DIR') or None
+
+PROFILED_PATHS = ('/solve', '/upload-json')
+_TRUE = ('1', 'true', 'yes')
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's stack from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float = INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self._counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if codes:
+                self._counts[tuple(reversed(codes))] += 1
+
+    def start(self) -> 'StackSampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> Dict[str, int]:
+        """Stop sampling and return the samples as collapsed stacks."""
+        self._stop.set()
+        self._thread.join()
+        stacks: Counter = Counter()
+        for codes, count in self._counts.items():
+            stacks[';'.join(_frame_name(code) for code in codes)] += count
+        return dict(stacks)
+
+
+def profiled_call(fn: Callable, args: tuple, kwargs: Dict, interval: float) -> Tuple[float, Any, Dict[str, int]]:
+    """
+    Run fn in a solver worker while sampling it.
+
+    Returns:
+        (seconds it ran, result, collapsed stacks)
+    """
+    sampler = StackSampler(threading.get_ident(), interval).start()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        stacks = sampler.stop()
+    return elapsed, result, stacks
+
+
+class RequestProfile:
+    """Collapsed stacks gathered for one request."""
+
+    def __init__(self, interval: float = INTERVAL):
+        self.interval = interval
+        self.problem_id: Optional[str] = None
+        self.stacks: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def merge(self, stacks: Dict[str, int], root: str):
+        with self._lock:
+            for stack, count in stacks.items():
+                self.stacks[f"{root};{stack}"] += count
+
+    def collapsed(self) -> str:
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar('request_profile', default=None)
+
+
+def current() -> Optional[RequestProfile]:
+    """Profile of the request being handled, or None when it is not profiled."""
+    return _current.get() if ENABLED else None
+
+
+def set_problem_id(problem_id: str):
+    """Store the current request's profile under this problem_id."""
+    profile = current()
+    if profile is not None:
+        profile.problem_id = problem_id
+
+
+class ProfileStore:
+    """The most recent profiles by problem_id, optionally also written to a directory."""
+
+    def __init__(self, max_profiles: int = MAX_PROFILES, directory: Optional[str] = PROFILE_DIR):
+        self.max_profiles = max_profiles
+        self.directory = directory
+        self._profiles: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, collapsed: str):
+        with self._lock:
+            self._profiles[key] = collapsed
+            self._profiles.move_to_end(key)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{os.path.basename(key)}.collapsed"), 'w') as f:
+                f.write(collapsed)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            collapsed = self._profiles.get(key)
+        if collapsed is None and self.directory:
+            path = os.path.join(self.directory, f"{os.path.basename(key)}.collapsed")
+            if os.path.exists(path):
+                with open(path) as f:
+                    collapsed = f.read()
+        return collapsed
+
+
+store = ProfileStore()
+
+
+def _requested(values: Iterable[str]) -> bool:
+    for value in values:
+        if (value == TOKEN) if TOKEN else (value.lower() in _TRUE):
+            return True
+    return False
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles requests asking for it.
+
+    Sampling stops when the response starts, so parsing, solving and
+    serializing the response are all covered.
+    """
+
+    def __init__(self, app, paths: Iterable[str] = PROFILED_PATHS):
+        self.app = app
+        self.paths = tuple(paths)
+
+    def _wants_profile(self, scope) -> bool:
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            return False
+        headers = [value.decode('latin-1') for name, value in scope['headers'] if name == b'x-profile']
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('profile', [])
+        return _requested(headers + query)
+
+    async def __call__(self, scope, receive, send):
+        if not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        sampler = StackSampler(threading.get_ident(), profile.interval).start()
+        stopped = False
+
+        def finish() -> str:
+            nonlocal stopped
+            stopped = True
+            profile.merge(sampler.stop(), 'api')
+            key = profile.problem_id or f"request-{uuid.uuid4()}"
+            store.put(key, profile.collapsed())
+            return key
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start' and not stopped:
+                key = finish()
+                message = {**message, 'headers': [*message.get('headers', []),
+                                                  (b'x-profile-id', key.encode('latin-1'))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _current.reset(token)
+            if not stopped:
+                finish()
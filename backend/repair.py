@@ -0,0 +1,205 @@
+"""
+Incremental repair of a saved schedule.
+
+When a vessel's arrival or processing time changes, or vessels are added or
+removed, most of the schedule can stay as it is. Vessels that started before
+current_time are frozen. On each berth touched by a change, the vessels from
+the first changed one onward that have not started yet are released; every
+other vessel keeps its berth and start time. Released, updated and added
+vessels are then placed with the heuristic's first-come-first-served rule,
+each berth becoming free after the vessels it keeps (and not before
+current_time).
+
+The untouched part of the schedule is handled as column arrays, so a repair
+costs a few vectorized passes plus work proportional to the released vessels.
+"""
+
+from operator import itemgetter
+from typing import Dict, Iterable, List
+import time
+
+import numpy as np
+
+from solver import BerthAvailability
+
+
+def _slot(entry: Dict) -> Dict:
+    return {'berth': entry['berth'], 'start_time': entry['start_time'], 'end_time': entry['end_time']}
+
+
+def _column(schedule: Dict[str, Dict], field: str) -> np.ndarray:
+    return np.fromiter(map(itemgetter(field), schedule.values()), dtype=np.int64, count=len(schedule))
+
+
+def repair_schedule(schedule: Dict[str, Dict], vessels: List[Dict], num_berths: int, planning_horizon: int,
+                    current_time: int = 0, updates: Iterable[Dict] = (), added: Iterable[Dict] = (),
+                    removed: Iterable[str] = ()) -> Dict:
+    """
+    Apply vessel changes to a saved schedule, rescheduling as little as possible.
+
+    Args:
+        schedule: Saved schedule, vessel_id -> {berth, start_time, end_time,
+            arrival_time, processing_time}
+        vessels: Saved vessel dicts in submission order
+        num_berths: Number of berths
+        planning_horizon: Latest allowed start time (exclusive)
+        current_time: Vessels with start_time < current_time have started;
+            they keep their berth and start time, and no other vessel is
+            started before current_time
+        updates: {'vessel_id', 'arrival_time'?, 'processing_time'?} dicts
+        added: New vessel dicts
+        removed: Ids of vessels to drop
+
+    Returns:
+        Dictionary with:
+        - schedule, vessels: The repaired solution (added vessels last)
+        - makespan: Latest departure time
+        - solving_time: Time taken to repair
+        - diff: Added and removed vessel ids, before/after slots of every
+          vessel whose berth or times changed, and the makespan change
+        - repaired_berths: Berths whose schedule was released
+
+    Raises:
+        ValueError: For unknown or duplicate vessels, changes to vessels that
+            have started, or a vessel that no longer fits in the horizon
+    """
+    start = time.time()
+    if len(schedule) != len(vessels):
+        raise ValueError("The saved schedule does not cover every vessel")
+
+    updates = list(updates)
+    removed = list(dict.fromkeys(removed))
+    targets = set(removed) | {update['vessel_id'] for update in updates}
+    ids = list(schedule)
+    # Schedule rows of the vessels named in the changes
+    row = {vessel_id: index for index, vessel_id in enumerate(ids) if vessel_id in targets}
+    berth = _column(schedule, 'berth')
+    start_time = _column(schedule, 'start_time')
+    end_time = _column(schedule, 'end_time')
+    if len(ids) and (berth.min() < 0 or berth.max() >= num_berths):
+        raise ValueError(f"The saved schedule uses more than {num_berths} berths")
+    old_makespan = int(end_time.max()) if ids else 0
+
+    # Earliest start time from which each berth is rescheduled (none: kept whole)
+    release_from = np.full(num_berths, np.iinfo(np.int64).max, dtype=np.int64)
+    dropped = np.zeros(len(ids), dtype=bool)
+    changed: Dict[str, Dict] = {}
+
+    def touch(index: int):
+        release_from[berth[index]] = min(release_from[berth[index]], start_time[index])
+
+    for vessel_id in removed:
+        if vessel_id not in row:
+            raise ValueError(f"Unknown vessel {vessel_id!r}")
+        index = row[vessel_id]
+        if start_time[index] < current_time:
+            raise ValueError(f"Vessel {vessel_id!r} has already started and cannot be removed")
+        touch(index)
+        dropped[index] = True
+
+    gone = set(removed)
+
+    for update in updates:
+        vessel_id = update['vessel_id']
+        if vessel_id not in row:
+            raise ValueError(f"Unknown vessel {vessel_id!r}")
+        index = row[vessel_id]
+        if dropped[index]:
+            raise ValueError(f"Vessel {vessel_id!r} is both updated and removed")
+        entry = dict(changed.get(vessel_id, schedule[vessel_id]))
+        arrival = update.get('arrival_time', entry['arrival_time'])
+        if start_time[index] < current_time and arrival != entry['arrival_time']:
+            raise ValueError(f"Vessel {vessel_id!r} has already started; its arrival time cannot change")
+        touch(index)
+        entry['arrival_time'] = arrival
+        entry['processing_time'] = update.get('processing_time', entry['processing_time'])
+        entry['end_time'] = entry['start_time'] + entry['processing_time']
+        end_time[index] = entry['end_time']
+        changed[vessel_id] = entry
+
+    added = list(added)
+    added_ids = set()
+    for vessel in added:
+        vessel_id = vessel['vessel_id']
+        if vessel_id in added_ids or (vessel_id in schedule and vessel_id not in gone):
+            raise ValueError(f"Duplicate vessel {vessel_id!r}")
+        added_ids.add(vessel_id)
+
+    # Released: not started, on a touched berth, from its release time on
+    released = ~dropped & (start_time >= np.maximum(release_from[berth], current_time))
+    kept = ~dropped & ~released
+    available = np.full(num_berths, current_time, dtype=np.int64)
+    np.maximum.at(available, berth[kept], end_time[kept])
+
+    # A longer stay of a started vessel must not run into the next kept vessel
+    for vessel_id, entry in changed.items():
+        index = row[vessel_id]
+        if kept[index]:
+            later = kept & (berth == berth[index]) & (start_time > start_time[index])
+            if later.any() and entry['end_time'] > start_time[later].min():
+                raise ValueError(f"Vessel {vessel_id!r} would overlap a vessel that has already started")
+
+    # Place released and added vessels first-come-first-served; equal
+    # arrivals keep their order in the saved schedule
+    pending = []
+    for index in np.flatnonzero(released).tolist():
+        entry = changed.get(ids[index], schedule[ids[index]])
+        pending.append((entry['arrival_time'], index, ids[index], entry['processing_time']))
+    for index, vessel in enumerate(added):
+        pending.append((vessel['arrival_time'], len(ids) + index, vessel['vessel_id'], vessel['processing_time']))
+    pending.sort()
+    berths = BerthAvailability(num_berths, available.tolist())
+    for arrival, _, vessel_id, processing in pending:
+        available_time, best_berth = berths.earliest()
+        vessel_start = max(arrival, available_time)
+        if vessel_start >= planning_horizon:
+            raise ValueError(f"Vessel {vessel_id} cannot be scheduled within planning horizon")
+        changed[vessel_id] = {
+            'berth': best_berth,
+            'start_time': vessel_start,
+            'end_time': vessel_start + processing,
+            'arrival_time': arrival,
+            'processing_time': processing
+        }
+        berths.assign(vessel_start + processing)
+
+    # Copy the saved solution and patch in the changes
+    new_schedule = dict(schedule)
+    for vessel_id in removed:
+        del new_schedule[vessel_id]
+    new_schedule.update(changed)
+    new_vessels = list(vessels)
+    positions = [index for index, vessel in enumerate(vessels) if vessel['vessel_id'] in targets]
+    for index in reversed(positions):
+        vessel_id = vessels[index]['vessel_id']
+        if vessel_id in changed and vessel_id not in added_ids:
+            entry = changed[vessel_id]
+            new_vessels[index] = {'vessel_id': vessel_id, 'arrival_time': entry['arrival_time'],
+                                  'processing_time': entry['processing_time']}
+        else:
+            del new_vessels[index]
+    new_vessels += [
+        {'vessel_id': v['vessel_id'], 'arrival_time': v['arrival_time'], 'processing_time': v['processing_time']}
+        for v in added
+    ]
+
+    kept_end = int(end_time[kept].max()) if kept.any() else 0
+    makespan = max([kept_end] + [entry['end_time'] for entry in changed.values()])
+    diff = {
+        'added': [vessel['vessel_id'] for vessel in added],
+        'removed': removed,
+        'changed': {
+            vessel_id: {'before': _slot(schedule[vessel_id]), 'after': _slot(entry)}
+            for vessel_id, entry in changed.items()
+            if vessel_id not in added_ids and _slot(entry) != _slot(schedule[vessel_id])
+        },
+        'makespan': {'before': old_makespan, 'after': makespan}
+    }
+    return {
+        'schedule': new_schedule,
+        'vessels': new_vessels,
+        'makespan': makespan,
+        'solving_time': time.time() - start,
+        'diff': diff,
+        'repaired_berths': np.flatnonzero(release_from != np.iinfo(np.int64).max).tolist()
+    }
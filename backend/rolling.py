@@ -0,0 +1,246 @@
+"""
+Rolling-horizon solving for long planning horizons.
+
+A month of arrivals is too much for branch-and-bound or local search to look
+at in one go, and the heuristic schedules it in one pass but cannot improve
+it. Rolling-horizon mode cuts the timeline into windows of `window` hours
+that overlap by `overlap` hours. Each window is solved with the vessels
+arriving in it plus those still uncommitted from the previous window, with
+every berth free only after the vessels already committed to it. Vessels
+that arrive before the overlap are committed; those arriving in the overlap
+are solved again with the next window, so decisions near a window's end can
+still change. Work and memory per window depend on the window, not the
+horizon (even when the port is congested and start times run far past the
+window), so both grow linearly with the horizon.
+
+Stretches of the timeline separated by an idle moment (every berth free when
+the next vessel arrives, in the heuristic's schedule) do not affect each
+other. split_independent finds them so they can be solved in parallel and
+put back together with join_results.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import time
+
+import numpy as np
+
+from solver import (
+    solve_berth_scheduling_columnar,
+    schedule_from_columns,
+    BerthSchedulingProblem,
+    ProgressCallback,
+    VesselData,
+)
+from exact_solver import lower_bound, solve_berth_scheduling_exact
+from local_search import improve_schedule
+
+# Planning horizon used where only the shape of the heuristic schedule matters
+_UNBOUNDED = np.iinfo(np.int64).max
+
+
+def default_overlap(window: int) -> int:
+    """Overlap used when a request does not set one: a quarter of the window."""
+    return window // 4
+
+
+def split_independent(arrival_times: np.ndarray, processing_times: np.ndarray, num_berths: int,
+                      parts: int) -> List[np.ndarray]:
+    """
+    Split vessels into at most `parts` groups that can be solved separately.
+
+    Groups are cut only where every berth is idle in the heuristic's
+    schedule when the next vessel arrives, and are balanced by vessel count.
+
+    Returns:
+        Index arrays, each in arrival order, covering the timeline in order
+    """
+    if not len(arrival_times):
+        return []
+    heuristic = solve_berth_scheduling_columnar(arrival_times, processing_times, num_berths=num_berths,
+                                                planning_horizon=_UNBOUNDED)
+    order = heuristic['order']
+    busy_until = np.maximum.accumulate(heuristic['end_time'][order])
+    cuts = np.flatnonzero(arrival_times[order][1:] >= busy_until[:-1]) + 1
+    if parts <= 1 or not len(cuts):
+        return [order]
+    targets = np.arange(1, parts) * len(order) / parts
+    nearest = np.clip(np.searchsorted(cuts, targets), 0, len(cuts) - 1)
+    return np.split(order, np.unique(cuts[nearest]))
+
+
+def _solve_window(vessel_ids: List[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+                  num_berths: int, planning_horizon: int, available: List[int], solver: str,
+                  time_limit: float, callback: Optional[ProgressCallback]) -> Tuple[np.ndarray, np.ndarray]:
+    """Berth and start time of each vessel of one window, berths free from `available`."""
+    try:
+        initial = solve_berth_scheduling_columnar(arrival_times, processing_times, num_berths=num_berths,
+                                                  planning_horizon=planning_horizon, vessel_ids=vessel_ids,
+                                                  berth_available=available)
+    except ValueError:
+        if solver != "exact":
+            raise
+        initial = None
+    if solver not in ("exact", "local_search"):
+        return initial['berth'], initial['start_time']
+
+    problem = BerthSchedulingProblem(
+        vessels=[
+            VesselData(vessel_id=vessel_id, arrival_time=arrival, processing_time=processing)
+            for vessel_id, arrival, processing in zip(vessel_ids, arrival_times.tolist(),
+                                                      processing_times.tolist())
+        ],
+        planning_horizon=planning_horizon,
+        num_berths=num_berths,
+        berth_available=available
+    )
+    if initial is not None:
+        initial['schedule'] = schedule_from_columns(vessel_ids, arrival_times, processing_times, initial)
+    if solver == "exact":
+        result = solve_berth_scheduling_exact(problem, time_limit=time_limit, warm_start=initial, callback=callback)
+    else:
+        result = improve_schedule(problem, initial, time_limit=time_limit, callback=callback)
+    schedule = result['schedule']
+    n = len(vessel_ids)
+    return (np.fromiter((schedule[v]['berth'] for v in vessel_ids), dtype=np.int64, count=n),
+            np.fromiter((schedule[v]['start_time'] for v in vessel_ids), dtype=np.int64, count=n))
+
+
+def solve_rolling(vessel_ids: Sequence[str], arrival_times: np.ndarray, processing_times: np.ndarray,
+                  num_berths: int, planning_horizon: int, window: int, overlap: Optional[int] = None,
+                  solver: str = "heuristic", time_limit: float = 10.0,
+                  callback: Optional[ProgressCallback] = None) -> Dict:
+    """
+    Solve a problem window by window.
+
+    Args:
+        vessel_ids: Vessel identifiers
+        arrival_times: Arrival time of each vessel
+        processing_times: Processing time of each vessel
+        num_berths: Number of berths
+        planning_horizon: Latest allowed start time (exclusive), for the
+            whole problem rather than each window
+        window: Window length in hours
+        overlap: Hours at the end of each window that are solved again with
+            the next one (default: default_overlap(window))
+        solver: Solver for each window ('heuristic', 'exact' or 'local_search')
+        time_limit: Total time budget in seconds, shared between windows in
+            proportion to their new vessels
+        callback: Optional progress callback; returning False solves the
+            remaining windows with the heuristic
+
+    Returns:
+        Result dictionary like dispatch.run_solver, plus the number of
+        windows solved
+
+    Raises:
+        ValueError: For an invalid window or overlap, or a vessel that
+            cannot be scheduled within the planning horizon
+    """
+    start = time.time()
+    overlap = default_overlap(window) if overlap is None else overlap
+    if solver not in ("heuristic", "exact", "local_search"):
+        raise ValueError(f"Solver {solver!r} cannot be used with a window")
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    if not 0 <= overlap < window:
+        raise ValueError("window_overlap must be at least 0 and less than window")
+
+    arrival_times = np.asarray(arrival_times, dtype=np.int64)
+    processing_times = np.asarray(processing_times, dtype=np.int64)
+    n = len(arrival_times)
+    order = np.argsort(arrival_times, kind='stable')
+    sorted_arrivals = arrival_times[order]
+    berth = np.zeros(n, dtype=np.int64)
+    start_time = np.zeros(n, dtype=np.int64)
+    available = np.zeros(num_berths, dtype=np.int64)
+    committed_makespan = 0
+    stopped = False
+
+    def report(update: Dict) -> bool:
+        nonlocal stopped
+        if callback is None:
+            return True
+        keep_going = callback({'makespan': max(committed_makespan, update['makespan']),
+                               'elapsed': time.time() - start})
+        stopped = stopped or keep_going is False
+        return keep_going
+
+    # Vessels in the previous window's overlap, in arrival order
+    carried = np.zeros(0, dtype=np.int64)
+    position = 0
+    window_start = int(sorted_arrivals[0]) if n else 0
+    windows = 0
+    while position < n or len(carried):
+        if not len(carried) and sorted_arrivals[position] >= window_start + window:
+            # Skip empty stretches of the timeline
+            window_start = int(sorted_arrivals[position])
+        window_end = window_start + window
+        stop = int(np.searchsorted(sorted_arrivals, window_end, side='left'))
+        batch = np.concatenate([carried, order[position:stop]])
+        budget = time_limit * (stop - position) / n
+        position = stop
+
+        batch_berth, batch_start = _solve_window(
+            [vessel_ids[i] for i in batch.tolist()], arrival_times[batch], processing_times[batch], num_berths,
+            planning_horizon, available.tolist(), "heuristic" if stopped else solver, budget,
+            report if solver != "heuristic" else None
+        )
+        windows += 1
+        commit = arrival_times[batch] < window_end - overlap if position < n else np.ones(len(batch), dtype=bool)
+        committed = batch[commit]
+        berth[committed] = batch_berth[commit]
+        start_time[committed] = batch_start[commit]
+        ends = batch_start[commit] + processing_times[committed]
+        np.maximum.at(available, batch_berth[commit], ends)
+        if len(ends):
+            committed_makespan = max(committed_makespan, int(ends.max()))
+        carried = batch[~commit]
+        window_start = window_end - overlap
+        if callback is not None and not stopped:
+            report({'makespan': committed_makespan})
+
+    columns = {'order': order, 'berth': berth, 'start_time': start_time, 'end_time': start_time + processing_times}
+    result = {
+        'schedule': schedule_from_columns(vessel_ids, arrival_times, processing_times, columns),
+        'makespan': committed_makespan,
+        'solving_time': time.time() - start,
+        'windows': windows
+    }
+    if solver in ("exact", "local_search"):
+        bound = lower_bound(arrival_times, processing_times, num_berths)
+        result['lower_bound'] = bound
+        result['optimality_gap'] = (committed_makespan - bound) / committed_makespan if committed_makespan else 0.0
+    return result
+
+
+def join_results(results: List[Dict], first_arrivals: Sequence[int], bound: Optional[int] = None) -> Optional[Dict]:
+    """
+    Combine the results of consecutive groups from split_independent.
+
+    Args:
+        results: solve_rolling results, in timeline order
+        first_arrivals: First arrival of each group
+        bound: Lower bound of the whole problem, for the optimality gap
+
+    Returns:
+        Combined result, or None if a group's schedule runs past the first
+        arrival of the next group, in which case the groups were not
+        independent after all and the problem has to be solved in one piece
+    """
+    for result, next_arrival in zip(results, first_arrivals[1:]):
+        if result['makespan'] > next_arrival:
+            return None
+    schedule = {}
+    for result in results:
+        schedule.update(result['schedule'])
+    makespan = max((result['makespan'] for result in results), default=0)
+    joined = {
+        'schedule': schedule,
+        'makespan': makespan,
+        'solving_time': max((result['solving_time'] for result in results), default=0.0),
+        'windows': sum(result['windows'] for result in results)
+    }
+    if bound is not None:
+        joined['lower_bound'] = bound
+        joined['optimality_gap'] = (makespan - bound) / makespan if makespan else 0.0
+    return joined
@@ -9,18 +9,41 @@ Constraints:
 - Vessels cannot overlap at the same berth
 - Time is discrete (hours)
 - Planning horizon is 72 hours (3 days)
+- Optionally, a vessel only fits berths long and deep enough for it, and
+  berths are closed during maintenance intervals (see berth_model)
 """
 
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import heapq
 import time
 
+import numpy as np
+
+from berth_model import BerthModel, BerthQueue
+
+# Called by long-running solvers with progress updates ('makespan',
+# 'lower_bound', 'elapsed', and 'schedule': a function returning the best
+# schedule so far, so it is only built when wanted). Returning False asks
+# the solver to stop early and return the best schedule found so far.
+ProgressCallback = Callable[[Dict], bool]
+
 @dataclass
 class VesselData:
     """Vessel arrival and processing information."""
     vessel_id: str
     arrival_time: int
     processing_time: int
+    length: Optional[float] = None  # Metres; None fits any berth
+    draft: Optional[float] = None  # Metres; None fits any berth
+
+@dataclass
+class BerthData:
+    """Berth limits and closures; a None limit accepts any vessel."""
+    max_length: Optional[float] = None
+    max_draft: Optional[float] = None
+    # [start, end) intervals during which no vessel may be at the berth
+    closures: List[Tuple[int, int]] = field(default_factory=list)
 
 @dataclass
 class BerthSchedulingProblem:
@@ -28,6 +51,41 @@ class BerthSchedulingProblem:
     vessels: List[VesselData]
     planning_horizon: int = 72  # 3 days in hours
     num_berths: int = 2
+    # Time each berth becomes free (default 0), e.g. after vessels committed
+    # in an earlier planning window. The makespan then also covers these times.
+    berth_available: Optional[List[int]] = None
+    # One entry per berth; None means identical berths that are always open
+    berths: Optional[List[BerthData]] = None
+
+class BerthAvailability:
+    """
+    Priority queue of berths keyed by the time each becomes free.
+
+    Ties are broken by berth index, so the berth returned by ``earliest``
+    is the same one ``min(availability, key=availability.get)`` picks over
+    a dict of berths in index order. Selection and update cost O(log B).
+    """
+
+    def __init__(self, num_berths: int, available: Optional[Sequence[int]] = None):
+        """
+        Args:
+            num_berths: Number of berths
+            available: Optional time each berth becomes free (default all 0)
+        """
+        if num_berths < 1:
+            raise ValueError("At least one berth is required")
+        available = available if available is not None else [0] * num_berths
+        self._heap: List[Tuple[int, int]] = [(available[b], b) for b in range(num_berths)]
+        heapq.heapify(self._heap)
+
+    def earliest(self) -> Tuple[int, int]:
+        """Return (available_time, berth) for the berth that frees up first."""
+        return self._heap[0]
+
+    def assign(self, end_time: int) -> None:
+        """Occupy the earliest berth until end_time."""
+        berth = self._heap[0][1]
+        heapq.heapreplace(self._heap, (end_time, berth))
 
 def solve_berth_scheduling(problem: BerthSchedulingProblem) -> Dict:
     """
@@ -56,17 +114,23 @@ def solve_berth_scheduling(problem: BerthSchedulingProblem) -> Dict:
     
     # Heuristic: First-Come-First-Served with earliest available berth
     schedule = {}
-    berth_availability = {b: 0 for b in range(problem.num_berths)}  # Track when each berth becomes free
+    berth_availability = BerthAvailability(problem.num_berths, problem.berth_available)  # Track when each berth becomes free
     
     # Sort vessels by arrival time
     sorted_vessels = sorted(problem.vessels, key=lambda v: v.arrival_time)
+    # With berth limits or closures, the earliest feasible start among the berths the vessel fits
+    model = BerthModel.from_problem(problem, sorted_vessels)
+    berth_queue = BerthQueue(model, problem.berth_available) if model is not None else None
     
-    for vessel in sorted_vessels:
-        # Find the berth that becomes available earliest
-        best_berth = min(berth_availability, key=berth_availability.get)
-        
-        # Vessel can start at max(arrival_time, berth_available_time)
-        start_time_vessel = max(vessel.arrival_time, berth_availability[best_berth])
+    for index, vessel in enumerate(sorted_vessels):
+        if berth_queue is not None:
+            best_berth, start_time_vessel = berth_queue.place(index, vessel.arrival_time, vessel.processing_time)
+        else:
+            # Find the berth that becomes available earliest
+            available_time, best_berth = berth_availability.earliest()
+            
+            # Vessel can start at max(arrival_time, berth_available_time)
+            start_time_vessel = max(vessel.arrival_time, available_time)
         
         # Check planning horizon
         if start_time_vessel >= problem.planning_horizon:
@@ -84,10 +148,13 @@ def solve_berth_scheduling(problem: BerthSchedulingProblem) -> Dict:
         }
         
         # Update berth availability
-        berth_availability[best_berth] = end_time_vessel
+        if berth_queue is None:
+            berth_availability.assign(end_time_vessel)
     
     # Calculate makespan
     makespan = max(v['end_time'] for v in schedule.values()) if schedule else 0
+    if problem.berth_available:
+        makespan = max(makespan, max(problem.berth_available))
     
     solving_time = time.time() - start_time
     
@@ -96,3 +163,123 @@ def solve_berth_scheduling(problem: BerthSchedulingProblem) -> Dict:
         'makespan': makespan,
         'solving_time': solving_time
     }
+
+def solve_berth_scheduling_columnar(arrival_times: np.ndarray, processing_times: np.ndarray,
+                                    num_berths: int = 2, planning_horizon: int = 72,
+                                    vessel_ids: Optional[Sequence[str]] = None,
+                                    berth_available: Optional[Sequence[int]] = None,
+                                    berths: Optional[Sequence[BerthData]] = None,
+                                    lengths: Optional[np.ndarray] = None,
+                                    drafts: Optional[np.ndarray] = None) -> Dict:
+    """
+    Solve the berth scheduling problem on column arrays.
+    
+    Same First-Come-First-Served heuristic as solve_berth_scheduling, but the
+    vessels are given as parallel integer arrays instead of VesselData objects
+    and no per-vessel dicts are built. Use schedule_from_columns to convert the
+    result to the schedule dict shape at the API boundary.
+    
+    Args:
+        arrival_times: Arrival time of each vessel
+        processing_times: Processing time of each vessel
+        num_berths: Number of berths
+        planning_horizon: Latest allowed start time (exclusive)
+        vessel_ids: Optional vessel identifiers, only used in error messages
+        berth_available: Optional time each berth becomes free (default 0)
+        berths: Optional BerthData per berth (limits and closures)
+        lengths: Optional length of each vessel (NaN when unknown)
+        drafts: Optional draft of each vessel (NaN when unknown)
+    
+    Returns:
+        Dictionary with:
+        - order: Vessel indices sorted by arrival time (stable)
+        - berth: Assigned berth per vessel
+        - start_time: Start time per vessel
+        - end_time: End time per vessel
+        - makespan: Latest departure time
+        - solving_time: Time taken to solve
+    """
+    start_time = time.time()
+    
+    arrival_times = np.asarray(arrival_times, dtype=np.int64)
+    processing_times = np.asarray(processing_times, dtype=np.int64)
+    num_vessels = len(arrival_times)
+    
+    # Stable sort keeps input order for equal arrivals, like sorted()
+    order = np.argsort(arrival_times, kind='stable')
+    assigned_berths = np.empty(num_vessels, dtype=np.int64)
+    starts = np.empty(num_vessels, dtype=np.int64)
+    
+    model = None
+    if berths is not None:
+        if len(berths) != num_berths:
+            raise ValueError(f"berths must describe all {num_berths} berths")
+        model = BerthModel(berths, lengths.tolist() if lengths is not None else [None] * num_vessels,
+                           drafts.tolist() if drafts is not None else None, vessel_ids)
+        if not (model.restricts or model.has_closures):
+            model = None
+    
+    if num_vessels:
+        berth_availability = BerthAvailability(num_berths, berth_available)
+        berth_queue = BerthQueue(model, berth_available) if model is not None else None
+        # Plain Python ints in the hot loop are much faster than numpy scalars
+        sorted_berths = []
+        sorted_starts = []
+        for index, arrival, processing in zip(order.tolist(),
+                                              arrival_times[order].tolist(),
+                                              processing_times[order].tolist()):
+            if berth_queue is not None:
+                best_berth, start_time_vessel = berth_queue.place(index, arrival, processing)
+            else:
+                available_time, best_berth = berth_availability.earliest()
+                start_time_vessel = max(arrival, available_time)
+            
+            if start_time_vessel >= planning_horizon:
+                vessel_id = vessel_ids[index] if vessel_ids is not None else f"at index {index}"
+                raise ValueError(f"Vessel {vessel_id} cannot be scheduled within planning horizon")
+            
+            sorted_berths.append(best_berth)
+            sorted_starts.append(start_time_vessel)
+            if berth_queue is None:
+                berth_availability.assign(start_time_vessel + processing)
+        
+        assigned_berths[order] = sorted_berths
+        starts[order] = sorted_starts
+    
+    ends = starts + processing_times
+    makespan = int(ends.max()) if num_vessels else 0
+    if num_vessels and berth_available is not None and len(berth_available):
+        makespan = max(makespan, int(max(berth_available)))
+    
+    return {
+        'order': order,
+        'berth': assigned_berths,
+        'start_time': starts,
+        'end_time': ends,
+        'makespan': makespan,
+        'solving_time': time.time() - start_time
+    }
+
+def schedule_from_columns(vessel_ids: Sequence[str], arrival_times: np.ndarray,
+                          processing_times: np.ndarray, result: Dict) -> Dict[str, Dict]:
+    """
+    Build the schedule dict returned by solve_berth_scheduling from columnar
+    solver output. Entries are inserted in arrival order, as the heuristic does.
+    """
+    order = result['order'].tolist()
+    berths = result['berth'].tolist()
+    starts = result['start_time'].tolist()
+    ends = result['end_time'].tolist()
+    arrivals = np.asarray(arrival_times).tolist()
+    processings = np.asarray(processing_times).tolist()
+    
+    return {
+        vessel_ids[i]: {
+            'berth': berths[i],
+            'start_time': starts[i],
+            'end_time': ends[i],
+            'arrival_time': arrivals[i],
+            'processing_time': processings[i]
+        }
+        for i in order
+    }
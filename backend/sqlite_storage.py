@@ -0,0 +1,344 @@
+"""
+Solution storage in a local SQLite file.
+
+For single-node deployments (e.g. at a terminal's edge) and for tests
+without LocalStack: reads and writes are local calls that take
+microseconds, with no network round trip. The database runs in WAL mode,
+so readers do not block the writer and concurrent API threads each use
+their own connection.
+
+Payloads use the same binary encoding as DynamoDB (see storage_format).
+Solutions with more than INLINE_VESSEL_LIMIT vessels are stored as one
+segment per berth plus vessel lookup buckets in solution_segments, so
+berth and vessel reads only load the segments they need.
+
+With SOLUTION_RETENTION_DAYS set, versions past their expires_at are no
+longer read or listed, and are purged when the database is opened and
+then at most every PURGE_INTERVAL seconds while solutions are saved.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import base64
+import binascii
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from storage import (INLINE_VESSEL_LIMIT, SUMMARY_FIELDS, VERSION_FIELDS, SolutionStorage, expires_at, solution_fields,
+                     solution_view, summary_item)
+from storage_format import (decode_segment, decode_solution, encode_segments, encode_solution,
+                            join_segments, vessel_bucket)
+
+# Seconds between purges of expired versions
+PURGE_INTERVAL = 3600
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS solutions (
+    problem_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    problem_hash TEXT,
+    makespan INTEGER,
+    solving_time TEXT,
+    num_vessels INTEGER,
+    lower_bound INTEGER,
+    optimality_gap TEXT,
+    num_berths INTEGER,
+    planning_horizon INTEGER,
+    berths_json TEXT,
+    solution_bin BLOB,
+    schedule_json TEXT,
+    vessels_json TEXT,
+    solution_berths TEXT,
+    vessel_buckets INTEGER,
+    expires_at INTEGER,
+    PRIMARY KEY (problem_id, timestamp)
+);
+CREATE INDEX IF NOT EXISTS solutions_by_timestamp ON solutions (timestamp, problem_id);
+CREATE INDEX IF NOT EXISTS solutions_by_hash ON solutions (problem_hash, timestamp);
+CREATE INDEX IF NOT EXISTS solutions_by_expiry ON solutions (expires_at) WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS solution_segments (
+    problem_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (problem_id, timestamp, segment)
+) WITHOUT ROWID;
+'''
+
+# Columns returned with every solution; the payload columns are decoded into schedule and vessels
+DETAIL_COLUMNS = SUMMARY_FIELDS + ('berths_json',)
+PAYLOAD_COLUMNS = ('solution_bin', 'schedule_json', 'vessels_json', 'solution_berths', 'vessel_buckets')
+LIST_COLUMNS = ('problem_id', 'timestamp', 'makespan', 'solving_time', 'num_vessels')
+# Versions not yet expired but not purged; takes the current epoch second
+UNEXPIRED = '(expires_at IS NULL OR expires_at > ?)'
+
+
+class SQLiteManager(SolutionStorage):
+    """Manager for solutions in a SQLite database file."""
+
+    def __init__(self, path: Optional[str] = None, busy_timeout: Optional[float] = None):
+        """
+        Initialize the manager.
+
+        Args:
+            path: Database file (defaults to env SQLITE_PATH or berth_scheduling.db)
+            busy_timeout: Seconds a write waits for another writer (defaults
+                to env SQLITE_BUSY_TIMEOUT or 5)
+        """
+        self.path = path or os.getenv('SQLITE_PATH', 'berth_scheduling.db')
+        self.busy_timeout = busy_timeout if busy_timeout is not None \
+            else float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
+        # sqlite3 connections cannot be shared between threads
+        self._local = threading.local()
+        self._next_purge = 0.0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            connection.row_factory = sqlite3.Row
+            # WAL is stored in the file; NORMAL only syncs at checkpoints, which is safe in WAL mode
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def create_table(self):
+        """Create the tables and indexes if they do not exist."""
+        try:
+            self.connection.executescript(SCHEMA)
+            print(f"Opened SQLite database {self.path}")
+            self.purge_expired()
+        except Exception as e:
+            print(f"Table creation error: {e}")
+
+    def purge_expired(self) -> int:
+        """
+        Delete the versions whose expires_at has passed.
+
+        Returns:
+            Number of versions deleted
+        """
+        self._next_purge = time.monotonic() + PURGE_INTERVAL
+        now = int(time.time())
+        with metrics.stage('db_delete'), self.connection as connection:
+            connection.execute(
+                'DELETE FROM solution_segments WHERE (problem_id, timestamp) IN '
+                '(SELECT problem_id, timestamp FROM solutions WHERE expires_at <= ?)', (now,)
+            )
+            return connection.execute('DELETE FROM solutions WHERE expires_at <= ?', (now,)).rowcount
+
+    def _solution_rows(self, problem_id: str, solution_data: Dict) -> Tuple[Dict, List[Tuple[str, bytes]]]:
+        """The solutions row of a solution and its (segment, data) rows."""
+        vessels = solution_data.get('vessels', [])
+        schedule = solution_data.get('schedule', {})
+        row = {**summary_item(problem_id, solution_data), 'expires_at': expires_at()}
+
+        segments = []
+        if len(schedule) <= INLINE_VESSEL_LIMIT:
+            row['solution_bin'] = encode_solution(schedule, vessels)
+        else:
+            encoded = encode_segments(schedule, vessels)
+            if encoded is not None:
+                berths, buckets = encoded
+                segments = [(f"berth#{berth:05d}", segment) for berth, segment in berths.items()]
+                segments += [(f"vessel#{bucket:05d}", segment) for bucket, segment in enumerate(buckets)]
+                row['solution_berths'] = json.dumps(sorted(berths))
+                row['vessel_buckets'] = len(buckets)
+        if row.get('solution_bin') is None and not segments:
+            # Not representable in columns (e.g. partial schedules): keep JSON
+            row['schedule_json'] = json.dumps(schedule)
+            row['vessels_json'] = json.dumps([v.dict() if hasattr(v, 'dict') else v for v in vessels])
+        return row, segments
+
+    def _write(self, solutions: List[Tuple[str, Dict]]):
+        """Write solutions in one transaction, replacing earlier segments of the same version."""
+        rows = [self._solution_rows(problem_id, solution_data) for problem_id, solution_data in solutions]
+        with metrics.stage('db_put'), self.connection as connection:
+            for row, segments in rows:
+                key = (row['problem_id'], row['timestamp'])
+                connection.execute('DELETE FROM solution_segments WHERE problem_id = ? AND timestamp = ?', key)
+                connection.executemany('INSERT INTO solution_segments VALUES (?, ?, ?, ?)',
+                                       [(*key, name, data) for name, data in segments])
+                connection.execute(f"INSERT OR REPLACE INTO solutions ({', '.join(row)}) "
+                                   f"VALUES ({', '.join('?' * len(row))})", list(row.values()))
+        if expires_at() is not None and time.monotonic() >= self._next_purge:
+            try:
+                self.purge_expired()
+            except Exception as e:
+                print(f"Error purging expired solutions: {e}")
+
+    def save_solution(self, problem_id: str, solution_data: Dict) -> bool:
+        try:
+            self._write([(problem_id, solution_data)])
+            return True
+        except Exception as e:
+            print(f"Error saving solution: {e}")
+            return False
+
+    def save_solutions(self, solutions: List[Tuple[str, Dict]]) -> bool:
+        try:
+            self._write(solutions)
+            return True
+        except Exception as e:
+            print(f"Error saving solutions: {e}")
+            return False
+
+    def _segments(self, row: sqlite3.Row, berth: Optional[int], vessel: Optional[str]) -> List:
+        """Decoded segments holding the requested part of a segmented solution."""
+        key = (row['problem_id'], row['timestamp'])
+        if vessel is not None:
+            names = [f"vessel#{vessel_bucket(vessel, row['vessel_buckets']):05d}"]
+        else:
+            berths = json.loads(row['solution_berths'])
+            names = [f"berth#{b:05d}" for b in berths if berth is None or b == berth]
+        if not names:
+            return []
+        found = self.connection.execute(
+            f"SELECT segment, data FROM solution_segments WHERE problem_id = ? AND timestamp = ? "
+            f"AND segment IN ({', '.join('?' * len(names))}) ORDER BY segment", (*key, *names)
+        ).fetchall()
+        return [decode_segment(part['data']) for part in found]
+
+    def _decode(self, row: sqlite3.Row, berth: Optional[int], vessel: Optional[str]) -> Tuple[Dict, List]:
+        if row['solution_berths'] is not None:
+            return join_segments(self._segments(row, berth, vessel))
+        if row['solution_bin'] is not None:
+            return decode_solution(row['solution_bin'])
+        return json.loads(row['schedule_json'] or '{}'), json.loads(row['vessels_json'] or '[]')
+
+    def get_solution(self, problem_id: str, timestamp: Optional[str] = None,
+                     fields: Optional[List[str]] = None, berth: Optional[int] = None,
+                     vessel: Optional[str] = None, as_of: Optional[str] = None) -> Optional[Dict]:
+        fields = solution_fields(fields)
+        summary_only = 'schedule' not in fields and 'vessels' not in fields
+        columns = SUMMARY_FIELDS if summary_only else DETAIL_COLUMNS + PAYLOAD_COLUMNS
+        query = f"SELECT {', '.join(columns)} FROM solutions WHERE problem_id = ? AND {UNEXPIRED}"
+        key = (problem_id, int(time.time()))
+        try:
+            with metrics.stage('db_get'):
+                if timestamp is None and as_of is not None:
+                    row = self.connection.execute(query + ' AND timestamp <= ? ORDER BY timestamp DESC LIMIT 1',
+                                                  (*key, as_of)).fetchone()
+                elif timestamp is None:
+                    row = self.connection.execute(query + ' ORDER BY timestamp DESC LIMIT 1', key).fetchone()
+                else:
+                    row = self.connection.execute(query + ' AND timestamp = ?', (*key, timestamp)).fetchone()
+                if row is None:
+                    return None
+                item = {name: row[name] for name in SUMMARY_FIELDS if row[name] is not None}
+                if summary_only:
+                    return item
+                if row['berths_json'] is not None:
+                    item['berths_json'] = row['berths_json']
+                schedule, vessels = self._decode(row, berth, vessel)
+        except Exception as e:
+            print(f"Error retrieving solution: {e}")
+            return None
+        return solution_view(item, schedule, vessels, fields, berth, vessel)
+
+    def find_solution_by_hash(self, problem_hash: str) -> Optional[Dict]:
+        try:
+            with metrics.stage('db_query'):
+                row = self.connection.execute(
+                    f"SELECT problem_id, timestamp FROM solutions WHERE problem_hash = ? AND {UNEXPIRED} "
+                    f"ORDER BY timestamp DESC LIMIT 1", (problem_hash, int(time.time()))
+                ).fetchone()
+            if row is None:
+                return None
+            return self.get_solution(row['problem_id'], row['timestamp'])
+        except Exception as e:
+            print(f"Error looking up solution by hash: {e}")
+            return None
+
+    def list_solutions_page(self, limit: int = 10, next_token: Optional[str] = None,
+                            min_vessels: Optional[int] = None, max_vessels: Optional[int] = None,
+                            min_makespan: Optional[int] = None, max_makespan: Optional[int] = None) -> Dict:
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        conditions, values = [UNEXPIRED], [int(time.time())]
+        if next_token:
+            conditions.append('(timestamp, problem_id) < (?, ?)')
+            values.extend(_decode_token(next_token))
+        for column, low, high in (('num_vessels', min_vessels, max_vessels),
+                                  ('makespan', min_makespan, max_makespan)):
+            if low is not None:
+                conditions.append(f"{column} >= ?")
+                values.append(low)
+            if high is not None:
+                conditions.append(f"{column} <= ?")
+                values.append(high)
+        where = f"WHERE {' AND '.join(conditions)} "
+
+        try:
+            with metrics.stage('db_query'):
+                # One row more than the page tells whether there is a next page
+                rows = self.connection.execute(
+                    f"SELECT {', '.join(LIST_COLUMNS)} FROM solutions {where}"
+                    f"ORDER BY timestamp DESC, problem_id DESC LIMIT ?", (*values, limit + 1)
+                ).fetchall()
+        except Exception as e:
+            print(f"Error listing solutions: {e}")
+            return {'solutions': [], 'next_token': None}
+        solutions = [{column: row[column] for column in LIST_COLUMNS} for row in rows[:limit]]
+        more = len(rows) > limit
+        return {'solutions': solutions,
+                'next_token': _encode_token(solutions[-1]) if more else None}
+
+    def list_versions(self, problem_id: str, limit: int = 10, next_token: Optional[str] = None) -> Dict:
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        condition, values = '', [problem_id, int(time.time())]
+        if next_token:
+            timestamp, token_problem_id = _decode_token(next_token)
+            if token_problem_id != problem_id:
+                raise ValueError("Invalid next_token")
+            condition = 'AND timestamp < ? '
+            values.append(timestamp)
+
+        try:
+            with metrics.stage('db_query'):
+                rows = self.connection.execute(
+                    f"SELECT {', '.join(VERSION_FIELDS)} FROM solutions WHERE problem_id = ? AND {UNEXPIRED} {condition}"
+                    f"ORDER BY timestamp DESC LIMIT ?", (*values, limit + 1)
+                ).fetchall()
+        except Exception as e:
+            print(f"Error listing versions: {e}")
+            return {'versions': [], 'next_token': None}
+        versions = [{column: row[column] for column in VERSION_FIELDS if row[column] is not None}
+                    for row in rows[:limit]]
+        more = len(rows) > limit
+        return {'versions': versions,
+                'next_token': _encode_token({'timestamp': versions[-1]['timestamp'], 'problem_id': problem_id})
+                if more else None}
+
+    def delete_solution(self, problem_id: str) -> bool:
+        try:
+            with metrics.stage('db_delete'), self.connection as connection:
+                connection.execute('DELETE FROM solution_segments WHERE problem_id = ?', (problem_id,))
+                connection.execute('DELETE FROM solutions WHERE problem_id = ?', (problem_id,))
+            return True
+        except Exception as e:
+            print(f"Error deleting solution: {e}")
+            return False
+
+
+def _encode_token(solution: Dict) -> str:
+    """Opaque pagination cursor after a listed solution."""
+    return base64.urlsafe_b64encode(json.dumps([solution['timestamp'], solution['problem_id']]).encode()).decode()
+
+
+def _decode_token(token: str) -> List[str]:
+    """(timestamp, problem_id) of a cursor produced by _encode_token."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid next_token")
+    if not isinstance(key, list) or len(key) != 2 or not all(isinstance(part, str) for part in key):
+        raise ValueError("Invalid next_token")
+    return key
@@ -0,0 +1,255 @@
+"""
+Storage backends for solutions.
+
+SolutionStorage is the interface the API depends on. DynamoDBManager (see
+database) stores solutions in DynamoDB; SQLiteManager (see sqlite_storage)
+keeps them in a local SQLite file, for single-node deployments and tests
+without LocalStack. The STORAGE_BACKEND environment variable selects one.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import time
+
+# Parts of a solution that get_solution can return
+SOLUTION_FIELDS = ('summary', 'schedule', 'vessels')
+# Attributes returned for fields=['summary']
+SUMMARY_FIELDS = ('problem_id', 'timestamp', 'makespan', 'solving_time', 'num_vessels', 'problem_hash',
+                  'lower_bound', 'optimality_gap', 'num_berths', 'planning_horizon')
+# Attributes returned by list_versions
+VERSION_FIELDS = ('timestamp', 'makespan', 'solving_time', 'num_vessels', 'lower_bound', 'optimality_gap')
+# Solutions with more vessels are stored as one segment per berth plus vessel
+# lookup buckets (see storage_format.encode_segments), so summary, berth and
+# vessel reads only load a small, bounded amount of data however large the
+# solution is
+INLINE_VESSEL_LIMIT = 5000
+# Days each saved version is kept; unset keeps versions until the solution is deleted
+RETENTION_DAYS = float(os.getenv('SOLUTION_RETENTION_DAYS')) if os.getenv('SOLUTION_RETENTION_DAYS') else None
+
+
+def solution_fields(fields: Optional[List[str]]) -> List[str]:
+    """
+    The fields to return from get_solution (default all).
+
+    Raises:
+        ValueError: If fields contains an unknown name
+    """
+    fields = list(SOLUTION_FIELDS) if fields is None else fields
+    unknown = [field for field in fields if field not in SOLUTION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}; expected some of {list(SOLUTION_FIELDS)}")
+    return fields
+
+
+def summary_item(problem_id: str, solution_data: Dict) -> Dict:
+    """
+    The attributes saved with a solution besides its schedule and vessels.
+
+    Both backends store and return them like this: fractional numbers as
+    strings, the berths as JSON, and absent values left out.
+    """
+    item = {
+        'problem_id': problem_id,
+        'timestamp': solution_data.get('timestamp', datetime.now(timezone.utc).isoformat()),
+        'makespan': solution_data.get('makespan', 0),
+        'solving_time': str(solution_data.get('solving_time', 0)),
+        'num_vessels': len(solution_data.get('vessels', []))
+    }
+    if solution_data.get('problem_hash'):
+        item['problem_hash'] = solution_data['problem_hash']
+    if solution_data.get('lower_bound') is not None:
+        item['lower_bound'] = solution_data['lower_bound']
+        item['optimality_gap'] = str(solution_data.get('optimality_gap', 0))
+    for option in ('num_berths', 'planning_horizon'):
+        if solution_data.get(option) is not None:
+            item[option] = solution_data[option]
+    if solution_data.get('berths') is not None:
+        item['berths_json'] = json.dumps(solution_data['berths'])
+    return item
+
+
+def solution_view(item: Dict, schedule: Dict, vessels: List[Dict], fields: List[str], berth: Optional[int] = None,
+                  vessel: Optional[str] = None) -> Dict:
+    """
+    Add the schedule and vessels to a solution's attributes as get_solution
+    returns them: restricted to one berth and/or vessel if given, and to
+    fields (validated names, see solution_fields).
+    """
+    if berth is not None or vessel is not None:
+        schedule = {
+            vessel_id: entry for vessel_id, entry in schedule.items()
+            if (berth is None or entry.get('berth') == berth) and (vessel is None or vessel_id == vessel)
+        }
+        vessels = [v for v in vessels if v.get('vessel_id') in schedule]
+    if 'schedule' in fields:
+        item['schedule'] = schedule
+    if 'vessels' in fields:
+        item['vessels'] = vessels
+    return item
+
+
+def unsaved_solution(problem_id: str, solution_data: Dict, fields: Optional[List[str]] = None,
+                     berth: Optional[int] = None, vessel: Optional[str] = None) -> Dict:
+    """
+    A solution not saved yet (see persistence), exactly as get_solution
+    will return it once it is, so both get the same ETag.
+
+    Raises:
+        ValueError: If fields contains an unknown name
+    """
+    fields = solution_fields(fields)
+    item = summary_item(problem_id, solution_data)
+    if 'schedule' not in fields and 'vessels' not in fields:
+        return {name: item[name] for name in SUMMARY_FIELDS if name in item}
+    item = {name: item[name] for name in SUMMARY_FIELDS + ('berths_json',) if name in item}
+    return solution_view(item, solution_data['schedule'], solution_data['vessels'], fields, berth, vessel)
+
+
+def expires_at() -> Optional[int]:
+    """Expiry time (epoch seconds) for a version saved now, or None without a retention policy."""
+    if RETENTION_DAYS is None:
+        return None
+    return int(time.time() + RETENTION_DAYS * 86400)
+
+
+class SolutionStorage(ABC):
+    """Interface for saving, reading, listing and deleting solutions."""
+
+    @abstractmethod
+    def create_table(self):
+        """Create the tables and indexes if they do not exist."""
+
+    @abstractmethod
+    def save_solution(self, problem_id: str, solution_data: Dict) -> bool:
+        """
+        Save a scheduling solution.
+
+        Args:
+            problem_id: Unique problem identifier
+            solution_data: Dictionary containing the solution data
+
+        Returns:
+            True if successful
+        """
+
+    def save_solutions(self, solutions: List[Tuple[str, Dict]]) -> bool:
+        """
+        Save several solutions.
+
+        Args:
+            solutions: (problem_id, solution_data) pairs
+
+        Returns:
+            True if successful
+        """
+        return all([self.save_solution(problem_id, solution_data) for problem_id, solution_data in solutions])
+
+    @abstractmethod
+    def get_solution(self, problem_id: str, timestamp: Optional[str] = None,
+                     fields: Optional[List[str]] = None, berth: Optional[int] = None,
+                     vessel: Optional[str] = None, as_of: Optional[str] = None) -> Optional[Dict]:
+        """
+        Retrieve a solution, the most recent version unless timestamp or as_of is given.
+
+        Args:
+            problem_id: Problem identifier
+            timestamp: Timestamp of the version to return
+            as_of: Return the most recent version saved at or before this
+                ISO 8601 UTC timestamp
+            fields: Parts to return, from SOLUTION_FIELDS (default all). The
+                summary attributes are always included.
+            berth: Only return the schedule and vessels of this berth
+            vessel: Only return this vessel's schedule entry and vessel
+
+        Returns:
+            Solution dictionary or None if not found
+
+        Raises:
+            ValueError: If fields contains an unknown name
+        """
+
+    @abstractmethod
+    def find_solution_by_hash(self, problem_hash: str) -> Optional[Dict]:
+        """
+        Retrieve the most recent solution saved for a problem hash.
+
+        Returns:
+            Solution dictionary or None if no identical problem was saved
+        """
+
+    def list_solutions(self, limit: int = 10, **filters) -> List[Dict]:
+        """
+        List recent solutions, newest first.
+
+        Args:
+            limit: Maximum number of solutions to return
+            **filters: Range filters accepted by list_solutions_page
+
+        Returns:
+            List of solution summaries
+        """
+        return self.list_solutions_page(limit, **filters)['solutions']
+
+    @abstractmethod
+    def list_solutions_page(self, limit: int = 10, next_token: Optional[str] = None,
+                            min_vessels: Optional[int] = None, max_vessels: Optional[int] = None,
+                            min_makespan: Optional[int] = None, max_makespan: Optional[int] = None) -> Dict:
+        """
+        List one page of solutions, newest first.
+
+        Args:
+            limit: Maximum number of solutions to return
+            next_token: Cursor returned with the previous page
+            min_vessels, max_vessels: Inclusive range on num_vessels
+            min_makespan, max_makespan: Inclusive range on makespan
+
+        Returns:
+            Dictionary with 'solutions' (list of summaries) and 'next_token'
+            (None on the last page). A filtered page may hold fewer than
+            limit solutions and still have a next_token.
+
+        Raises:
+            ValueError: If limit is not positive or next_token is malformed
+        """
+
+    @abstractmethod
+    def list_versions(self, problem_id: str, limit: int = 10, next_token: Optional[str] = None) -> Dict:
+        """
+        List one page of a solution's saved versions, newest first, without their schedules.
+
+        Args:
+            problem_id: Problem identifier
+            limit: Maximum number of versions to return
+            next_token: Cursor returned with the previous page
+
+        Returns:
+            Dictionary with 'versions' (VERSION_FIELDS of each version) and
+            'next_token' (None on the last page)
+
+        Raises:
+            ValueError: If limit is not positive or next_token is malformed
+        """
+
+    @abstractmethod
+    def delete_solution(self, problem_id: str) -> bool:
+        """
+        Delete every version of a solution.
+
+        Returns:
+            True if successful
+        """
+
+
+def create_storage() -> SolutionStorage:
+    """Build the storage selected by env STORAGE_BACKEND ('dynamodb', the default, or 'sqlite')."""
+    backend = os.getenv('STORAGE_BACKEND', 'dynamodb')
+    if backend == 'dynamodb':
+        from database import DynamoDBManager
+        return DynamoDBManager()
+    if backend == 'sqlite':
+        from sqlite_storage import SQLiteManager
+        return SQLiteManager()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
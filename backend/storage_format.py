@@ -0,0 +1,294 @@
+"""
+Compact binary encoding of stored solutions.
+
+The schedule and vessel list are stored as one zlib-compressed blob of
+columns instead of two JSON strings: vessel ids once, then little-endian
+integer columns for arrival time, processing time, berth and start time
+(end time is start + processing), plus the permutation that restores the
+order of the submitted vessel list. Arrival and processing times are not
+duplicated, and sorted integer columns compress well.
+
+Layout before compression:
+
+    magic (4 bytes) | vessel count n (uint32) | id bytes length (uint32)
+    | byte width of each column (5 bytes) | ids, NUL separated | 5 columns
+
+Each column uses the narrowest of int8/16/32/64 that holds its values.
+
+Large solutions are instead split into segments (see encode_segments): one
+per berth, plus hash buckets of vessels for single-vessel lookups (more
+buckets when long ids would make one too large). A segment holds any subset
+of the schedule rows with their positions in the schedule and in the vessel
+list, so segments can be read on their own or joined back into the full
+solution.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import math
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'BSC1'
+_HEADER = struct.Struct('<4sII5s')
+# Column order in the blob
+COLUMNS = ('arrival_time', 'processing_time', 'berth', 'start_time', 'vessel_order')
+# Narrowest little-endian integer type that holds a column, by byte width
+_WIDTHS = {1: '<i1', 2: '<i2', 4: '<i4', 8: '<i8'}
+
+SEGMENT_MAGIC = b'BSS1'
+_SEGMENT_HEADER = struct.Struct('<4sII6s')
+# Column order in a segment; the last two are positions in the vessel list
+# and in the schedule
+SEGMENT_COLUMNS = ('arrival_time', 'processing_time', 'berth', 'start_time', 'vessel_index', 'schedule_index')
+# Vessels per lookup bucket; a bucket compresses to a few tens of KB
+VESSELS_PER_BUCKET = 2048
+
+
+def _vessel_fields(vessel) -> Tuple[str, int, int]:
+    if isinstance(vessel, dict):
+        return vessel['vessel_id'], vessel['arrival_time'], vessel['processing_time']
+    return vessel.vessel_id, vessel.arrival_time, vessel.processing_time
+
+
+def _narrow(column: np.ndarray) -> np.ndarray:
+    """Column cast to the narrowest integer type holding its values."""
+    if not len(column):
+        return column.astype('<i1')
+    low, high = int(column.min()), int(column.max())
+    for width, dtype in _WIDTHS.items():
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return column.astype(dtype)
+    return column
+
+
+def _solution_columns(schedule: Dict[str, Dict], vessels: List) -> Optional[Tuple[List[str], List[List[int]]]]:
+    """
+    Vessel ids in schedule order and the arrival, processing, berth, start
+    and vessel-list position columns, or None if the schedule does not match
+    the vessel list.
+    """
+    try:
+        fields = [_vessel_fields(vessel) for vessel in vessels]
+        position = {vessel_id: index for index, (vessel_id, _, _) in enumerate(fields)}
+        if len(position) != len(fields) or len(position) != len(schedule):
+            return None
+
+        arrival, processing, berth, start, vessel_index = [], [], [], [], []
+        for vessel_id, entry in schedule.items():
+            index = position[vessel_id]
+            _, vessel_arrival, vessel_processing = fields[index]
+            if (len(entry) != 5
+                    or entry['arrival_time'] != vessel_arrival
+                    or entry['processing_time'] != vessel_processing
+                    or entry['end_time'] != entry['start_time'] + vessel_processing):
+                return None
+            arrival.append(vessel_arrival)
+            processing.append(vessel_processing)
+            berth.append(entry['berth'])
+            start.append(entry['start_time'])
+            vessel_index.append(index)
+        ids = list(schedule)
+        if any('\x00' in vessel_id for vessel_id in ids):
+            # An id containing NUL cannot be split back apart
+            return None
+    except (KeyError, TypeError, AttributeError):
+        return None
+    return ids, [arrival, processing, berth, start, vessel_index]
+
+
+def encode_solution(schedule: Dict[str, Dict], vessels: List) -> Optional[bytes]:
+    """
+    Encode a schedule and its vessel list.
+
+    Args:
+        schedule: vessel_id -> {berth, start_time, end_time, arrival_time, processing_time}
+        vessels: Vessel dicts or models, in submission order
+
+    Returns:
+        Compressed blob, or None if the solution cannot be represented
+        (e.g. schedule entries that do not match the vessel list), in which
+        case the caller keeps the JSON format
+    """
+    columns = _solution_columns(schedule, vessels)
+    if columns is None:
+        return None
+    ids, (arrival, processing, berth, start, vessel_index) = columns
+    n = len(ids)
+    # Schedule position of the vessel at each submission index
+    order = [0] * n
+    for i, index in enumerate(vessel_index):
+        order[index] = i
+    try:
+        columns = [_narrow(np.array(column, dtype=np.int64)) for column in (arrival, processing, berth, start, order)]
+    except (OverflowError, ValueError, TypeError):
+        return None
+    id_bytes = '\x00'.join(ids).encode('utf-8')
+
+    widths = bytes(column.itemsize for column in columns)
+    raw = b''.join([_HEADER.pack(MAGIC, n, len(id_bytes), widths), id_bytes] + [column.tobytes() for column in columns])
+    return zlib.compress(raw, 6)
+
+
+def decode_solution(blob: bytes) -> Tuple[Dict[str, Dict], List[Dict]]:
+    """
+    Decode a blob from encode_solution.
+
+    Returns:
+        (schedule, vessels) in the same shapes as the JSON format
+
+    Raises:
+        ValueError: If the blob is not in this format
+    """
+    raw = zlib.decompress(blob)
+    magic, n, id_length, widths = _HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("Unknown solution encoding")
+    offset = _HEADER.size
+    ids = raw[offset:offset + id_length].decode('utf-8').split('\x00') if n else []
+    offset += id_length
+    columns = []
+    for width in widths:
+        columns.append(np.frombuffer(raw, dtype=_WIDTHS[width], count=n, offset=offset).tolist())
+        offset += width * n
+    arrival, processing, berth, start, order = columns
+
+    schedule = {
+        vessel_id: {
+            'berth': berth[i],
+            'start_time': start[i],
+            'end_time': start[i] + processing[i],
+            'arrival_time': arrival[i],
+            'processing_time': processing[i]
+        }
+        for i, vessel_id in enumerate(ids)
+    }
+    vessels = [
+        {'vessel_id': ids[i], 'arrival_time': arrival[i], 'processing_time': processing[i]}
+        for i in order
+    ]
+    return schedule, vessels
+
+
+def vessel_bucket(vessel_id: str, buckets: int) -> int:
+    """Lookup bucket holding a vessel."""
+    return zlib.crc32(vessel_id.encode('utf-8')) % buckets
+
+
+def _encode_segment(ids: List[str], table: np.ndarray) -> bytes:
+    """Encode rows of a solution: ids and the SEGMENT_COLUMNS as a 6 x n array."""
+    columns = [_narrow(column) for column in table]
+    id_bytes = '\x00'.join(ids).encode('utf-8')
+    widths = bytes(column.itemsize for column in columns)
+    header = _SEGMENT_HEADER.pack(SEGMENT_MAGIC, len(ids), len(id_bytes), widths)
+    return zlib.compress(b''.join([header, id_bytes] + [column.tobytes() for column in columns]), 6)
+
+
+def _groups(keys: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+    """(key, row indices) for each distinct key, rows in their original order."""
+    order = np.argsort(keys, kind='stable')
+    bounds = np.flatnonzero(np.diff(keys[order])) + 1
+    return [(int(keys[rows[0]]), rows) for rows in np.split(order, bounds) if len(rows)]
+
+
+def _encode_buckets(ids: List[str], table: np.ndarray, count: int) -> Tuple[List[bytes], List[int]]:
+    """Encoded lookup buckets and the number of vessels in each."""
+    keys = np.array([vessel_bucket(vessel_id, count) for vessel_id in ids], dtype=np.int64)
+    buckets = [_encode_segment([], table[:, :0])] * count
+    for bucket, rows in _groups(keys):
+        buckets[bucket] = _encode_segment([ids[i] for i in rows], table[:, rows])
+    return buckets, np.bincount(keys, minlength=count).tolist()
+
+
+def encode_segments(schedule: Dict[str, Dict], vessels: List, vessels_per_bucket: int = VESSELS_PER_BUCKET,
+                    max_bucket_bytes: Optional[int] = None) -> Optional[Tuple[Dict[int, bytes], List[bytes]]]:
+    """
+    Split a solution into per-berth segments and vessel lookup buckets.
+
+    Args:
+        schedule: vessel_id -> {berth, start_time, end_time, arrival_time, processing_time}
+        vessels: Vessel dicts or models, in submission order
+        vessels_per_bucket: Target vessels per lookup bucket
+        max_bucket_bytes: Largest encoded bucket allowed; the bucket count is
+            doubled until every bucket fits (long ids make buckets grow), or
+            until an oversized bucket holds a single vessel
+
+    Returns:
+        (berth -> segment, buckets) where vessel v is in
+        buckets[vessel_bucket(v, len(buckets))], or None if the solution
+        cannot be represented (see encode_solution)
+    """
+    columns = _solution_columns(schedule, vessels)
+    if columns is None:
+        return None
+    ids, values = columns
+    n = len(ids)
+    try:
+        table = np.array(values + [range(n)], dtype=np.int64).reshape(len(SEGMENT_COLUMNS), n)
+    except (OverflowError, ValueError, TypeError):
+        return None
+
+    berths = {berth: _encode_segment([ids[i] for i in rows], table[:, rows])
+              for berth, rows in _groups(table[2])}
+    count = max(1, math.ceil(n / vessels_per_bucket))
+    buckets, sizes = _encode_buckets(ids, table, count)
+    while max_bucket_bytes is not None and any(
+            len(bucket) > max_bucket_bytes and size > 1 for bucket, size in zip(buckets, sizes)):
+        count *= 2
+        buckets, sizes = _encode_buckets(ids, table, count)
+    return berths, buckets
+
+
+def decode_segment(blob: bytes) -> Tuple[List[str], np.ndarray]:
+    """
+    Decode a segment from encode_segments.
+
+    Returns:
+        (vessel ids, 6 x n int64 array of the SEGMENT_COLUMNS)
+
+    Raises:
+        ValueError: If the blob is not a segment
+    """
+    raw = zlib.decompress(blob)
+    magic, n, id_length, widths = _SEGMENT_HEADER.unpack_from(raw)
+    if magic != SEGMENT_MAGIC:
+        raise ValueError("Unknown segment encoding")
+    offset = _SEGMENT_HEADER.size
+    ids = raw[offset:offset + id_length].decode('utf-8').split('\x00') if n else []
+    offset += id_length
+    table = np.empty((len(SEGMENT_COLUMNS), n), dtype=np.int64)
+    for row, width in enumerate(widths):
+        table[row] = np.frombuffer(raw, dtype=_WIDTHS[width], count=n, offset=offset)
+        offset += width * n
+    return ids, table
+
+
+def join_segments(segments: List[Tuple[List[str], np.ndarray]]) -> Tuple[Dict[str, Dict], List[Dict]]:
+    """
+    Combine decoded segments into a schedule and vessel list.
+
+    Rows keep their original relative order, so joining every berth segment
+    gives back the full solution and a subset gives the matching part of it.
+    """
+    ids = [vessel_id for segment_ids, _ in segments for vessel_id in segment_ids]
+    if not ids:
+        return {}, []
+    table = np.concatenate([segment_table for _, segment_table in segments], axis=1)
+    arrival, processing, berth, start, vessel_index, schedule_index = table.tolist()
+
+    schedule = {}
+    for i in np.argsort(table[5], kind='stable').tolist():
+        schedule[ids[i]] = {
+            'berth': berth[i],
+            'start_time': start[i],
+            'end_time': start[i] + processing[i],
+            'arrival_time': arrival[i],
+            'processing_time': processing[i]
+        }
+    vessels = [
+        {'vessel_id': ids[i], 'arrival_time': arrival[i], 'processing_time': processing[i]}
+        for i in np.argsort(table[4], kind='stable').tolist()
+    ]
+    return schedule, vessels
@@ -0,0 +1,89 @@
+"""
+Server-sent events for solves that report progress.
+
+POST /solve/stream answers with a text/event-stream instead of one JSON
+body. While the solver runs, 'progress' events carry its incumbent
+makespan, lower bound, elapsed seconds and, for 'exact', 'local_search'
+and 'portfolio', the best schedule so far. The stream ends with a
+'result' event holding the solution /solve would have returned, or an
+'error' event.
+
+A client that disconnects cancels the solve through its SolveChannel
+(see executor), so an abandoned browser tab stops using a solver worker
+at the solver's next progress report. Nothing is saved for it.
+"""
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import os
+import time
+
+from json_response import encode_json
+
+# Seconds between progress events; each may carry a whole schedule
+INTERVAL = float(os.getenv('STREAM_INTERVAL', 0.5))
+# Seconds of silence after which a comment line keeps proxies from closing the stream
+KEEPALIVE = float(os.getenv('STREAM_KEEPALIVE', 15))
+# How often the stream checks the solve for updates and the client for a disconnect
+POLL_INTERVAL = 0.25
+
+MEDIA_TYPE = 'text/event-stream'
+HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+
+def server_sent_event(event: str, data: Any) -> bytes:
+    """One event; data is encoded as JSON unless it already is (bytes)."""
+    if not isinstance(data, bytes):
+        data = encode_json(data)
+    # Compact JSON never contains a newline, so one data line suffices
+    return b'event: ' + event.encode() + b'\ndata: ' + data + b'\n\n'
+
+
+def _discard(task: asyncio.Future):
+    # Nobody waits for an abandoned solve; retrieve its outcome so it is not logged
+    if not task.cancelled():
+        task.exception()
+
+
+async def solve_events(start: Callable[[], Awaitable], channel, finish: Callable[[Any], Awaitable[bytes]],
+                       disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> AsyncIterator[bytes]:
+    """
+    Run a solve and stream its progress, then its result or an error.
+
+    Args:
+        start: Starts the solve, reporting to channel, and returns an
+            awaitable of the solver result
+        channel: executor.SolveChannel the solver reports to
+        finish: Turns the solver result into the encoded solution sent
+            with the 'result' event
+        disconnected: Optional check whether the client has gone away,
+            such as Request.is_disconnected
+    """
+    task = asyncio.ensure_future(start())
+    last_sent = time.monotonic()
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=POLL_INTERVAL)
+            if task.done():
+                break
+            if disconnected is not None and await disconnected():
+                return
+            updates = channel.drain()
+            if updates:
+                # Only the latest counts; older ones are superseded
+                yield server_sent_event('progress', updates[-1])
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= KEEPALIVE:
+                yield b': keepalive\n\n'
+                last_sent = time.monotonic()
+        try:
+            body = await finish(task.result())
+        except Exception as e:
+            yield server_sent_event('error', {'detail': str(e)})
+        else:
+            yield server_sent_event('result', body)
+    finally:
+        if not task.done():
+            # The client went away (or the server is stopping the stream)
+            channel.cancel()
+            task.add_done_callback(_discard)
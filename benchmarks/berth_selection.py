@@ -0,0 +1,92 @@
+"""
+Benchmark berth selection in the FCFS heuristic.
+
+Compares the original linear scan over a dict of berths (O(V*B)) with the
+heap-based BerthAvailability engine (O(V log B)) on the same instances and
+checks that both produce identical schedules.
+
+Usage:
+    python benchmarks/berth_selection.py
+    python benchmarks/berth_selection.py --vessels 50000 --berths 2 16 128 1024
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from solver import solve_berth_scheduling, BerthSchedulingProblem, VesselData
+
+
+def linear_scan_schedule(problem: BerthSchedulingProblem) -> dict:
+    """FCFS schedule using the original min() scan over berth availability."""
+    schedule = {}
+    berth_availability = {b: 0 for b in range(problem.num_berths)}
+    for vessel in sorted(problem.vessels, key=lambda v: v.arrival_time):
+        berth = min(berth_availability, key=berth_availability.get)
+        start = max(vessel.arrival_time, berth_availability[berth])
+        schedule[vessel.vessel_id] = (berth, start, start + vessel.processing_time)
+        berth_availability[berth] = start + vessel.processing_time
+    return schedule
+
+
+def make_problem(num_vessels: int, num_berths: int, seed: int) -> BerthSchedulingProblem:
+    """Random instance that keeps every berth busy."""
+    rng = random.Random(seed)
+    mean_processing = 12
+    # Arrival rate close to berth capacity so queues form but stay bounded
+    span = max(1, num_vessels * mean_processing // num_berths)
+    vessels = [
+        VesselData(
+            vessel_id=f"V{i:07d}",
+            arrival_time=rng.randint(0, span),
+            processing_time=rng.randint(1, 2 * mean_processing - 1),
+        )
+        for i in range(num_vessels)
+    ]
+    return BerthSchedulingProblem(vessels=vessels, planning_horizon=10**9, num_berths=num_berths)
+
+
+def best_of(fn, repeat: int) -> float:
+    """Best wall-clock time of several runs."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vessels", type=int, default=20000)
+    parser.add_argument("--berths", type=int, nargs="+", default=[2, 8, 32, 128, 512, 2048])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'berths':>8} {'linear (s)':>12} {'heap (s)':>10} {'speedup':>8} {'heap ns/vessel':>15}")
+    for num_berths in args.berths:
+        problem = make_problem(args.vessels, num_berths, args.seed)
+
+        heap_result = solve_berth_scheduling(problem)
+        expected = linear_scan_schedule(problem)
+        actual = {
+            vessel_id: (a["berth"], a["start_time"], a["end_time"])
+            for vessel_id, a in heap_result["schedule"].items()
+        }
+        if actual != expected:
+            sys.exit(f"Schedules differ for {num_berths} berths")
+
+        linear = best_of(lambda: linear_scan_schedule(problem), args.repeat)
+        heap = best_of(lambda: solve_berth_scheduling(problem), args.repeat)
+        print(f"{num_berths:>8} {linear:>12.4f} {heap:>10.4f} {linear / heap:>7.1f}x "
+              f"{heap / args.vessels * 1e9:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Seeded synthetic berth scheduling instances.
+
+Arrivals follow one of three profiles seen at real terminals:
+
+- poisson: independent arrivals at a constant rate (tramp traffic)
+- tidal: the arrival rate rises and falls with a 12.42-hour tide, so
+  vessels bunch up around high water
+- liner: weekly services calling at a fixed hour with a few hours of
+  delay, mixed with 30% tramp traffic
+
+Vessel sizes come from a feeder / panamax / post-panamax mix, each class
+with a log-normal handling time. The arrival rate is set so the berths are
+busy a given fraction of the time (utilization), which keeps queues bounded
+however large the instance is.
+
+Instances are column arrays in shuffled order (the solvers sort them), so
+the same (profile, vessels, berths, seed) always gives the same problem.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+PROFILES = ('poisson', 'tidal', 'liner')
+
+# (share of vessels, median processing hours, log-normal sigma) per vessel class
+VESSEL_CLASSES = ((0.5, 8.0, 0.35), (0.35, 16.0, 0.3), (0.15, 28.0, 0.25))
+TIDE_PERIOD = 12.42
+TIDE_AMPLITUDE = 0.6
+WEEK = 168
+LINER_SHARE = 0.7
+
+
+def processing_times(rng: np.random.Generator, num_vessels: int) -> np.ndarray:
+    """Handling times in whole hours (at least 1) from the vessel class mix."""
+    shares = np.array([share for share, _, _ in VESSEL_CLASSES])
+    classes = rng.choice(len(VESSEL_CLASSES), size=num_vessels, p=shares / shares.sum())
+    medians = np.array([median for _, median, _ in VESSEL_CLASSES])[classes]
+    sigmas = np.array([sigma for _, _, sigma in VESSEL_CLASSES])[classes]
+    hours = medians * np.exp(sigmas * rng.standard_normal(num_vessels))
+    return np.maximum(1, np.rint(hours)).astype(np.int64)
+
+
+def _poisson_arrivals(rng: np.random.Generator, num_vessels: int, rate: float) -> np.ndarray:
+    return np.cumsum(rng.exponential(1.0 / rate, size=num_vessels))
+
+
+def _tidal_arrivals(rng: np.random.Generator, num_vessels: int, rate: float) -> np.ndarray:
+    # Thinning: candidates at the peak rate, kept with the tide's relative rate
+    peak = rate * (1 + TIDE_AMPLITUDE)
+    kept = np.empty(0)
+    offset = 0.0
+    while len(kept) < num_vessels:
+        batch = max(1024, int((num_vessels - len(kept)) * (1 + TIDE_AMPLITUDE) * 1.1))
+        candidates = offset + np.cumsum(rng.exponential(1.0 / peak, size=batch))
+        offset = candidates[-1]
+        relative = (1 + TIDE_AMPLITUDE * np.cos(2 * np.pi * candidates / TIDE_PERIOD)) / (1 + TIDE_AMPLITUDE)
+        kept = np.concatenate([kept, candidates[rng.random(batch) < relative]])
+    return kept[:num_vessels]
+
+
+def _liner_arrivals(rng: np.random.Generator, num_vessels: int, rate: float) -> np.ndarray:
+    num_liner = int(num_vessels * LINER_SHARE)
+    span = num_vessels / rate
+    weeks = max(1, int(np.ceil(span / WEEK)))
+    services = max(1, int(np.ceil(num_liner / weeks)))
+    # Each service calls at the same hour every week; delays are skewed late
+    phases = rng.uniform(0, WEEK, size=services)
+    calls = (np.arange(weeks)[:, None] * WEEK + phases[None, :]).ravel()
+    calls = rng.choice(calls, size=num_liner, replace=len(calls) < num_liner)
+    liner = calls + rng.gamma(2.0, 3.0, size=num_liner) - 2.0
+    tramp = rng.uniform(0, span, size=num_vessels - num_liner)
+    return np.concatenate([liner, tramp])
+
+
+def generate_instance(num_vessels: int, num_berths: int, profile: str = 'poisson', seed: int = 0,
+                      utilization: float = 0.85) -> Dict:
+    """
+    Generate a problem as column arrays.
+
+    Args:
+        num_vessels: Number of vessels
+        num_berths: Number of berths
+        profile: One of PROFILES
+        seed: Random seed
+        utilization: Average fraction of berth time that is busy
+
+    Returns:
+        Dictionary with vessel_ids, arrival_times, processing_times,
+        num_berths and a planning_horizon every vessel fits in
+
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}; expected one of {list(PROFILES)}")
+    rng = np.random.default_rng(seed)
+    processing = processing_times(rng, num_vessels)
+    rate = utilization * num_berths / float(processing.mean()) if num_vessels else 1.0
+    arrivals = {
+        'poisson': _poisson_arrivals,
+        'tidal': _tidal_arrivals,
+        'liner': _liner_arrivals,
+    }[profile](rng, num_vessels, rate)
+    arrivals = np.maximum(0, np.floor(arrivals)).astype(np.int64)
+
+    order = rng.permutation(num_vessels)
+    arrivals = arrivals[order]
+    processing = processing[order]
+    width = len(str(max(num_vessels - 1, 0)))
+    vessel_ids: List[str] = [f"V{i:0{width}d}" for i in range(num_vessels)]
+    return {
+        'vessel_ids': vessel_ids,
+        'arrival_times': arrivals,
+        'processing_times': processing,
+        'num_berths': num_berths,
+        # FCFS never delays a vessel by more than the total work
+        'planning_horizon': int(arrivals.max() + processing.sum()) + 1 if num_vessels else 72,
+    }
+
+
+def request_body(instance: Dict) -> Dict:
+    """The instance as a /solve request body."""
+    return {
+        'vessels': [
+            {'vessel_id': vessel_id, 'arrival_time': arrival, 'processing_time': processing}
+            for vessel_id, arrival, processing in zip(instance['vessel_ids'], instance['arrival_times'].tolist(),
+                                                      instance['processing_times'].tolist())
+        ],
+        'planning_horizon': instance['planning_horizon'],
+        'num_berths': instance['num_berths'],
+    }
@@ -0,0 +1,299 @@
+"""
+Benchmark suite: solver, JSON and /solve timings over a V x B sweep.
+
+Each case generates a seeded instance (see instances.py) and times:
+
+- solve: solve_berth_scheduling on VesselData objects
+- solve_columnar: solve_berth_scheduling_columnar, the engine behind /solve
+- json: encoding the /solve response body (json_response.encode_json)
+- endpoint: POST /solve through FastAPI's TestClient, with the database
+  mocked out and the solution cache disabled
+
+Every stage gets one untimed warm-up call first, so imports, caches and
+the endpoint's first-request setup are not counted.
+
+Results are written as JSON. Comparing against an earlier results file
+exits with status 1 if any timing got slower than the threshold allows.
+
+Usage:
+    python benchmarks/suite.py run --output results.json
+    python benchmarks/suite.py run --preset full --output results.json --baseline baseline.json
+    python benchmarks/suite.py run --vessels 1000 100000 --berths 4 --stages solve json
+    python benchmarks/suite.py compare baseline.json results.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+import numpy as np
+
+# Add backend directory to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from solver import (
+    solve_berth_scheduling,
+    solve_berth_scheduling_columnar,
+    schedule_from_columns,
+    BerthSchedulingProblem,
+    VesselData,
+)
+from json_response import encode_json
+from instances import PROFILES, generate_instance, request_body
+
+STAGES = ('solve', 'solve_columnar', 'json', 'endpoint')
+PRESETS = {
+    'quick': {'vessels': [1_000, 10_000, 100_000], 'berths': [2, 16], 'profiles': ['poisson']},
+    'full': {'vessels': [1_000, 10_000, 100_000, 1_000_000], 'berths': [2, 16, 128], 'profiles': list(PROFILES)},
+}
+# Cases larger than this run once instead of --repeat times
+REPEAT_LIMIT = 100_000
+RESULTS_VERSION = 1
+
+
+def time_runs(fn: Callable[[], object], repeat: int, warmup: int = 1) -> List[float]:
+    """Wall-clock times of several runs, after warmup untimed ones."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def load_app():
+    """
+    Import the API with a mocked database and no solution cache.
+
+    Returns:
+        The FastAPI app; saves succeed and hash lookups miss
+    """
+    db = mock.MagicMock(name="DynamoDBManager")
+    db.save_solution.return_value = True
+    db.save_solutions.return_value = True
+    db.find_solution_by_hash.return_value = None
+    with mock.patch("database.DynamoDBManager", return_value=db):
+        import main
+    from cache import SolutionCache
+    main.solution_cache = SolutionCache(max_entries=0)
+    return main.app
+
+
+def response_body(instance: Dict, result: Dict) -> Dict:
+    """The body /solve returns for an instance, without going through the API."""
+    body = request_body(instance)
+    return {
+        'problem_id': '00000000-0000-0000-0000-000000000000',
+        'vessels': body['vessels'],
+        'schedule': schedule_from_columns(instance['vessel_ids'], instance['arrival_times'],
+                                          instance['processing_times'], result),
+        'makespan': int(result['makespan']),
+        'solving_time': float(result['solving_time']),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'lower_bound': None,
+        'optimality_gap': None
+    }
+
+
+def run_case(profile: str, num_vessels: int, num_berths: int, stages: List[str], seed: int, repeat: int,
+             client=None, endpoint_max: int = REPEAT_LIMIT) -> List[Dict]:
+    """Time the selected stages on one instance."""
+    instance = generate_instance(num_vessels, num_berths, profile, seed)
+    ids = instance['vessel_ids']
+    arrivals = instance['arrival_times']
+    processing = instance['processing_times']
+    horizon = instance['planning_horizon']
+    runs = repeat if num_vessels <= REPEAT_LIMIT else 1
+    columnar = solve_berth_scheduling_columnar(arrivals, processing, num_berths, horizon, ids)
+
+    timed = {}
+    if 'solve' in stages:
+        problem = BerthSchedulingProblem(
+            vessels=[VesselData(vessel_id, a, p) for vessel_id, a, p in zip(ids, arrivals.tolist(),
+                                                                            processing.tolist())],
+            planning_horizon=horizon,
+            num_berths=num_berths
+        )
+        timed['solve'] = lambda: solve_berth_scheduling(problem)
+    if 'solve_columnar' in stages:
+        timed['solve_columnar'] = lambda: solve_berth_scheduling_columnar(arrivals, processing, num_berths,
+                                                                          horizon, ids)
+    if 'json' in stages:
+        body = response_body(instance, columnar)
+        timed['json'] = lambda: encode_json(body)
+    if 'endpoint' in stages and client is not None and num_vessels <= endpoint_max:
+        payload = json.dumps(request_body(instance)).encode()
+
+        def post():
+            response = client.post("/solve", content=payload, headers={"Content-Type": "application/json"})
+            if response.status_code != 200:
+                raise RuntimeError(f"/solve returned {response.status_code}: {response.text[:200]}")
+        timed['endpoint'] = post
+
+    results = []
+    for stage, fn in timed.items():
+        timings = time_runs(fn, runs)
+        results.append({
+            'name': f"{stage}/{profile}/V{num_vessels}/B{num_berths}",
+            'stage': stage,
+            'profile': profile,
+            'vessels': num_vessels,
+            'berths': num_berths,
+            'seconds': min(timings),
+            'runs': timings,
+            'makespan': int(columnar['makespan'])
+        })
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, min_delta: float) -> List[Dict]:
+    """
+    Compare two results files.
+
+    A case regresses when it takes more than (1 + threshold) times the
+    baseline and at least min_delta seconds longer, so timer noise on tiny
+    cases is not reported.
+
+    Returns:
+        One row per case in both files, with baseline, current, ratio and
+        whether it regressed
+    """
+    before = {result['name']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            continue
+        ratio = result['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+        rows.append({
+            'name': result['name'],
+            'baseline': old['seconds'],
+            'current': result['seconds'],
+            'ratio': ratio,
+            'regressed': ratio > 1 + threshold and result['seconds'] - old['seconds'] >= min_delta
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict], threshold: float) -> bool:
+    """Print a comparison table; True if nothing regressed."""
+    print(f"{'case':<40} {'baseline (s)':>13} {'current (s)':>12} {'ratio':>7}")
+    for row in rows:
+        flag = "  SLOWER" if row['regressed'] else ""
+        print(f"{row['name']:<40} {row['baseline']:>13.4f} {row['current']:>12.4f} {row['ratio']:>6.2f}x{flag}")
+    regressions = [row for row in rows if row['regressed']]
+    if regressions:
+        print(f"{len(regressions)} of {len(rows)} cases are more than {threshold:.0%} slower")
+    elif rows:
+        print(f"No case is more than {threshold:.0%} slower")
+    else:
+        print("No cases in common with the baseline")
+    return not regressions
+
+
+def run(args) -> int:
+    preset = PRESETS[args.preset]
+    vessels = args.vessels or preset['vessels']
+    berths = args.berths or preset['berths']
+    profiles = args.profiles or preset['profiles']
+
+    client = None
+    if 'endpoint' in args.stages:
+        from fastapi.testclient import TestClient
+        client = TestClient(load_app())
+        client.__enter__()
+
+    results = []
+    try:
+        print(f"{'case':<40} {'seconds':>10} {'ns/vessel':>10}")
+        for profile in profiles:
+            for num_vessels in vessels:
+                for num_berths in berths:
+                    for result in run_case(profile, num_vessels, num_berths, args.stages, args.seed,
+                                           args.repeat, client, args.endpoint_max_vessels):
+                        results.append(result)
+                        print(f"{result['name']:<40} {result['seconds']:>10.4f} "
+                              f"{result['seconds'] / max(num_vessels, 1) * 1e9:>10.0f}", flush=True)
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+
+    output = {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(output, indent=2))
+        print(f"Wrote {len(results)} results to {args.output}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        return 0 if print_comparison(compare(baseline, output, args.threshold, args.min_delta),
+                                     args.threshold) else 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    run_parser.add_argument("--vessels", type=int, nargs="+", help="vessel counts (overrides the preset)")
+    run_parser.add_argument("--berths", type=int, nargs="+", help="berth counts (overrides the preset)")
+    run_parser.add_argument("--profiles", choices=PROFILES, nargs="+", help="arrival profiles (overrides the preset)")
+    run_parser.add_argument("--stages", choices=STAGES, nargs="+", default=list(STAGES))
+    run_parser.add_argument("--endpoint-max-vessels", type=int, default=REPEAT_LIMIT,
+                            help="skip the endpoint stage above this many vessels")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", help="results file to write")
+    run_parser.add_argument("--baseline", help="results file to compare against")
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, e.g. 0.2 for 20%%")
+        sub.add_argument("--min-delta", type=float, default=0.005,
+                         help="ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        baseline = json.loads(Path(args.baseline).read_text())
+        current = json.loads(Path(args.current).read_text())
+        ok = print_comparison(compare(baseline, current, args.threshold, args.min_delta), args.threshold)
+        sys.exit(0 if ok else 1)
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,10 @@
 awslocal dynamodb create-table \
     --table-name berth-scheduling-solutions \
     --attribute-definitions AttributeName=problem_id,AttributeType=S AttributeName=timestamp,AttributeType=S \
+        AttributeName=problem_hash,AttributeType=S AttributeName=record_type,AttributeType=S \
     --key-schema AttributeName=problem_id,KeyType=HASH AttributeName=timestamp,KeyType=RANGE \
+    --global-secondary-indexes \
+        '[{"IndexName":"problem_hash-index","KeySchema":[{"AttributeName":"problem_hash","KeyType":"HASH"},{"AttributeName":"timestamp","KeyType":"RANGE"}],"Projection":{"ProjectionType":"KEYS_ONLY"}},
+          {"IndexName":"recent-index","KeySchema":[{"AttributeName":"record_type","KeyType":"HASH"},{"AttributeName":"timestamp","KeyType":"RANGE"}],"Projection":{"ProjectionType":"INCLUDE","NonKeyAttributes":["makespan","solving_time","num_vessels"]}}]' \
     --billing-mode PAY_PER_REQUEST \
     --region us-east-1
@@ -5,6 +5,7 @@ Pytest configuration and fixtures for integration tests.
 import pytest
 import sys
 import os
+import tempfile
 from pathlib import Path
 
 # Set AWS credentials BEFORE any imports
@@ -13,6 +14,9 @@ os.environ["AWS_REGION"] = "us-east-1"
 os.environ["AWS_ACCESS_KEY_ID"] = "test"
 os.environ["AWS_SECRET_ACCESS_KEY"] = "test"
 os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+# Solutions go to a throwaway SQLite file unless STORAGE_BACKEND=dynamodb (needs LocalStack)
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", str(Path(tempfile.mkdtemp()) / "solutions.db"))
 
 # Add backend directory to Python path
 backend_path = Path(__file__).parent.parent.parent / "backend"
@@ -40,7 +44,15 @@ def test_client():
 
 @pytest.fixture(scope="module")
 def db_manager():
-    """DynamoDB manager instance for database tests."""
+    """Storage backend used by the app, for database tests."""
+    return db
+
+
+@pytest.fixture(scope="module")
+def dynamodb_manager():
+    """DynamoDB manager, for tests of the DynamoDB item layout; skipped with other backends."""
+    if not isinstance(db, DynamoDBManager):
+        pytest.skip("Needs STORAGE_BACKEND=dynamodb")
     return db
 
 
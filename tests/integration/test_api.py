@@ -3,8 +3,29 @@ Integration tests for API endpoints.
 Tests the full API layer including request validation, response format, and error handling.
 """
 
+import asyncio
+import json
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
 import pytest
-from fastapi import status
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+
+from cache import SolutionCache, problem_hash
+import compression
+from compression import negotiate
+from dispatch import run_solver
+import ingest
+import main
+from executor import SolveChannel, SolverExecutor, SolverBusyError
+from jobs import InMemoryJobQueue, JobCancelledError, JobQueueFullError
+from json_response import encode_json
+from persistence import WriteBehindQueue
+import profiling
+import streaming
 
 
 @pytest.mark.api
@@ -20,6 +41,87 @@ class TestHealthEndpoint:
         assert data["status"] == "ok"
 
 
+@pytest.mark.api
+class TestMetricsEndpoint:
+    """Tests for request stage timings and Prometheus metrics."""
+
+    def test_solve_reports_stage_timings(self, test_client, sample_problem):
+        """/solve should send a Server-Timing header and its stages should show up in /metrics."""
+        response = test_client.post("/solve", json={**sample_problem, "planning_horizon": 97})
+        metrics = test_client.get("/metrics")
+        
+        assert response.status_code == status.HTTP_200_OK
+        stages = {entry.split(";")[0].strip() for entry in response.headers["Server-Timing"].split(",")}
+        assert {"parse", "convert", "serialize", "total"} <= stages
+        if response.headers["X-Cache"] == "MISS":
+            assert {"queue", "solve", "db_put"} <= stages
+        assert metrics.status_code == status.HTTP_200_OK
+        assert metrics.headers["content-type"].startswith("text/plain")
+        assert 'berth_stage_seconds_count{route="/solve",stage="parse"}' in metrics.text
+        assert 'berth_request_seconds_count{method="POST",route="/solve",status="200"}' in metrics.text
+
+    def test_errors_are_counted(self, test_client):
+        """Error responses should be counted by route and status."""
+        test_client.get("/solution/no-such-problem")
+        metrics = test_client.get("/metrics")
+        
+        assert 'berth_request_errors_total{route="/solution/{problem_id}",status="404"}' in metrics.text
+
+
+def _busy(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.mark.api
+class TestProfiling:
+    """Tests for opt-in request profiling."""
+
+    def _app(self):
+        app = FastAPI()
+
+        @app.post("/solve")
+        async def solve():
+            profiling.set_problem_id("P-profiled")
+            _busy(0.05)
+            return {"problem_id": "P-profiled"}
+
+        app.add_middleware(profiling.ProfilingMiddleware)
+        return app
+
+    def test_flagged_request_is_profiled(self, monkeypatch):
+        """A request with the flag should store collapsed stacks under its problem_id."""
+        monkeypatch.setattr(profiling, "ENABLED", True)
+        monkeypatch.setattr(profiling, "TOKEN", None)
+        client = TestClient(self._app())
+
+        plain = client.post("/solve")
+        profiled = client.post("/solve?profile=1")
+
+        assert "X-Profile-Id" not in plain.headers
+        assert profiled.headers["X-Profile-Id"] == "P-profiled"
+        lines = profiling.store.get("P-profiled").splitlines()
+        assert lines and all(line.startswith("api;") and line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("_busy" in line for line in lines)
+
+    def test_token_guards_profiling(self, monkeypatch):
+        """With a token configured, only requests carrying it are profiled."""
+        monkeypatch.setattr(profiling, "ENABLED", True)
+        monkeypatch.setattr(profiling, "TOKEN", "s3cret")
+        client = TestClient(self._app())
+
+        assert "X-Profile-Id" not in client.post("/solve", headers={"X-Profile": "1"}).headers
+        assert client.post("/solve", headers={"X-Profile": "s3cret"}).headers["X-Profile-Id"] == "P-profiled"
+
+    def test_solver_worker_samples_itself(self):
+        """profiled_call should return the solver's stacks along with its result."""
+        elapsed, result, stacks = profiling.profiled_call(_busy, (0.05,), {}, 0.001)
+
+        assert result is None and elapsed >= 0.05
+        assert any(stack.split(";")[-1].startswith("_busy (test_api.py:") for stack in stacks)
+
+
 @pytest.mark.api
 class TestSolveEndpoint:
     """Tests for the solve endpoint."""
@@ -101,6 +203,173 @@ class TestSolveEndpoint:
         
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
 
+    def test_solve_rejects_duplicate_vessel_ids(self, test_client):
+        """Vessel ids must be unique, as in NDJSON uploads."""
+        problem = {
+            "vessels": [
+                {"vessel_id": "V001", "arrival_time": 0, "processing_time": 3},
+                {"vessel_id": "V001", "arrival_time": 1, "processing_time": 4}
+            ]
+        }
+        response = test_client.post("/solve", json=problem)
+        
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+        assert "Duplicate vessel_id 'V001'" in response.text
+
+    def test_solve_with_exact_solver(self, test_client, sample_problem):
+        """Exact solver should report a lower bound and optimality gap."""
+        problem = {**sample_problem, "solver": "exact", "time_limit": 5}
+        response = test_client.post("/solve", json=problem)
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data["schedule"]) == len(sample_problem["vessels"])
+        assert data["lower_bound"] <= data["makespan"]
+        assert data["optimality_gap"] == 0.0
+
+    def test_solve_with_local_search(self, test_client, sample_problem):
+        """Local search should return a full schedule with a lower bound."""
+        problem = {**sample_problem, "solver": "local_search", "time_limit": 0.5}
+        response = test_client.post("/solve", json=problem)
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data["schedule"]) == len(sample_problem["vessels"])
+        assert data["lower_bound"] <= data["makespan"]
+
+    def test_solve_with_portfolio(self, test_client, sample_problem):
+        """The portfolio should report the winning strategy and each strategy's time."""
+        problem = {**sample_problem, "solver": "portfolio", "time_limit": 0.4}
+        response = test_client.post("/solve", json=problem)
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        report = data["portfolio"]
+        assert len(data["schedule"]) == len(sample_problem["vessels"])
+        assert {entry["strategy"] for entry in report["strategies"]} >= {"fcfs", "spt", "lpt", "random_greedy",
+                                                                      "local_search"}
+        assert data["makespan"] == min(entry["makespan"] for entry in report["strategies"] if "makespan" in entry)
+        assert report["winner"]["strategy"] in {entry["strategy"] for entry in report["strategies"]}
+
+    def test_solve_with_rolling_horizon(self, test_client, monkeypatch):
+        """A month-long problem should be solved in windows, independent stretches in parallel."""
+        monkeypatch.setattr(main.executor, "solver_workers", 3)
+        solve_many = main.executor.solve_many
+        time_limits = []
+        
+        async def recording_solve_many(fn, calls):
+            time_limits.extend(kwargs["time_limit"] for _, kwargs in calls)
+            return await solve_many(fn, calls)
+        
+        monkeypatch.setattr(main.executor, "solve_many", recording_solve_many)
+        vessels = [
+            {"vessel_id": f"V{i:03d}", "arrival_time": (i // 10) * 48 + i % 10, "processing_time": 3 + i % 4}
+            for i in range(150)
+        ]
+        problem = {"vessels": vessels, "planning_horizon": 800, "num_berths": 2, "solver": "local_search",
+                   "time_limit": 0.5, "window": 24, "window_overlap": 6}
+        response = test_client.post("/solve", json=problem)
+        too_wide = test_client.post("/solve", json={**problem, "window_overlap": 24})
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert len(data["schedule"]) == 150
+        assert max(a["start_time"] for a in data["schedule"].values()) > 600
+        assert data["lower_bound"] <= data["makespan"]
+        assert too_wide.status_code == status.HTTP_400_BAD_REQUEST
+        # Stretches run side by side, so each gets the whole time limit
+        assert len(time_limits) > 1
+        assert set(time_limits) == {0.5}
+
+    def test_solve_with_berth_limits_and_closures(self, test_client):
+        """Vessels should only use berths they fit and stay out of closures."""
+        problem = {
+            "vessels": [
+                {"vessel_id": "Big", "arrival_time": 0, "processing_time": 4, "length": 350},
+                {"vessel_id": "Deep", "arrival_time": 0, "processing_time": 3, "draft": 14.0},
+                {"vessel_id": "Small", "arrival_time": 1, "processing_time": 2},
+            ],
+            "num_berths": 2,
+            "solver": "local_search",
+            "time_limit": 0.2,
+            "berths": [{"max_length": 400, "max_draft": 12.0, "closures": [[2, 5]]}, {"max_length": 250}]
+        }
+        response = test_client.post("/solve", json=problem)
+        unfit = test_client.post("/solve", json={**problem, "vessels": [
+            {"vessel_id": "Huge", "arrival_time": 0, "processing_time": 1, "length": 500}
+        ]})
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["schedule"]["Big"]["berth"] == 0 and data["schedule"]["Big"]["start_time"] == 5
+        assert data["schedule"]["Deep"]["berth"] == 1
+        assert data["makespan"] == 9
+        assert unfit.status_code == status.HTTP_400_BAD_REQUEST
+        assert "fits no berth" in unfit.json()["detail"]
+        patch = test_client.patch(f"/solution/{data['problem_id']}", json={"remove": ["Small"]})
+        assert patch.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_solve_with_unknown_solver(self, test_client, sample_problem):
+        """Should reject unknown solver names."""
+        response = test_client.post("/solve", json={**sample_problem, "solver": "magic"})
+        
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    def test_repeated_problem_is_cached(self, test_client, sample_problem):
+        """Resubmitting the same problem, in any vessel order, should hit the cache."""
+        first = test_client.post("/solve", json={**sample_problem, "planning_horizon": 71})
+        reordered = {**sample_problem, "planning_horizon": 71, "vessels": sample_problem["vessels"][::-1]}
+        second = test_client.post("/solve", json=reordered)
+        
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json()["problem_id"] == first.json()["problem_id"]
+        assert second.content == first.content
+
+    def test_solve_with_async_persistence(self, test_client, db_manager, sample_problem):
+        """With persistence async the solution should be readable at once and saved shortly after."""
+        response = test_client.post("/solve", json={**sample_problem, "planning_horizon": 73,
+                                                    "persistence": "async"})
+        problem_id = response.json()["problem_id"]
+        fetched = test_client.get(f"/solution/{problem_id}")
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert fetched.status_code == status.HTTP_200_OK
+        assert fetched.json()["schedule"] == response.json()["schedule"]
+        deadline = time.time() + 10
+        while db_manager.get_solution(problem_id) is None and time.time() < deadline:
+            time.sleep(0.05)
+        assert db_manager.get_solution(problem_id)["makespan"] == response.json()["makespan"]
+
+    @pytest.mark.parametrize("options", [
+        {"planning_horizon": 77},
+        {"planning_horizon": 78, "solver": "exact", "berths": [{"max_length": 300.0}, {"closures": [[40, 50]]}]}
+    ])
+    def test_pending_solution_reads_like_saved_one(self, test_client, db_manager, sample_problem, options,
+                                                   monkeypatch, tmp_path):
+        """A solution waiting to be saved should have the same body, and so ETag, before and after the save."""
+        release = threading.Event()
+        queue = WriteBehindQueue(lambda batch: release.wait(10) and main._flush_solutions(batch),
+                                 spill_dir=str(tmp_path))
+        monkeypatch.setattr(main, "write_behind", queue)
+        problem_id = test_client.post("/solve", json={**sample_problem, **options,
+                                                      "persistence": "async"}).json()["problem_id"]
+        views = ["", "?fields=summary", "?fields=schedule", "?berth=1", "?vessel=V003&fields=vessels"]
+        
+        pending = [test_client.get(f"/solution/{problem_id}{view}") for view in views]
+        release.set()
+        deadline = time.time() + 10
+        while queue.pending(problem_id) is not None and time.time() < deadline:
+            time.sleep(0.05)
+        saved = [test_client.get(f"/solution/{problem_id}{view}") for view in views]
+        queue.shutdown()
+        
+        assert queue.pending(problem_id) is None
+        for before, after in zip(pending, saved):
+            assert before.status_code == after.status_code == status.HTTP_200_OK
+            assert before.json() == after.json()
+            assert before.headers["etag"] == after.headers["etag"]
+
     @pytest.mark.slow
     def test_solve_with_large_problem(self, test_client, large_problem):
         """Should handle larger problem instances."""
@@ -112,6 +381,123 @@ class TestSolveEndpoint:
         assert data["solving_time"] is not None
 
 
+@pytest.mark.api
+class TestNdjsonUpload:
+    """Tests for streaming NDJSON uploads."""
+
+    def test_solves_streamed_vessels_with_options_line(self, test_client):
+        """The first line may carry options; vessels follow one per line."""
+        body = "\n".join([
+            '{"num_berths": 1, "planning_horizon": 68}',
+            '{"vessel_id": "V1", "arrival_time": 0, "processing_time": 5}',
+            '',
+            '{"vessel_id": "V2", "arrival_time": 1, "processing_time": 4}',
+        ])
+        
+        response = test_client.post("/upload-ndjson", content=body)
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["makespan"] == 9
+        assert [v["vessel_id"] for v in data["vessels"]] == ["V1", "V2"]
+
+    def test_rejects_bad_record_by_line_number(self, test_client):
+        """The first malformed record should be reported with its line number."""
+        body = "\n".join([
+            '{"vessel_id": "V1", "arrival_time": 0, "processing_time": 5}',
+            '{"vessel_id": "V2", "arrival_time": "soon", "processing_time": 4}',
+        ])
+        
+        response = test_client.post("/upload-ndjson", content=body)
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"].startswith("Line 2:")
+
+    def test_rejects_unknown_option_on_first_line(self, test_client):
+        """A first line without vessel_id is options, so a misspelt option is reported."""
+        body = "\n".join([
+            '{"num_berths": 1, "planning_horizn": 68}',
+            '{"vessel_id": "V1", "arrival_time": 0, "processing_time": 5}',
+        ])
+        
+        response = test_client.post("/upload-ndjson", content=body)
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Line 1: Unknown option 'planning_horizn'"
+
+    def test_rejects_duplicate_vessel_ids(self, test_client):
+        """Vessel ids must be unique, as for /solve."""
+        body = "\n".join([
+            '{"vessel_id": "V1", "arrival_time": 0, "processing_time": 5}',
+            '{"vessel_id": "V1", "arrival_time": 1, "processing_time": 4}',
+        ])
+        
+        response = test_client.post("/upload-ndjson", content=body)
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"] == "Line 2: Duplicate vessel_id 'V1'"
+
+    def test_enforces_vessel_limit(self, test_client, monkeypatch):
+        """Uploads with too many vessels should be rejected with 413."""
+        monkeypatch.setattr(ingest, "MAX_UPLOAD_VESSELS", 2)
+        body = "\n".join(
+            f'{{"vessel_id": "V{i}", "arrival_time": {i}, "processing_time": 3}}' for i in range(3)
+        )
+        
+        response = test_client.post("/upload-ndjson", content=body)
+        
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    def test_vessel_store_columns(self):
+        """VesselStore should expose packed int64 columns and reject duplicate ids."""
+        store = ingest.VesselStore()
+        store.append("V1", 0, 5)
+        store.append("V2", 3, 7)
+        
+        vessel_ids, arrival_times, processing_times = store.columns()
+        
+        assert vessel_ids == ["V1", "V2"]
+        assert arrival_times.dtype == np.int64
+        assert processing_times.tolist() == [5, 7]
+        with pytest.raises(ValueError):
+            store.append("V1", 1, 1)
+
+
+@pytest.mark.api
+class TestBatchSolveEndpoint:
+    """Tests for solving several problems in one call."""
+
+    def test_results_in_order_with_per_item_errors(self, test_client, sample_problem):
+        """Bad items should get error entries without failing the rest."""
+        infeasible = {**sample_problem, "planning_horizon": 1, "num_berths": 1}
+        body = [
+            {**sample_problem, "planning_horizon": 70},
+            {"vessels": "not-a-list"},
+            infeasible,
+            {**sample_problem, "planning_horizon": 70, "num_berths": 1},
+        ]
+        
+        response = test_client.post("/solve/batch", json=body)
+        
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()["results"]
+        assert [r["index"] for r in results] == [0, 1, 2, 3]
+        assert [r["status"] for r in results] == ["ok", "error", "error", "ok"]
+        assert results[3]["result"]["makespan"] >= results[0]["result"]["makespan"]
+        
+        saved = test_client.get(f"/solution/{results[0]['result']['problem_id']}")
+        assert saved.status_code == status.HTTP_200_OK
+
+    def test_identical_problems_share_a_solution(self, test_client, sample_problem):
+        """Repeated problems in a batch should be solved and saved once."""
+        problem = {**sample_problem, "planning_horizon": 69}
+        reordered = {**problem, "vessels": problem["vessels"][::-1]}
+        
+        results = test_client.post("/solve/batch", json=[problem, reordered]).json()["results"]
+        
+        assert results[0]["result"]["problem_id"] == results[1]["result"]["problem_id"]
+
+
 @pytest.mark.api
 class TestSolutionsEndpoint:
     """Tests for listing and retrieving solutions."""
@@ -144,6 +530,121 @@ class TestSolutionsEndpoint:
         assert "schedule" in data
         assert "vessels" in data
 
+    def test_get_partial_solution(self, test_client, sample_problem):
+        """fields, berth and vessel should narrow the returned solution."""
+        problem_id = test_client.post("/solve", json={**sample_problem, "planning_horizon": 73}).json()["problem_id"]
+        full = test_client.get(f"/solution/{problem_id}").json()
+        
+        summary = test_client.get(f"/solution/{problem_id}", params={"fields": "summary"}).json()
+        berth = test_client.get(f"/solution/{problem_id}", params={"berth": 0}).json()
+        vessel = test_client.get(f"/solution/{problem_id}", params={"vessel": "V001", "fields": "schedule"}).json()
+        
+        assert summary["makespan"] == full["makespan"]
+        assert "schedule" not in summary and "vessels" not in summary
+        assert berth["schedule"] == {v: e for v, e in full["schedule"].items() if e["berth"] == 0}
+        assert {v["vessel_id"] for v in berth["vessels"]} == set(berth["schedule"])
+        assert vessel["schedule"] == {"V001": full["schedule"]["V001"]}
+        assert "vessels" not in vessel
+        
+        unknown_vessel = test_client.get(f"/solution/{problem_id}", params={"vessel": "V999"})
+        bad_fields = test_client.get(f"/solution/{problem_id}", params={"fields": "everything"})
+        assert unknown_vessel.status_code == status.HTTP_404_NOT_FOUND
+        assert bad_fields.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_conditional_get_of_compressed_solution(self, test_client, sample_problem, monkeypatch):
+        """A held ETag should get 304 without a database read until a new version is saved."""
+        problem_id = test_client.post("/solve", json={**sample_problem, "planning_horizon": 75}).json()["problem_id"]
+        gzip = {"Accept-Encoding": "gzip"}
+        
+        first = test_client.get(f"/solution/{problem_id}", headers=gzip)
+        etag = first.headers["etag"]
+        with monkeypatch.context() as patched:
+            patched.setattr(main.db, "get_solution", lambda *args, **kwargs: pytest.fail("database read"))
+            repeat = test_client.get(f"/solution/{problem_id}", headers={**gzip, "If-None-Match": etag})
+        
+        assert first.headers["content-encoding"] == "gzip"
+        assert etag.endswith('-gzip"') and "Accept-Encoding" in first.headers["vary"]
+        assert repeat.status_code == status.HTTP_304_NOT_MODIFIED
+        assert repeat.headers["etag"] == etag and repeat.content == b""
+        
+        test_client.patch(f"/solution/{problem_id}", json={"remove": ["V003"]})
+        changed = test_client.get(f"/solution/{problem_id}", headers={**gzip, "If-None-Match": etag})
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.headers["etag"] != etag and "V003" not in changed.json()["schedule"]
+
+    def test_conditional_list_solutions(self, test_client, sample_problem):
+        """Listings should be tagged by content and revalidate until a solution is saved."""
+        listing = test_client.get("/solutions", params={"limit": 3})
+        repeat = test_client.get("/solutions", params={"limit": 3}, headers={"If-None-Match": listing.headers["etag"]})
+        test_client.post("/solve", json={**sample_problem, "planning_horizon": 76})
+        changed = test_client.get("/solutions", params={"limit": 3}, headers={"If-None-Match": listing.headers["etag"]})
+        
+        assert repeat.status_code == status.HTTP_304_NOT_MODIFIED
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.json()["solutions"] != listing.json()["solutions"]
+
+    def test_patch_solution_saves_a_repaired_version(self, test_client, sample_problem):
+        """PATCH should repair the schedule, return a diff and save a new version."""
+        problem_id = test_client.post("/solve", json={**sample_problem, "planning_horizon": 74}).json()["problem_id"]
+        
+        response = test_client.patch(f"/solution/{problem_id}", json={
+            "current_time": 4,
+            "updates": [{"vessel_id": "V003", "arrival_time": 11}],
+            "add": [{"vessel_id": "V005", "arrival_time": 12, "processing_time": 3}]
+        })
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["problem_id"] == problem_id
+        assert data["makespan"] == 18
+        assert list(data["diff"]["changed"]) == ["V003"]
+        assert data["diff"]["added"] == ["V005"]
+        latest = test_client.get(f"/solution/{problem_id}").json()
+        assert latest["timestamp"] == data["timestamp"] != data["previous_timestamp"]
+        assert latest["schedule"] == data["schedule"]
+        
+        started = test_client.patch(f"/solution/{problem_id}", json={"current_time": 4, "remove": ["V001"]})
+        missing = test_client.patch("/solution/nonexistent-id-12345", json={"remove": ["V001"]})
+        assert started.status_code == status.HTTP_400_BAD_REQUEST
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_patch_solution_reports_storage_errors(self, test_client, sample_problem, monkeypatch):
+        """A failed read or save should be a 500, and a failed save should leave the latest version alone."""
+        solved = test_client.post("/solve", json={**sample_problem, "planning_horizon": 75}).json()
+        patch = {"updates": [{"vessel_id": "V003", "arrival_time": 11}]}
+        
+        monkeypatch.setattr(main.db, "save_solution", lambda problem_id, data: False)
+        unsaved = test_client.patch(f"/solution/{solved['problem_id']}", json=patch)
+        monkeypatch.setattr(main.db, "get_solution", lambda *args, **kwargs: 1 / 0)
+        unread = test_client.patch(f"/solution/{solved['problem_id']}", json=patch)
+        monkeypatch.undo()
+        
+        assert unsaved.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert unread.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert test_client.get(f"/solution/{solved['problem_id']}").json()["timestamp"] == solved["timestamp"]
+
+    def test_solution_versions(self, test_client, sample_problem):
+        """Versions should be listed newest first and earlier ones fetched by timestamp or as_of."""
+        problem_id = test_client.post("/solve", json=sample_problem).json()["problem_id"]
+        patched = test_client.patch(f"/solution/{problem_id}", json={"remove": ["V003"]}).json()
+        
+        page = test_client.get(f"/solution/{problem_id}/versions", params={"limit": 1}).json()
+        rest = test_client.get(f"/solution/{problem_id}/versions",
+                               params={"limit": 1, "next_token": page["next_token"]}).json()
+        original = test_client.get(f"/solution/{problem_id}",
+                                   params={"timestamp": patched["previous_timestamp"]}).json()
+        as_of = test_client.get(f"/solution/{problem_id}",
+                                params={"as_of": patched["previous_timestamp"], "fields": "summary"}).json()
+        
+        assert [v["timestamp"] for v in page["versions"] + rest["versions"]] == [
+            patched["timestamp"], patched["previous_timestamp"]]
+        assert "schedule" not in page["versions"][0]
+        assert "V003" in original["schedule"]
+        assert as_of["timestamp"] == patched["previous_timestamp"]
+        assert test_client.get("/solution/nonexistent-id-12345/versions").status_code == status.HTTP_404_NOT_FOUND
+        assert test_client.get(f"/solution/{problem_id}", params={"as_of": "yesterday"}).status_code == \
+            status.HTTP_400_BAD_REQUEST
+
     def test_get_nonexistent_solution(self, test_client):
         """Should return error for non-existent solution."""
         response = test_client.get("/solution/nonexistent-id-12345")
@@ -177,3 +678,420 @@ class TestDeleteEndpoint:
         
         # Currently returns 200 even if doesn't exist
         assert response.status_code in [status.HTTP_200_OK, status.HTTP_404_NOT_FOUND]
+
+
+def _events(text):
+    """Parse a text/event-stream body into (event, data) pairs, skipping comments."""
+    events = []
+    for message in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.split("\n") if not line.startswith(":"))
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.api
+class TestSolveStream:
+    """Tests for solves streamed as server-sent events."""
+
+    def test_streams_result_and_saves_solution(self, test_client, sample_problem):
+        """The stream should end with the solution /solve would return, saved and cached."""
+        # Vessel ids no other test uses, so the first request is a cache miss
+        vessels = [{**vessel, "vessel_id": f"S-{vessel['vessel_id']}"} for vessel in sample_problem["vessels"]]
+        problem = {**sample_problem, "vessels": vessels, "solver": "local_search", "time_limit": 0.5}
+        with test_client.stream("POST", "/solve/stream", json=problem) as response:
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["content-type"].startswith("text/event-stream")
+            assert response.headers["x-cache"] == "MISS"
+            events = _events(response.read().decode())
+        
+        event, solution = events[-1]
+        assert event == "result"
+        assert len(solution["schedule"]) == len(sample_problem["vessels"])
+        for event, progress in events[:-1]:
+            assert event == "progress"
+            assert progress["makespan"] >= solution["makespan"]
+        assert test_client.get(f"/solution/{solution['problem_id']}").status_code == status.HTTP_200_OK
+        
+        repeat = test_client.post("/solve/stream", json=problem)
+        assert repeat.headers["x-cache"] == "HIT"
+        assert _events(repeat.text) == [("result", solution)]
+
+    def test_reports_solver_errors(self, test_client):
+        """An infeasible problem should end the stream with an error event."""
+        problem = {"vessels": [{"vessel_id": "V1", "arrival_time": 10, "processing_time": 5}],
+                   "planning_horizon": 5, "solver": "exact"}
+        events = _events(test_client.post("/solve/stream", json=problem).text)
+        
+        assert [event for event, _ in events] == ["error"]
+        assert events[0][1]["detail"]
+
+    def test_channel_publishes_schedules_on_request(self):
+        """Lazy schedules in updates are built only by channels opened with schedules=True."""
+        built = []
+        
+        def schedule():
+            built.append(1)
+            return {"V1": {"berth": 0}}
+        
+        update = {"makespan": 5, "schedule": schedule}
+        executor = SolverExecutor(solver_workers=0, queue_size=0, db_threads=1)
+        plain = executor.open_channel(min_interval=0)
+        streamed = executor.open_channel(min_interval=0, schedules=True)
+        plain.report(update)
+        streamed.report(update)
+        
+        assert plain.drain() == [{"makespan": 5}]
+        assert streamed.drain() == [{"makespan": 5, "schedule": {"V1": {"berth": 0}}}]
+        assert len(built) == 1
+
+    def test_streams_progress_and_cancels_on_disconnect(self, monkeypatch):
+        """Updates become progress events; a disconnected client cancels the solve."""
+        monkeypatch.setattr(streaming, "POLL_INTERVAL", 0.01)
+        channel = SolverExecutor(solver_workers=0, queue_size=0, db_threads=1).open_channel(min_interval=0)
+        gone = False
+        
+        async def solve():
+            for makespan in (9, 8, 7):
+                channel.report({"makespan": makespan})
+                await asyncio.sleep(0.05)
+            while not channel.cancelled:
+                await asyncio.sleep(0.01)
+            return {"makespan": 7}
+        
+        async def finish(result):
+            return encode_json(result)
+        
+        async def disconnected():
+            return gone
+        
+        async def scenario():
+            nonlocal gone
+            events = []
+            async for message in streaming.solve_events(solve, channel, finish, disconnected):
+                events.append(message)
+                if len(events) == 3:
+                    gone = True
+            return events
+        
+        events = _events(b"".join(asyncio.run(scenario())).decode())
+        
+        assert events == [("progress", {"makespan": 9}), ("progress", {"makespan": 8}),
+                          ("progress", {"makespan": 7})]
+        assert channel.cancelled
+
+    @pytest.mark.parametrize("solver", ["local_search", "portfolio"])
+    def test_cancelled_channel_stops_solver(self, solver):
+        """A solve whose channel is cancelled, as on disconnect, should stop well before its time limit."""
+        rng = np.random.default_rng(5)
+        arrival_times = rng.integers(0, 2000, 2000)
+        processing_times = rng.integers(1, 40, 2000)
+        channel = SolverExecutor(solver_workers=0, queue_size=0, db_threads=1).open_channel(min_interval=0)
+        channel.cancel()
+        
+        started = time.time()
+        result = run_solver([f"V{i}" for i in range(2000)], arrival_times, processing_times, num_berths=10,
+                            planning_horizon=10**6, solver=solver, time_limit=30, channel=channel)
+        
+        assert time.time() - started < 5
+        assert len(result["schedule"]) == 2000
+        assert channel.drain()
+
+
+def _wait_for_job(get, job_id, timeout=30):
+    """Poll until a job reaches a final state and return its last status payload."""
+    deadline = time.time() + timeout
+    while True:
+        job = get(job_id)
+        if job["status"] in ("completed", "failed", "cancelled") or time.time() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+@pytest.mark.api
+class TestJobsEndpoint:
+    """Tests for background solve jobs."""
+
+    def test_job_completes_and_saves_solution(self, test_client, sample_problem):
+        """A finished job's solution should be saved under the job id."""
+        response = test_client.post("/jobs", json=sample_problem)
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        data = response.json()
+        assert data["problem_id"] == data["job_id"]
+        
+        job = _wait_for_job(lambda job_id: test_client.get(f"/jobs/{job_id}").json(), data["job_id"])
+        assert job["status"] == "completed"
+        assert job["progress"] == 1.0
+        
+        solution = test_client.get(f"/solution/{data['problem_id']}").json()
+        assert solution["makespan"] == job["result"]["makespan"]
+
+    def test_job_fails_when_solution_is_not_saved(self, test_client, sample_problem, monkeypatch):
+        """A job whose solution could not be saved should end failed, not completed."""
+        monkeypatch.setattr(main.db, "save_solution", lambda problem_id, data: False)
+        data = test_client.post("/jobs", json={**sample_problem, "planning_horizon": 76}).json()
+        
+        job = _wait_for_job(lambda job_id: test_client.get(f"/jobs/{job_id}").json(), data["job_id"])
+        monkeypatch.undo()
+        
+        assert job["status"] == "failed"
+        assert job["error"] == "Failed to save the solution"
+        assert test_client.get(f"/solution/{data['problem_id']}").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_cancel_job(self, test_client, large_problem):
+        """A cancelled job should stop and save nothing."""
+        problem = {**large_problem, "solver": "local_search", "time_limit": 30}
+        job_id = test_client.post("/jobs", json=problem).json()["job_id"]
+        
+        response = test_client.delete(f"/jobs/{job_id}")
+        
+        assert response.status_code == status.HTTP_200_OK
+        job = _wait_for_job(lambda job_id: test_client.get(f"/jobs/{job_id}").json(), job_id)
+        assert job["status"] in ("cancelled", "completed")
+        if job["status"] == "cancelled":
+            assert test_client.get(f"/solution/{job_id}").status_code != status.HTTP_200_OK
+
+    def test_unknown_job(self, test_client):
+        """Unknown job ids should return 404."""
+        assert test_client.get("/jobs/nonexistent-job").status_code == status.HTTP_404_NOT_FOUND
+        assert test_client.delete("/jobs/nonexistent-job").status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.api
+class TestInMemoryJobQueue:
+    """Tests for the in-process job queue."""
+
+    def test_runs_handler_and_reports_result(self):
+        """Jobs should move from queued to completed with the handler's result."""
+        queue = InMemoryJobQueue(lambda job: {"makespan": job.request * 2}, workers=1)
+        try:
+            job = queue.submit(21)
+            final = _wait_for_job(lambda job_id: queue.get(job_id).to_dict(), job.job_id)
+        finally:
+            queue.shutdown()
+        
+        assert final["status"] == "completed"
+        assert final["result"] == {"makespan": 42}
+
+    def test_failed_and_cancelled_jobs(self):
+        """Handler errors mark a job failed; JobCancelledError marks it cancelled."""
+        def handler(job):
+            if job.request == "fail":
+                raise ValueError("No schedule fits")
+            raise JobCancelledError()
+        
+        queue = InMemoryJobQueue(handler, workers=1)
+        try:
+            failed = queue.submit("fail")
+            cancelled = queue.submit("cancel")
+            failed_state = _wait_for_job(lambda job_id: queue.get(job_id).to_dict(), failed.job_id)
+            cancelled_state = _wait_for_job(lambda job_id: queue.get(job_id).to_dict(), cancelled.job_id)
+        finally:
+            queue.shutdown()
+        
+        assert failed_state["status"] == "failed"
+        assert failed_state["error"] == "No schedule fits"
+        assert cancelled_state["status"] == "cancelled"
+
+    def test_cancel_queued_job_and_queue_limit(self):
+        """Queued jobs cancel immediately and a full queue rejects new jobs."""
+        queue = InMemoryJobQueue(lambda job: time.sleep(0.3), workers=1, max_queued=1)
+        try:
+            queue.submit(None)
+            time.sleep(0.05)
+            waiting = queue.submit(None)
+            with pytest.raises(JobQueueFullError):
+                queue.submit(None)
+            
+            assert queue.cancel(waiting.job_id).status == "cancelled"
+            assert queue.cancel("nonexistent-job") is None
+        finally:
+            queue.shutdown()
+
+    def test_cancelled_queued_job_frees_its_slot(self):
+        """Cancelling a waiting job should let another job take its place."""
+        queue = InMemoryJobQueue(lambda job: time.sleep(0.3), workers=1, max_queued=2)
+        try:
+            queue.submit(None)
+            time.sleep(0.05)
+            first = queue.submit(None)
+            queue.submit(None)
+            with pytest.raises(JobQueueFullError):
+                queue.submit(None)
+            
+            queue.cancel(first.job_id)
+            replacement = queue.submit(None)
+            assert replacement.status == "queued"
+            with pytest.raises(JobQueueFullError):
+                queue.submit(None)
+        finally:
+            queue.shutdown()
+
+
+@pytest.mark.api
+class TestWriteBehindQueue:
+    """Tests for write-behind persistence."""
+
+    def test_saves_in_batches(self, tmp_path):
+        """Queued solutions should be saved in batches and readable until then."""
+        batches = []
+        queue = WriteBehindQueue(lambda batch: batches.append(batch) or True, batch_size=10,
+                                 flush_interval=0.5, spill_dir=str(tmp_path))
+        try:
+            for i in range(25):
+                assert queue.enqueue(f"p{i}", {"makespan": i})
+            assert queue.pending("p3") == {"makespan": 3}
+            queue.discard("p24")
+        finally:
+            queue.shutdown()
+        
+        saved = [problem_id for batch in batches for problem_id, _ in batch]
+        assert sorted(saved) == sorted(f"p{i}" for i in range(24))
+        assert max(len(batch) for batch in batches) <= 10
+        assert queue.pending("p3") is None
+        assert not queue.enqueue("late", {})
+
+    def test_spills_failed_batches_and_replays_them(self, tmp_path):
+        """A batch that keeps failing should be retried, spilled, then saved by a later replay."""
+        attempts = []
+        failing = WriteBehindQueue(lambda batch: attempts.append(batch) and False, max_attempts=3,
+                                   backoff=0.001, spill_dir=str(tmp_path))
+        assert not failing.flush([("p1", {"makespan": 1}), ("p2", {"makespan": 2})])
+        
+        assert len(attempts) == 3
+        assert len(list(tmp_path.glob("*.jsonl"))) == 1
+        
+        saved = []
+        recovered = WriteBehindQueue(lambda batch: saved.extend(batch) or True, spill_dir=str(tmp_path))
+        recovered.replay()
+        
+        assert saved == [("p1", {"makespan": 1}), ("p2", {"makespan": 2})]
+        assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.api
+class TestSolutionCache:
+    """Tests for the content-addressed solution cache."""
+
+    def test_problem_hash_is_canonical(self):
+        """Vessel order should not matter; problem and solver options should."""
+        vessels = [("V1", 0, 5), ("V2", 3, 7)]
+        key = problem_hash(vessels, 72, 2)
+        
+        assert problem_hash(vessels[::-1], 72, 2) == key
+        assert problem_hash(vessels, 72, 2, "heuristic", 5.0) == key
+        assert problem_hash(vessels, 72, 3) != key
+        assert problem_hash(vessels, 72, 2, "exact", 5.0) != problem_hash(vessels, 72, 2, "exact", 10.0)
+        assert problem_hash([("V1", 0, 5), ("V2", 3, 8)], 72, 2) != key
+
+    def test_lru_eviction_ttl_and_invalidation(self):
+        """Should evict the least recently used entry, expire old ones and drop deleted problems."""
+        cache = SolutionCache(max_entries=2, ttl=60)
+        cache.put("a", {"problem_id": "pa"})
+        cache.put("b", {"problem_id": "pb"})
+        cache.get("a")
+        cache.put("c", {"problem_id": "pc"})
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == {"problem_id": "pa"}
+        
+        cache.invalidate_problem("pa")
+        assert cache.get("a") is None
+        
+        expiring = SolutionCache(max_entries=2, ttl=0)
+        expiring.put("a", {"problem_id": "pa"})
+        time.sleep(0.01)
+        assert expiring.get("a") is None
+
+    def test_keeps_encoded_body(self):
+        """An entry should return the response body it was cached with."""
+        cache = SolutionCache(max_entries=2, ttl=60)
+        cache.put("a", {"problem_id": "pa"}, b'{"problem_id":"pa"}')
+        cache.put("b", {"problem_id": "pb"})
+        
+        assert cache.get_entry("a") == ({"problem_id": "pa"}, b'{"problem_id":"pa"}')
+        assert cache.get_entry("b") == ({"problem_id": "pb"}, None)
+        assert cache.get_entry("c") is None
+
+
+@pytest.mark.api
+class TestCompression:
+    """Tests for content negotiation of response compression."""
+
+    def test_negotiates_preferred_encoding(self):
+        """The client's best-rated supported encoding should win; refused ones never."""
+        preferred = "br" if compression.brotli is not None else "gzip"
+        
+        assert negotiate("gzip, deflate") == "gzip"
+        assert negotiate("gzip;q=0.5, br") == preferred
+        assert negotiate("br;q=0, gzip;q=0.2") == "gzip"
+        assert negotiate("*") == preferred
+        assert negotiate("identity") is None
+        assert negotiate("gzip;q=0") is None
+        assert negotiate("") is None
+
+
+@pytest.mark.api
+class TestJsonEncoding:
+    """Tests for the orjson response encoding."""
+
+    def test_matches_stdlib_json(self):
+        """Solver and database types should encode to the JSON the stdlib would produce."""
+        body = {
+            "makespan": np.int64(18),
+            "gap": np.float64(0.25),
+            "schedule": {"V1": {"berth": 0, "start_time": 0, "end_time": 5}},
+            "berths": {0: [1, 2]},
+            "stored": Decimal("7"),
+            "ratio": Decimal("0.5"),
+            "lower_bound": None
+        }
+        
+        assert json.loads(encode_json(body)) == {
+            "makespan": 18,
+            "gap": 0.25,
+            "schedule": {"V1": {"berth": 0, "start_time": 0, "end_time": 5}},
+            "berths": {"0": [1, 2]},
+            "stored": 7,
+            "ratio": 0.5,
+            "lower_bound": None
+        }
+        with pytest.raises(TypeError):
+            encode_json({"unknown": object()})
+
+
+@pytest.mark.api
+class TestSolverExecutor:
+    """Tests for the solver process pool and its admission limit."""
+
+    def test_runs_solver_in_process_pool(self):
+        """Solves should run in a worker process and return the result."""
+        executor = SolverExecutor(solver_workers=1, queue_size=0, db_threads=1)
+        try:
+            result = asyncio.run(executor.solve(
+                run_solver, ["V1", "V2"], np.array([0, 1]), np.array([5, 3]), num_berths=1
+            ))
+        finally:
+            executor.shutdown()
+        
+        assert result["makespan"] == 8
+        assert result["schedule"]["V2"]["start_time"] == 5
+
+    def test_rejects_when_saturated(self):
+        """Should raise SolverBusyError once workers and queue are full."""
+        executor = SolverExecutor(solver_workers=0, queue_size=0, db_threads=1)
+        
+        async def scenario():
+            running = asyncio.ensure_future(executor.solve(time.sleep, 0.3))
+            await asyncio.sleep(0.05)
+            with pytest.raises(SolverBusyError):
+                await executor.solve(time.sleep, 0)
+            await running
+            # Capacity is released once the running solve finishes
+            await executor.solve(time.sleep, 0)
+        
+        try:
+            asyncio.run(scenario())
+        finally:
+            executor.shutdown()
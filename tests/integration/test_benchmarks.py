@@ -0,0 +1,63 @@
+"""
+Tests for the benchmark suite's timing and regression check.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "benchmarks"))
+
+from suite import compare, time_runs
+
+
+def _results(**seconds):
+    return {'results': [{'name': name, 'seconds': value} for name, value in seconds.items()]}
+
+
+@pytest.mark.benchmark
+class TestCompare:
+    """Tests for comparing two benchmark results files."""
+
+    def test_threshold(self):
+        """Only cases slower than (1 + threshold) times the baseline regress."""
+        rows = compare(_results(a=1.0, b=1.0), _results(a=1.15, b=1.25), threshold=0.2, min_delta=0.0)
+        
+        assert [row['name'] for row in rows] == ['a', 'b']
+        assert rows[0]['ratio'] == pytest.approx(1.15)
+        assert not rows[0]['regressed']
+        assert rows[1]['regressed']
+
+    def test_min_delta(self):
+        """Large ratios on tiny timings should not count as regressions."""
+        rows = compare(_results(tiny=0.001, big=1.0), _results(tiny=0.003, big=1.5),
+                       threshold=0.2, min_delta=0.005)
+        
+        assert rows[0]['ratio'] == pytest.approx(3.0)
+        assert not rows[0]['regressed']
+        assert rows[1]['regressed']
+
+    def test_case_missing_from_baseline(self):
+        """Cases without a baseline are left out instead of failing."""
+        rows = compare(_results(a=1.0), _results(a=1.0, new=5.0), threshold=0.2, min_delta=0.0)
+        
+        assert [row['name'] for row in rows] == ['a']
+        assert not rows[0]['regressed']
+
+    def test_zero_baseline(self):
+        """A zero baseline timing should give an infinite ratio, not an error."""
+        rows = compare(_results(a=0.0), _results(a=0.01), threshold=0.2, min_delta=0.005)
+        
+        assert rows[0]['ratio'] == float('inf')
+        assert rows[0]['regressed']
+
+
+@pytest.mark.benchmark
+def test_time_runs_warms_up_first():
+    """The warm-up call should run but not be timed."""
+    calls = []
+    timings = time_runs(lambda: calls.append(len(calls)), repeat=3)
+    
+    assert len(calls) == 4
+    assert len(timings) == 3
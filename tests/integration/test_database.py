@@ -3,10 +3,58 @@ Integration tests for database operations.
 Tests DynamoDB operations with LocalStack.
 """
 
+import asyncio
+import json
+import os
 import pytest
+import threading
+import types
 import uuid
 from datetime import datetime
 
+import async_database
+import database
+import sqlite_storage
+import storage
+from async_database import AsyncDynamoDBManager
+from sqlite_storage import SQLiteManager
+from storage_format import (decode_segment, decode_solution, encode_segments, encode_solution,
+                            join_segments, vessel_bucket)
+
+
+def _solution(num_vessels, num_berths=3, id_padding=0):
+    """
+    Feasible solution data with a full schedule for num_vessels vessels.
+
+    id_padding appends that many random hex digits to each id, so ids do
+    not compress.
+    """
+    vessels = [
+        {"vessel_id": f"V{i:05d}" + os.urandom(id_padding).hex()[:id_padding],
+         "arrival_time": (i * 7) % 50, "processing_time": 1 + i % 9}
+        for i in range(num_vessels)
+    ]
+    schedule = {}
+    free = [0] * num_berths
+    for vessel in sorted(vessels, key=lambda v: v["arrival_time"]):
+        berth = min(range(num_berths), key=free.__getitem__)
+        start = max(vessel["arrival_time"], free[berth])
+        free[berth] = start + vessel["processing_time"]
+        schedule[vessel["vessel_id"]] = {
+            "berth": berth,
+            "start_time": start,
+            "end_time": free[berth],
+            "arrival_time": vessel["arrival_time"],
+            "processing_time": vessel["processing_time"]
+        }
+    return {
+        "makespan": max(free),
+        "solving_time": 0.01,
+        "schedule": schedule,
+        "vessels": vessels,
+        "timestamp": datetime.now().isoformat()
+    }
+
 
 @pytest.mark.database
 class TestDatabaseOperations:
@@ -45,6 +93,66 @@ class TestDatabaseOperations:
         # Should have at least the solutions created in previous tests
         assert len(solutions) >= 0
 
+    def test_list_solutions_pagination_and_filters(self, db_manager):
+        """Should page through solutions newest first and apply range filters."""
+        makespan = 900000 + int(uuid.uuid4().int % 90000)
+        for offset in range(3):
+            db_manager.save_solution(str(uuid.uuid4()), {
+                "makespan": makespan + offset,
+                "solving_time": 0.01,
+                "schedule": {},
+                "vessels": [],
+                "timestamp": datetime.now().isoformat()
+            })
+        
+        first = db_manager.list_solutions_page(2, min_makespan=makespan, max_makespan=makespan + 2)
+        second = db_manager.list_solutions_page(2, next_token=first["next_token"],
+                                                min_makespan=makespan, max_makespan=makespan + 2)
+        
+        assert [s["makespan"] for s in first["solutions"]] == [makespan + 2, makespan + 1]
+        assert [s["makespan"] for s in second["solutions"]] == [makespan]
+        assert second["next_token"] is None
+        with pytest.raises(ValueError):
+            db_manager.list_solutions_page(2, next_token="not-a-token")
+
+    def test_filtered_listing_reads_are_bounded(self, dynamodb_manager, monkeypatch):
+        """A rarely matching filter should return short pages with a next_token, not read on."""
+        monkeypatch.setattr(database, "LISTING_MAX_READS", 2)
+        makespan = 900000 + int(uuid.uuid4().int % 90000)
+        for value in [makespan] + [1] * 5:
+            dynamodb_manager.save_solution(str(uuid.uuid4()), {
+                "makespan": value, "solving_time": 0.01, "schedule": {}, "vessels": [],
+                "timestamp": datetime.now().isoformat()
+            })
+        
+        pages = [dynamodb_manager.list_solutions_page(10, min_makespan=makespan, max_makespan=makespan)]
+        while pages[-1]["next_token"] is not None and len(pages) < 10000:
+            pages.append(dynamodb_manager.list_solutions_page(10, next_token=pages[-1]["next_token"],
+                                                              min_makespan=makespan, max_makespan=makespan))
+        
+        assert pages[0] == {"solutions": [], "next_token": pages[0]["next_token"]} and pages[0]["next_token"]
+        assert [s["makespan"] for page in pages for s in page["solutions"]] == [makespan]
+        assert pages[-1]["next_token"] is None
+
+    def test_save_solutions_in_batch(self, db_manager):
+        """Should save many solutions with batched writes."""
+        problem_ids = [str(uuid.uuid4()) for _ in range(30)]
+        solutions = [
+            (problem_id, {
+                "makespan": index,
+                "solving_time": 0.01,
+                "schedule": {},
+                "vessels": [],
+                "timestamp": datetime.now().isoformat()
+            })
+            for index, problem_id in enumerate(problem_ids)
+        ]
+        
+        assert db_manager.save_solutions(solutions)
+        
+        assert db_manager.get_solution(problem_ids[0])["makespan"] == 0
+        assert db_manager.get_solution(problem_ids[-1])["makespan"] == 29
+
     def test_delete_solution(self, db_manager):
         """Should delete a solution from the database."""
         # Create a solution
@@ -100,3 +208,424 @@ class TestDatabaseOperations:
         # Verify nested data (handle Decimal)
         assert int(retrieved["schedule"]["V001"]["start_time"]) == 0
         assert retrieved["vessels"][1]["processing_time"] == 7
+
+    def test_find_solution_by_hash(self, db_manager):
+        """Should find the latest solution saved with a problem hash."""
+        problem_id = str(uuid.uuid4())
+        problem_hash = uuid.uuid4().hex
+        db_manager.save_solution(problem_id, {
+            "makespan": 9,
+            "solving_time": 0.01,
+            "schedule": {},
+            "vessels": [],
+            "timestamp": datetime.now().isoformat(),
+            "problem_hash": problem_hash
+        })
+        
+        found = db_manager.find_solution_by_hash(problem_hash)
+        
+        assert found is not None
+        assert found["problem_id"] == problem_id
+        assert db_manager.find_solution_by_hash(uuid.uuid4().hex) is None
+
+    def test_versions_and_point_in_time_reads(self, db_manager):
+        """Versions should be listed newest first by page and readable by timestamp or as of a time."""
+        problem_id = str(uuid.uuid4())
+        timestamps = [f"2026-01-0{day}T12:00:00+00:00" for day in range(1, 6)]
+        for makespan, timestamp in enumerate(timestamps):
+            db_manager.save_solution(problem_id, {**_solution(5), "makespan": makespan, "timestamp": timestamp})
+        
+        first = db_manager.list_versions(problem_id, limit=3)
+        rest = db_manager.list_versions(problem_id, limit=3, next_token=first["next_token"])
+        listed = [version["timestamp"] for version in first["versions"] + rest["versions"]]
+        
+        assert listed == timestamps[::-1]
+        assert rest["next_token"] is None
+        assert "schedule" not in first["versions"][0] and first["versions"][0]["makespan"] == 4
+        assert db_manager.get_solution(problem_id, timestamps[1])["makespan"] == 1
+        assert db_manager.get_solution(problem_id, as_of="2026-01-03T18:00:00+00:00")["makespan"] == 2
+        assert db_manager.get_solution(problem_id, as_of="2026-01-01T00:00:00+00:00") is None
+        with pytest.raises(ValueError):
+            db_manager.list_versions(str(uuid.uuid4()), next_token=first["next_token"])
+        
+        assert db_manager.delete_solution(problem_id)
+        assert db_manager.list_versions(problem_id)["versions"] == []
+
+    def test_retention_sets_expiry_on_every_item(self, dynamodb_manager, monkeypatch):
+        """With a retention policy each version and its chunks should carry the TTL attribute."""
+        monkeypatch.setattr(storage, "RETENTION_DAYS", 30)
+        monkeypatch.setattr(database, "INLINE_PAYLOAD_LIMIT", 500)
+        problem_id = str(uuid.uuid4())
+        dynamodb_manager.save_solution(problem_id, _solution(2000))
+        
+        items = []
+        for partition in (problem_id, f"{problem_id}#chunks"):
+            items += dynamodb_manager.table.query(
+                KeyConditionExpression="problem_id = :pid",
+                ExpressionAttributeValues={":pid": partition}
+            )["Items"]
+        
+        assert len(items) > 1
+        assert len({item["expires_at"] for item in items}) == 1
+        assert int(items[0]["expires_at"]) > datetime.now().timestamp() + 29 * 86400
+        assert "expires_at" not in dynamodb_manager.get_solution(problem_id, fields=["summary"])
+
+    def test_expired_versions_are_not_read(self, dynamodb_manager, monkeypatch):
+        """Versions past their expiry should be hidden before TTL deletes them."""
+        monkeypatch.setattr(storage, "RETENTION_DAYS", -1)
+        problem_id = str(uuid.uuid4())
+        dynamodb_manager.save_solution(problem_id, _solution(5))
+        
+        assert dynamodb_manager.get_solution(problem_id) is None
+        assert dynamodb_manager.get_solution(problem_id, fields=["summary"]) is None
+        assert dynamodb_manager.list_versions(problem_id)["versions"] == []
+
+    def test_binary_payload_round_trips(self, dynamodb_manager):
+        """Full schedules should be stored in the binary format and read back unchanged."""
+        problem_id = str(uuid.uuid4())
+        solution_data = _solution(200)
+        
+        dynamodb_manager.save_solution(problem_id, solution_data)
+        raw = dynamodb_manager.table.get_item(Key={"problem_id": problem_id, "timestamp": solution_data["timestamp"]})["Item"]
+        retrieved = dynamodb_manager.get_solution(problem_id)
+        
+        assert "solution_bin" in raw and "schedule_json" not in raw
+        assert retrieved["schedule"] == solution_data["schedule"]
+        assert list(retrieved["schedule"]) == list(solution_data["schedule"])
+        assert retrieved["vessels"] == solution_data["vessels"]
+
+    def test_large_payload_is_chunked(self, dynamodb_manager, monkeypatch):
+        """Payloads over the inline limit should be split into chunk items and deleted with the solution."""
+        monkeypatch.setattr(database, "INLINE_PAYLOAD_LIMIT", 500)
+        problem_id = str(uuid.uuid4())
+        solution_data = _solution(2000)
+        
+        dynamodb_manager.save_solution(problem_id, solution_data)
+        retrieved = dynamodb_manager.get_solution(problem_id)
+        
+        assert retrieved["schedule"] == solution_data["schedule"]
+        assert retrieved["vessels"] == solution_data["vessels"]
+        
+        dynamodb_manager.delete_solution(problem_id)
+        chunks = dynamodb_manager.table.query(
+            KeyConditionExpression="problem_id = :pid",
+            ExpressionAttributeValues={":pid": f"{problem_id}#chunks"}
+        )
+        assert chunks["Items"] == []
+        assert dynamodb_manager.get_solution(problem_id) is None
+
+    def test_partial_reads_of_segmented_solution(self, dynamodb_manager, monkeypatch):
+        """Large solutions should be stored per berth and read back by berth, vessel or summary."""
+        monkeypatch.setattr(database, "INLINE_VESSEL_LIMIT", 100)
+        problem_id = str(uuid.uuid4())
+        solution_data = _solution(500)
+        schedule = solution_data["schedule"]
+        
+        dynamodb_manager.save_solution(problem_id, solution_data)
+        raw = dynamodb_manager.table.get_item(Key={"problem_id": problem_id, "timestamp": solution_data["timestamp"]})["Item"]
+        summary = dynamodb_manager.get_solution(problem_id, fields=["summary"])
+        berth = dynamodb_manager.get_solution(problem_id, berth=1)
+        vessel = dynamodb_manager.get_solution(problem_id, vessel="V00042")
+        full = dynamodb_manager.get_solution(problem_id)
+        
+        assert "solution_berths" in raw and "solution_bin" not in raw
+        assert summary["num_vessels"] == 500 and "schedule" not in summary
+        assert berth["schedule"] == {v: e for v, e in schedule.items() if e["berth"] == 1}
+        assert [v["vessel_id"] for v in berth["vessels"]] == [
+            v["vessel_id"] for v in solution_data["vessels"] if schedule[v["vessel_id"]]["berth"] == 1
+        ]
+        assert vessel["schedule"] == {"V00042": schedule["V00042"]}
+        assert vessel["vessels"] == [solution_data["vessels"][42]]
+        assert full["schedule"] == schedule and list(full["schedule"]) == list(schedule)
+        assert full["vessels"] == solution_data["vessels"]
+        assert "solution_berths" not in full and "vessel_buckets" not in full
+
+    def test_vessel_buckets_fit_the_item_limit(self, dynamodb_manager, monkeypatch):
+        """Lookup buckets of long vessel ids should be split until each item fits the inline limit."""
+        monkeypatch.setattr(database, "INLINE_VESSEL_LIMIT", 100)
+        monkeypatch.setattr(database, "INLINE_PAYLOAD_LIMIT", 20_000)
+        problem_id = str(uuid.uuid4())
+        solution_data = _solution(300, id_padding=500)
+        vessel_id = solution_data["vessels"][42]["vessel_id"]
+        
+        dynamodb_manager.save_solution(problem_id, solution_data)
+        parts = dynamodb_manager.table.query(
+            KeyConditionExpression="problem_id = :pid",
+            ExpressionAttributeValues={":pid": f"{problem_id}#chunks"}
+        )["Items"]
+        vessel = dynamodb_manager.get_solution(problem_id, vessel=vessel_id)
+        
+        assert any("#vessel#" in part["timestamp"] for part in parts)
+        assert all(len(database._binary(part["data"])) <= 20_000 for part in parts)
+        assert vessel["schedule"] == {vessel_id: solution_data["schedule"][vessel_id]}
+        assert dynamodb_manager.get_solution(problem_id)["vessels"] == solution_data["vessels"]
+
+    def test_unknown_fields_are_rejected(self, db_manager):
+        """get_solution should raise ValueError for unknown field names."""
+        with pytest.raises(ValueError):
+            db_manager.get_solution("any-id", fields=["everything"])
+
+    def test_reads_legacy_json_items(self, dynamodb_manager):
+        """Items written with schedule_json/vessels_json should decode as before."""
+        problem_id = str(uuid.uuid4())
+        dynamodb_manager.table.put_item(Item={
+            "problem_id": problem_id,
+            "timestamp": datetime.now().isoformat(),
+            "makespan": 5,
+            "solving_time": "0.1",
+            "num_vessels": 1,
+            "schedule_json": json.dumps({"V001": {"berth": 0, "start_time": 0, "end_time": 5}}),
+            "vessels_json": json.dumps([{"vessel_id": "V001", "arrival_time": 0, "processing_time": 5}])
+        })
+        
+        retrieved = dynamodb_manager.get_solution(problem_id)
+        
+        assert retrieved["schedule"]["V001"]["end_time"] == 5
+        assert retrieved["vessels"][0]["vessel_id"] == "V001"
+        assert "schedule_json" not in retrieved
+
+
+class _AsyncTable:
+    """Stand-in for an aioboto3 Table that awaits the calls of a boto3 Table."""
+
+    def __init__(self, table):
+        self.table = table
+
+    async def query(self, **kwargs):
+        return self.table.query(**kwargs)
+
+    async def get_item(self, **kwargs):
+        return self.table.get_item(**kwargs)
+
+    async def put_item(self, **kwargs):
+        return self.table.put_item(**kwargs)
+
+    def batch_writer(self):
+        return _AsyncBatchWriter(self.table)
+
+
+class _AsyncBatchWriter:
+    def __init__(self, table):
+        self.table = table
+        self.items = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        with self.table.batch_writer() as batch:
+            for item in self.items:
+                batch.put_item(Item=item)
+
+    async def put_item(self, Item):
+        self.items.append(Item)
+
+
+class _AsyncResource:
+    def __init__(self, table):
+        self.table = table
+        self.meta = types.SimpleNamespace(client=table.meta.client)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def Table(self, name):
+        return _AsyncTable(self.table)
+
+
+@pytest.mark.database
+class TestAsyncDynamoDBManager:
+    """Tests for the aioboto3 manager, on a stub of aioboto3 over the boto3 table."""
+
+    @pytest.fixture
+    def async_manager(self, dynamodb_manager, monkeypatch):
+        session = types.SimpleNamespace(resource=lambda *args, **kwargs: _AsyncResource(dynamodb_manager.table))
+        monkeypatch.setattr(async_database, "aioboto3", types.SimpleNamespace(Session=lambda: session))
+        manager = AsyncDynamoDBManager(dynamodb_manager)
+        asyncio.run(manager.open())
+        return manager
+
+    def test_reads_what_the_sync_manager_writes(self, async_manager, dynamodb_manager):
+        """Both managers should read and write the same items."""
+        solution_data = {**_solution(50), "problem_hash": str(uuid.uuid4())}
+        problem_id = str(uuid.uuid4())
+        
+        async def scenario():
+            assert await async_manager.save_solution(problem_id, solution_data)
+            return (await async_manager.get_solution(problem_id),
+                    await async_manager.get_solution(problem_id, fields=["summary"]),
+                    await async_manager.get_solution(problem_id, solution_data["timestamp"], berth=1,
+                                                     fields=["schedule"]),
+                    await async_manager.get_solution(problem_id, as_of="2000-01-01T00:00:00"),
+                    await async_manager.find_solution_by_hash(solution_data["problem_hash"]))
+        
+        full, summary, berth, before, by_hash = asyncio.run(scenario())
+        
+        assert full == dynamodb_manager.get_solution(problem_id)
+        assert full["schedule"] == solution_data["schedule"]
+        assert "schedule" not in summary and summary["num_vessels"] == 50
+        assert berth["schedule"] == {v: e for v, e in solution_data["schedule"].items() if e["berth"] == 1}
+        assert "vessels" not in berth
+        assert before is None
+        assert by_hash["problem_id"] == problem_id
+
+    def test_large_payloads_are_handled_off_the_event_loop(self, async_manager, monkeypatch):
+        """Segmented solutions and payloads above DECODE_INLINE_LIMIT should not be decoded on the loop."""
+        monkeypatch.setattr(database, "INLINE_VESSEL_LIMIT", 100)
+        monkeypatch.setattr(async_database, "INLINE_VESSEL_LIMIT", 100)
+        monkeypatch.setattr(async_database, "DECODE_INLINE_LIMIT", 400)
+        decoded_in = []
+        decode_payload = async_manager.manager.decode_payload
+        
+        def record_thread(*args):
+            decoded_in.append(threading.current_thread())
+            return decode_payload(*args)
+        
+        monkeypatch.setattr(async_manager.manager, "decode_payload", record_thread)
+        small, large, segmented = _solution(5), _solution(80), _solution(500)
+        
+        async def scenario():
+            results = []
+            for problem_id, solution_data in (("small", small), ("large", large), ("segmented", segmented)):
+                problem_id = f"{problem_id}-{uuid.uuid4()}"
+                assert await async_manager.save_solution(problem_id, solution_data)
+                results.append(await async_manager.get_solution(problem_id))
+            return results
+        
+        results = asyncio.run(scenario())
+        
+        assert [result["schedule"] for result in results] == [s["schedule"] for s in (small, large, segmented)]
+        assert decoded_in[0] is threading.main_thread()
+        assert decoded_in[1] is not threading.main_thread()
+        assert decoded_in[2] is not threading.main_thread()
+
+
+@pytest.mark.database
+class TestSQLiteStorage:
+    """Tests for the embedded SQLite backend."""
+
+    @pytest.fixture
+    def sqlite_manager(self, tmp_path):
+        manager = SQLiteManager(str(tmp_path / "solutions.db"))
+        manager.create_table()
+        return manager
+
+    def test_uses_wal_and_indexes(self, sqlite_manager):
+        """The database should be in WAL mode with indexes for listing and hash lookups."""
+        indexes = {row["name"] for row in sqlite_manager.connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        plan = " ".join(row["detail"] for row in sqlite_manager.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT problem_id FROM solutions ORDER BY timestamp DESC LIMIT 10"))
+        
+        assert sqlite_manager.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert {"solutions_by_timestamp", "solutions_by_hash"} <= indexes
+        assert "solutions_by_timestamp" in plan
+
+    def test_partial_reads_of_segmented_solution(self, sqlite_manager, monkeypatch):
+        """Large solutions should be stored per berth and read back by berth, vessel or summary."""
+        monkeypatch.setattr(sqlite_storage, "INLINE_VESSEL_LIMIT", 100)
+        solution_data = _solution(500)
+        schedule = solution_data["schedule"]
+        
+        sqlite_manager.save_solution("big", solution_data)
+        segments = sqlite_manager.connection.execute("SELECT COUNT(*) FROM solution_segments").fetchone()[0]
+        summary = sqlite_manager.get_solution("big", fields=["summary"])
+        berth = sqlite_manager.get_solution("big", berth=1)
+        vessel = sqlite_manager.get_solution("big", vessel="V00042")
+        full = sqlite_manager.get_solution("big")
+        
+        assert segments == 4
+        assert summary["num_vessels"] == 500 and "schedule" not in summary
+        assert berth["schedule"] == {v: e for v, e in schedule.items() if e["berth"] == 1}
+        assert vessel["schedule"] == {"V00042": schedule["V00042"]}
+        assert vessel["vessels"] == [solution_data["vessels"][42]]
+        assert full["schedule"] == schedule and list(full["schedule"]) == list(schedule)
+        assert full["vessels"] == solution_data["vessels"]
+        
+        sqlite_manager.delete_solution("big")
+        assert sqlite_manager.connection.execute("SELECT COUNT(*) FROM solution_segments").fetchone()[0] == 0
+
+    def test_expired_versions_are_purged(self, sqlite_manager, monkeypatch):
+        """Versions past their retention should be hidden, then deleted with their segments."""
+        monkeypatch.setattr(sqlite_storage, "INLINE_VESSEL_LIMIT", 100)
+        monkeypatch.setattr(storage, "RETENTION_DAYS", -1)
+        sqlite_manager.save_solution("old", _solution(500))
+        monkeypatch.setattr(storage, "RETENTION_DAYS", 1)
+        sqlite_manager.save_solution("new", _solution(5))
+        
+        # Expired versions are not read or listed even before they are purged
+        assert sqlite_manager.get_solution("old", fields=["summary"]) is None
+        assert sqlite_manager.list_versions("old")["versions"] == []
+        assert [s["problem_id"] for s in sqlite_manager.list_solutions(limit=10)] == ["new"]
+        assert sqlite_manager.purge_expired() == 1
+        assert sqlite_manager.get_solution("old") is None
+        assert sqlite_manager.get_solution("new") is not None
+        assert sqlite_manager.connection.execute("SELECT COUNT(*) FROM solution_segments").fetchone()[0] == 0
+
+    def test_concurrent_writers(self, sqlite_manager):
+        """Threads should save through their own connections without losing writes."""
+        def save(worker):
+            for index in range(20):
+                assert sqlite_manager.save_solution(f"p{worker}-{index}", _solution(5))
+        
+        threads = [threading.Thread(target=save, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(sqlite_manager.list_solutions(limit=100)) == 80
+
+
+@pytest.mark.database
+class TestStorageFormat:
+    """Tests for the binary solution encoding."""
+
+    def test_round_trip_is_smaller_than_json(self):
+        """Encoding should preserve schedule order and vessel order and beat JSON on size."""
+        solution_data = _solution(1000)
+        
+        blob = encode_solution(solution_data["schedule"], solution_data["vessels"])
+        schedule, vessels = decode_solution(blob)
+        
+        assert schedule == solution_data["schedule"]
+        assert list(schedule) == list(solution_data["schedule"])
+        assert vessels == solution_data["vessels"]
+        json_size = len(json.dumps(solution_data["schedule"])) + len(json.dumps(solution_data["vessels"]))
+        assert len(blob) * 5 < json_size
+
+    def test_unrepresentable_solutions_fall_back(self):
+        """Partial or inconsistent schedules should not be encoded."""
+        vessels = [{"vessel_id": "V001", "arrival_time": 0, "processing_time": 5}]
+        
+        assert encode_solution({"V001": {"berth": 1, "start_time": 0, "end_time": 5}}, vessels) is None
+        assert encode_solution({}, vessels) is None
+
+    def test_segments_join_back_to_the_solution(self):
+        """Berth segments should join to the full solution and buckets should hold their vessels."""
+        solution_data = _solution(1000)
+        
+        berths, buckets = encode_segments(solution_data["schedule"], solution_data["vessels"], vessels_per_bucket=100)
+        schedule, vessels = join_segments([decode_segment(segment) for segment in berths.values()])
+        bucket_ids = decode_segment(buckets[vessel_bucket("V00500", len(buckets))])[0]
+        
+        assert sorted(berths) == [0, 1, 2]
+        assert len(buckets) == 10
+        assert schedule == solution_data["schedule"] and list(schedule) == list(solution_data["schedule"])
+        assert vessels == solution_data["vessels"]
+        assert "V00500" in bucket_ids
+
+    def test_buckets_with_long_ids_fit_the_size_limit(self):
+        """Long ids should spread vessels over more buckets until each bucket fits."""
+        solution_data = _solution(500, id_padding=2000)
+        
+        berths, buckets = encode_segments(solution_data["schedule"], solution_data["vessels"],
+                                          vessels_per_bucket=250, max_bucket_bytes=50_000)
+        
+        assert len(buckets) > 2
+        assert all(len(bucket) <= 50_000 for bucket in buckets)
+        for vessel_id in solution_data["schedule"]:
+            assert vessel_id in decode_segment(buckets[vessel_bucket(vessel_id, len(buckets))])[0]
@@ -3,8 +3,28 @@ Integration tests for the solver algorithm.
 Tests the core scheduling logic with various problem configurations.
 """
 
+import itertools
+import random
+import time
+
+import numpy as np
 import pytest
-from solver import solve_berth_scheduling, BerthSchedulingProblem, VesselData
+from solver import (
+    solve_berth_scheduling,
+    solve_berth_scheduling_columnar,
+    schedule_from_columns,
+    BerthAvailability,
+    BerthData,
+    BerthSchedulingProblem,
+    VesselData,
+)
+from berth_model import BerthModel, BerthQueue, ClosureIndex
+from exact_solver import lower_bound, makespan_lower_bound, solve_berth_scheduling_exact
+from local_search import improve_schedule
+from repair import repair_schedule
+from rolling import solve_rolling, split_independent, join_results
+import portfolio
+from portfolio import greedy_schedule, solve_portfolio
 
 
 @pytest.mark.solver
@@ -165,3 +185,780 @@ class TestSolverLogic:
         for vessel_id, assignment in result["schedule"].items():
             vessel = next(v for v in vessels if v.vessel_id == vessel_id)
             assert assignment["start_time"] == vessel.arrival_time
+
+
+def _linear_scan_schedule(problem):
+    """Reference FCFS schedule using the original O(B) berth scan."""
+    schedule = {}
+    berth_availability = {b: 0 for b in range(problem.num_berths)}
+    for vessel in sorted(problem.vessels, key=lambda v: v.arrival_time):
+        berth = min(berth_availability, key=berth_availability.get)
+        start = max(vessel.arrival_time, berth_availability[berth])
+        schedule[vessel.vessel_id] = (berth, start, start + vessel.processing_time)
+        berth_availability[berth] = start + vessel.processing_time
+    return schedule
+
+
+@pytest.mark.solver
+class TestBerthAvailability:
+    """Tests for the heap-based berth selection."""
+
+    def test_ties_resolved_by_lowest_berth_index(self):
+        """Berths freeing up at the same time should be used in index order."""
+        engine = BerthAvailability(3)
+
+        assert engine.earliest() == (0, 0)
+        engine.assign(5)
+        assert engine.earliest() == (0, 1)
+        engine.assign(5)
+        assert engine.earliest() == (0, 2)
+        engine.assign(5)
+        assert engine.earliest() == (5, 0)
+
+    def test_rejects_zero_berths(self):
+        """An engine without berths cannot schedule anything."""
+        with pytest.raises(ValueError):
+            BerthAvailability(0)
+
+    @pytest.mark.parametrize("num_berths", [1, 2, 7, 50])
+    def test_matches_linear_scan(self, num_berths):
+        """Heap selection should reproduce the linear-scan schedule exactly."""
+        rng = random.Random(num_berths)
+        vessels = [
+            VesselData(
+                vessel_id=f"V{i:04d}",
+                arrival_time=rng.randint(0, 200),
+                processing_time=rng.randint(1, 12),
+            )
+            for i in range(500)
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=10**6, num_berths=num_berths)
+
+        result = solve_berth_scheduling(problem)
+
+        expected = _linear_scan_schedule(problem)
+        actual = {
+            vessel_id: (a["berth"], a["start_time"], a["end_time"])
+            for vessel_id, a in result["schedule"].items()
+        }
+        assert actual == expected
+
+
+@pytest.mark.solver
+class TestColumnarSolver:
+    """Tests for the NumPy column-array solver path."""
+
+    def test_matches_object_solver(self, large_problem):
+        """Columnar results should convert to the exact same schedule dict."""
+        vessels = [VesselData(**v) for v in large_problem["vessels"]]
+        problem = BerthSchedulingProblem(
+            vessels=vessels,
+            planning_horizon=large_problem["planning_horizon"],
+            num_berths=large_problem["num_berths"]
+        )
+        vessel_ids = [v.vessel_id for v in vessels]
+        arrival_times = np.array([v.arrival_time for v in vessels])
+        processing_times = np.array([v.processing_time for v in vessels])
+
+        expected = solve_berth_scheduling(problem)
+        result = solve_berth_scheduling_columnar(
+            arrival_times, processing_times,
+            num_berths=problem.num_berths, planning_horizon=problem.planning_horizon
+        )
+        schedule = schedule_from_columns(vessel_ids, arrival_times, processing_times, result)
+
+        assert schedule == expected["schedule"]
+        assert list(schedule) == list(expected["schedule"])
+        assert result["makespan"] == expected["makespan"]
+
+    def test_returns_arrays_in_input_order(self):
+        """Start/end/berth arrays should be indexed like the input arrays."""
+        result = solve_berth_scheduling_columnar(
+            np.array([10, 0, 0]), np.array([2, 5, 3]), num_berths=2
+        )
+
+        assert result["order"].tolist() == [1, 2, 0]
+        assert result["berth"].tolist() == [1, 0, 1]
+        assert result["start_time"].tolist() == [10, 0, 0]
+        assert result["end_time"].tolist() == [12, 5, 3]
+        assert result["makespan"] == 12
+
+    def test_empty_input(self):
+        """No vessels should give an empty schedule and zero makespan."""
+        result = solve_berth_scheduling_columnar(np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+
+        assert result["makespan"] == 0
+        assert schedule_from_columns([], np.array([]), np.array([]), result) == {}
+
+    def test_planning_horizon_violation_names_vessel(self):
+        """Horizon errors should identify the vessel like the object solver."""
+        with pytest.raises(ValueError, match="V2"):
+            solve_berth_scheduling_columnar(
+                np.array([0, 0]), np.array([10, 5]),
+                num_berths=1, planning_horizon=8, vessel_ids=["V1", "V2"]
+            )
+
+
+def _brute_force_makespan(problem):
+    """Optimal makespan by enumerating every berth assignment."""
+    vessels = sorted(problem.vessels, key=lambda v: v.arrival_time)
+    best = None
+    for assignment in itertools.product(range(problem.num_berths), repeat=len(vessels)):
+        availability = [0] * problem.num_berths
+        for vessel, berth in zip(vessels, assignment):
+            start = max(vessel.arrival_time, availability[berth])
+            if start >= problem.planning_horizon:
+                break
+            availability[berth] = start + vessel.processing_time
+        else:
+            if best is None or max(availability) < best:
+                best = max(availability)
+    return best
+
+
+@pytest.mark.solver
+class TestExactSolver:
+    """Tests for the branch-and-bound solver."""
+
+    def test_finds_optimal_makespan(self):
+        """Should match exhaustive enumeration on small instances."""
+        rng = random.Random(7)
+        for _ in range(50):
+            vessels = [
+                VesselData(vessel_id=f"V{i}", arrival_time=rng.randint(0, 10), processing_time=rng.randint(1, 9))
+                for i in range(rng.randint(1, 7))
+            ]
+            problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=72, num_berths=rng.randint(1, 3))
+
+            result = solve_berth_scheduling_exact(problem, time_limit=5)
+
+            assert result["status"] == "optimal"
+            assert result["optimality_gap"] == 0.0
+            assert result["makespan"] == _brute_force_makespan(problem)
+
+    def test_improves_on_heuristic(self):
+        """FCFS puts the long vessel first; the optimum keeps it off the shared berth."""
+        vessels = [
+            VesselData(vessel_id="V1", arrival_time=0, processing_time=2),
+            VesselData(vessel_id="V2", arrival_time=0, processing_time=2),
+            VesselData(vessel_id="V3", arrival_time=1, processing_time=10),
+            VesselData(vessel_id="V4", arrival_time=1, processing_time=2),
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=72, num_berths=2)
+
+        heuristic = solve_berth_scheduling(problem)
+        result = solve_berth_scheduling_exact(problem, warm_start=heuristic)
+
+        assert heuristic["makespan"] == 12
+        assert result["makespan"] == 11
+        assert result["lower_bound"] == 11
+
+    def test_lower_bound_on_columns_and_problems(self):
+        """The array bound should match the problem bound, including berths that become free later."""
+        arrival_times = np.array([4, 6, 9], dtype=np.int64)
+        processing_times = np.array([5, 3, 2], dtype=np.int64)
+        vessels = [
+            VesselData(vessel_id=f"V{i}", arrival_time=int(a), processing_time=int(p))
+            for i, (a, p) in enumerate(zip(arrival_times, processing_times))
+        ]
+
+        assert lower_bound(arrival_times, processing_times, 2) == 11
+        assert lower_bound(arrival_times, processing_times, 2, [0, 12]) == 13
+        assert lower_bound(arrival_times, processing_times, 2, [10, 10]) == 15
+        assert lower_bound(arrival_times[:0], processing_times[:0], 2) == 0
+        for available in (None, [0, 12], [10, 10]):
+            problem = BerthSchedulingProblem(vessels=vessels, num_berths=2, berth_available=available)
+            assert makespan_lower_bound(problem) == lower_bound(arrival_times, processing_times, 2, available)
+
+    def test_schedule_is_feasible(self, large_problem):
+        """Returned schedule should respect arrivals, horizon and berth capacity."""
+        vessels = [VesselData(**v) for v in large_problem["vessels"]]
+        problem = BerthSchedulingProblem(
+            vessels=vessels,
+            planning_horizon=large_problem["planning_horizon"],
+            num_berths=large_problem["num_berths"]
+        )
+
+        result = solve_berth_scheduling_exact(problem, time_limit=1)
+
+        assert len(result["schedule"]) == len(vessels)
+        by_berth = {}
+        for vessel in vessels:
+            assignment = result["schedule"][vessel.vessel_id]
+            assert assignment["start_time"] >= vessel.arrival_time
+            assert assignment["start_time"] < problem.planning_horizon
+            assert assignment["end_time"] == assignment["start_time"] + vessel.processing_time
+            by_berth.setdefault(assignment["berth"], []).append(assignment)
+        for assignments in by_berth.values():
+            assignments.sort(key=lambda a: a["start_time"])
+            for current, following in zip(assignments, assignments[1:]):
+                assert current["end_time"] <= following["start_time"]
+        assert result["lower_bound"] <= result["makespan"]
+
+    def test_time_limit_returns_warm_start_and_gap(self):
+        """With no time to search, the warm start is returned with its gap."""
+        rng = random.Random(3)
+        vessels = [
+            VesselData(vessel_id=f"V{i}", arrival_time=rng.randint(0, 500), processing_time=rng.randint(1, 40))
+            for i in range(400)
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=10**6, num_berths=5)
+        heuristic = solve_berth_scheduling(problem)
+
+        result = solve_berth_scheduling_exact(problem, time_limit=0, warm_start=heuristic)
+
+        assert result["makespan"] <= heuristic["makespan"]
+        assert 0.0 <= result["optimality_gap"] < 1.0
+        if result["status"] == "time_limit":
+            assert result["lower_bound"] < result["makespan"]
+
+    def test_infeasible_horizon(self):
+        """Should raise when no assignment fits the planning horizon."""
+        vessels = [
+            VesselData(vessel_id="V1", arrival_time=0, processing_time=10),
+            VesselData(vessel_id="V2", arrival_time=0, processing_time=10),
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=5, num_berths=1)
+
+        with pytest.raises(ValueError):
+            solve_berth_scheduling_exact(problem)
+
+    def test_horizon_cut_is_not_reported_as_optimal(self):
+        """When the horizon needs a berth served out of arrival order, nothing is claimed optimal or infeasible."""
+        # Only B before A fits: A then B would start B at 10
+        out_of_order = BerthSchedulingProblem(
+            vessels=[
+                VesselData(vessel_id="A", arrival_time=0, processing_time=10),
+                VesselData(vessel_id="B", arrival_time=1, processing_time=1),
+            ],
+            planning_horizon=5,
+            num_berths=1
+        )
+        # Makespan 9 needs V3 before V1 on one berth; in arrival order the best is 11
+        vessels = [
+            VesselData(vessel_id="V0", arrival_time=4, processing_time=1),
+            VesselData(vessel_id="V1", arrival_time=3, processing_time=6),
+            VesselData(vessel_id="V2", arrival_time=3, processing_time=1),
+            VesselData(vessel_id="V3", arrival_time=2, processing_time=3),
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=6, num_berths=2)
+
+        with pytest.raises(ValueError, match="arrival order"):
+            solve_berth_scheduling_exact(out_of_order)
+        result = solve_berth_scheduling_exact(problem)
+
+        assert result["makespan"] == 11
+        assert result["status"] == "horizon_limited"
+        assert result["lower_bound"] <= 9
+        assert result["optimality_gap"] > 0
+
+    def test_callback_can_stop_search(self):
+        """Returning False from the progress callback should stop the search."""
+        rng = random.Random(3)
+        vessels = [
+            VesselData(vessel_id=f"V{i}", arrival_time=rng.randint(0, 500), processing_time=rng.randint(1, 40))
+            for i in range(400)
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=10**6, num_berths=5)
+        updates = []
+
+        def callback(update):
+            updates.append(update)
+            return False
+
+        result = solve_berth_scheduling_exact(problem, time_limit=30, callback=callback)
+
+        assert result["solving_time"] < 5
+        if result["status"] != "optimal":
+            assert result["status"] == "stopped"
+            assert updates and updates[0]["makespan"] >= updates[0]["lower_bound"]
+
+
+@pytest.mark.solver
+class TestLocalSearch:
+    """Tests for the local-search improver."""
+
+    def test_improves_fcfs_schedule(self):
+        """Should find the schedule FCFS misses by moving vessels between berths."""
+        vessels = [
+            VesselData(vessel_id="V1", arrival_time=0, processing_time=2),
+            VesselData(vessel_id="V2", arrival_time=0, processing_time=2),
+            VesselData(vessel_id="V3", arrival_time=1, processing_time=10),
+            VesselData(vessel_id="V4", arrival_time=1, processing_time=2),
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=72, num_berths=2)
+        initial = solve_berth_scheduling(problem)
+
+        result = improve_schedule(problem, initial, time_limit=1)
+
+        assert initial["makespan"] == 12
+        assert result["makespan"] == 11
+        assert max(a["end_time"] for a in result["schedule"].values()) == 11
+
+    def test_never_worse_and_feasible(self):
+        """Result should be feasible and no worse than the starting schedule."""
+        rng = random.Random(11)
+        vessels = [
+            VesselData(vessel_id=f"V{i:03d}", arrival_time=rng.randint(0, 100), processing_time=rng.randint(1, 15))
+            for i in range(200)
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=10**6, num_berths=4)
+        initial = solve_berth_scheduling(problem)
+
+        result = improve_schedule(problem, initial, time_limit=0.5, seed=1)
+
+        assert result["makespan"] <= initial["makespan"]
+        assert result["lower_bound"] <= result["makespan"]
+        assert list(result["schedule"]) == list(initial["schedule"])
+        by_berth = {}
+        for vessel in vessels:
+            assignment = result["schedule"][vessel.vessel_id]
+            assert assignment["start_time"] >= vessel.arrival_time
+            assert assignment["end_time"] == assignment["start_time"] + vessel.processing_time
+            by_berth.setdefault(assignment["berth"], []).append(assignment)
+        for assignments in by_berth.values():
+            assignments.sort(key=lambda a: a["start_time"])
+            for current, following in zip(assignments, assignments[1:]):
+                assert current["end_time"] <= following["start_time"]
+
+    def test_stops_at_deadline(self):
+        """Should return within the time limit plus a small margin."""
+        rng = random.Random(5)
+        vessels = [
+            VesselData(vessel_id=f"V{i:04d}", arrival_time=rng.randint(0, 2000), processing_time=rng.randint(1, 40))
+            for i in range(3000)
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=10**6, num_berths=10)
+        initial = solve_berth_scheduling(problem)
+
+        result = improve_schedule(problem, initial, time_limit=0.3)
+
+        assert result["solving_time"] < 1.5
+        assert result["makespan"] <= initial["makespan"]
+
+    def test_callback_can_stop_search(self):
+        """Returning False from the progress callback should stop the search early."""
+        rng = random.Random(5)
+        vessels = [
+            VesselData(vessel_id=f"V{i:04d}", arrival_time=rng.randint(0, 2000), processing_time=rng.randint(1, 40))
+            for i in range(3000)
+        ]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=10**6, num_berths=10)
+        initial = solve_berth_scheduling(problem)
+
+        result = improve_schedule(problem, initial, time_limit=30, callback=lambda update: False)
+
+        assert result["solving_time"] < 5
+        assert result["makespan"] <= initial["makespan"]
+
+
+def _saved(vessels, num_berths):
+    """Heuristic schedule and vessel dicts, as read back from the database."""
+    problem = BerthSchedulingProblem(vessels=[VesselData(**v) for v in vessels], planning_horizon=1000,
+                                     num_berths=num_berths)
+    return solve_berth_scheduling(problem)["schedule"], vessels
+
+
+@pytest.mark.solver
+class TestRepairSchedule:
+    """Tests for incremental repair of saved schedules."""
+
+    def test_delay_repairs_only_the_touched_berth(self, sample_problem):
+        """A delayed vessel should only move its own berth's suffix; started vessels stay put."""
+        schedule, vessels = _saved(sample_problem["vessels"], 2)
+        
+        result = repair_schedule(schedule, vessels, 2, 72, current_time=4,
+                                 updates=[{"vessel_id": "V003", "arrival_time": 11}],
+                                 added=[{"vessel_id": "V005", "arrival_time": 12, "processing_time": 3}])
+        
+        assert result["repaired_berths"] == [0]
+        for vessel_id in ("V001", "V002", "V004"):
+            assert result["schedule"][vessel_id] == schedule[vessel_id]
+        assert result["schedule"]["V003"]["start_time"] == 11
+        assert result["schedule"]["V005"] == {"berth": 0, "start_time": 15, "end_time": 18,
+                                               "arrival_time": 12, "processing_time": 3}
+        assert result["diff"]["changed"] == {
+            "V003": {"before": {"berth": 0, "start_time": 8, "end_time": 12},
+                     "after": {"berth": 0, "start_time": 11, "end_time": 15}}
+        }
+        assert result["diff"]["added"] == ["V005"]
+        assert result["diff"]["makespan"] == {"before": 16, "after": 18}
+        assert result["vessels"][2] == {"vessel_id": "V003", "arrival_time": 11, "processing_time": 4}
+        assert result["vessels"][-1]["vessel_id"] == "V005"
+
+    def test_removal_and_longer_stay_shift_the_suffix(self):
+        """Removing a vessel pulls its successors forward; a longer stay of a started vessel pushes them back."""
+        schedule, vessels = _saved([
+            {"vessel_id": "A", "arrival_time": 0, "processing_time": 5},
+            {"vessel_id": "B", "arrival_time": 1, "processing_time": 5},
+            {"vessel_id": "C", "arrival_time": 2, "processing_time": 5},
+        ], 1)
+        
+        removed = repair_schedule(schedule, vessels, 1, 100, current_time=1, removed=["B"])
+        longer = repair_schedule(schedule, vessels, 1, 100, current_time=1,
+                                 updates=[{"vessel_id": "A", "processing_time": 7}])
+        
+        assert "B" not in removed["schedule"]
+        assert [v["vessel_id"] for v in removed["vessels"]] == ["A", "C"]
+        assert removed["schedule"]["C"]["start_time"] == 5
+        assert removed["makespan"] == 10
+        assert [longer["schedule"][v]["start_time"] for v in "ABC"] == [0, 7, 12]
+        assert longer["makespan"] == 17
+
+    def test_rejects_invalid_changes(self, sample_problem):
+        """Changes to started, unknown or duplicate vessels and horizon overruns should raise ValueError."""
+        schedule, vessels = _saved(sample_problem["vessels"], 2)
+        
+        for changes in ({"removed": ["V001"]},
+                        {"updates": [{"vessel_id": "V002", "arrival_time": 1}]},
+                        {"updates": [{"vessel_id": "V999", "arrival_time": 1}]},
+                        {"added": [{"vessel_id": "V004", "arrival_time": 1, "processing_time": 1}]},
+                        {"updates": [{"vessel_id": "V004", "arrival_time": 80}]}):
+            with pytest.raises(ValueError):
+                repair_schedule(schedule, vessels, 2, 72, current_time=4, **changes)
+
+
+def _month_of_arrivals(n=600, num_berths=3, seed=3):
+    """Vessel columns spread over about a month, with a few idle gaps."""
+    rng = np.random.default_rng(seed)
+    arrival_times = np.sort(rng.integers(0, 720, n))
+    arrival_times[n // 2:] += 100
+    processing_times = rng.integers(1, 8, n)
+    return [f"V{i:04d}" for i in range(n)], arrival_times, processing_times
+
+
+@pytest.mark.solver
+class TestRollingHorizon:
+    """Tests for rolling-horizon solving."""
+
+    def test_heuristic_windows_match_one_pass(self):
+        """FCFS window by window should give the same schedule as FCFS over the whole horizon."""
+        vessel_ids, arrival_times, processing_times = _month_of_arrivals()
+        whole = solve_berth_scheduling_columnar(arrival_times, processing_times, num_berths=3, planning_horizon=1000)
+
+        result = solve_rolling(vessel_ids, arrival_times, processing_times, 3, 1000, window=48)
+
+        assert result["windows"] > 10
+        assert result["schedule"] == schedule_from_columns(vessel_ids, arrival_times, processing_times, whole)
+        assert result["makespan"] == whole["makespan"]
+
+    @pytest.mark.parametrize("solver", ["local_search", "exact"])
+    def test_windows_stitch_into_a_feasible_schedule(self, solver):
+        """Committed windows should never overlap on a berth or break the horizon."""
+        vessel_ids, arrival_times, processing_times = _month_of_arrivals()
+
+        result = solve_rolling(vessel_ids, arrival_times, processing_times, 3, 1000, window=24, overlap=8,
+                               solver=solver, time_limit=1)
+
+        assert list(result["schedule"]) == sorted(vessel_ids, key=lambda v: arrival_times[vessel_ids.index(v)])
+        assert result["lower_bound"] <= result["makespan"]
+        by_berth = {}
+        for vessel_id, arrival, processing in zip(vessel_ids, arrival_times.tolist(), processing_times.tolist()):
+            assignment = result["schedule"][vessel_id]
+            assert arrival <= assignment["start_time"] < 1000
+            assert assignment["end_time"] == assignment["start_time"] + processing
+            by_berth.setdefault(assignment["berth"], []).append(assignment)
+        for assignments in by_berth.values():
+            assignments.sort(key=lambda a: a["start_time"])
+            for current, following in zip(assignments, assignments[1:]):
+                assert current["end_time"] <= following["start_time"]
+        assert result["makespan"] == max(a["end_time"] for a in result["schedule"].values())
+
+    def test_independent_parts_join_back(self):
+        """Parts split at idle moments should join into the one-piece start times."""
+        vessel_ids, arrival_times, processing_times = _month_of_arrivals()
+        parts = split_independent(arrival_times, processing_times, 3, 4)
+        results = [
+            solve_rolling([vessel_ids[i] for i in part], arrival_times[part], processing_times[part], 3, 1000,
+                          window=48)
+            for part in parts
+        ]
+
+        joined = join_results(results, [int(arrival_times[part[0]]) for part in parts])
+        whole = solve_rolling(vessel_ids, arrival_times, processing_times, 3, 1000, window=48)
+
+        assert len(parts) > 1
+        assert sorted(np.concatenate(parts).tolist()) == list(range(len(vessel_ids)))
+        assert joined["makespan"] == whole["makespan"]
+        assert ({v: a["start_time"] for v, a in joined["schedule"].items()}
+                == {v: a["start_time"] for v, a in whole["schedule"].items()})
+        assert join_results(results, [0] * len(parts)) is None
+
+    def test_berths_busy_at_the_start(self):
+        """Solvers should not use a berth before it becomes free."""
+        vessels = [VesselData(vessel_id=f"V{i}", arrival_time=0, processing_time=3) for i in range(3)]
+        problem = BerthSchedulingProblem(vessels=vessels, planning_horizon=72, num_berths=2, berth_available=[0, 5])
+        heuristic = solve_berth_scheduling(problem)
+
+        exact = solve_berth_scheduling_exact(problem, time_limit=5)
+        improved = improve_schedule(problem, heuristic, time_limit=0.2)
+
+        assert heuristic["makespan"] == 8
+        assert exact["makespan"] == 8
+        for result in (heuristic, exact, improved):
+            assert all(a["start_time"] >= 5 for a in result["schedule"].values() if a["berth"] == 1)
+
+    def test_rejects_invalid_window(self):
+        """A window below one hour or an overlap as long as the window should raise ValueError."""
+        vessel_ids, arrival_times, processing_times = _month_of_arrivals(n=10)
+
+        for window, overlap in ((0, None), (24, 24), (24, -1)):
+            with pytest.raises(ValueError):
+                solve_rolling(vessel_ids, arrival_times, processing_times, 3, 1000, window=window, overlap=overlap)
+
+
+@pytest.mark.solver
+class TestPortfolio:
+    """Tests for portfolio solving."""
+
+    def test_fcfs_rule_matches_heuristic(self, large_problem):
+        """Dispatching by arrival should reproduce the heuristic's schedule."""
+        vessels = large_problem["vessels"]
+        arrival_times = np.array([v["arrival_time"] for v in vessels])
+        processing_times = np.array([v["processing_time"] for v in vessels])
+        heuristic = solve_berth_scheduling_columnar(arrival_times, processing_times, num_berths=3,
+                                                    planning_horizon=1000)
+
+        greedy = greedy_schedule(arrival_times, processing_times, 3, 1000, "fcfs")
+
+        assert greedy["berth"].tolist() == heuristic["berth"].tolist()
+        assert greedy["start_time"].tolist() == heuristic["start_time"].tolist()
+
+    def test_rules_order_waiting_vessels(self):
+        """SPT and LPT should pick the shortest / longest waiting vessel when the berth frees up."""
+        arrival_times = np.array([0, 1, 1, 1])
+        processing_times = np.array([4, 5, 1, 3])
+
+        spt = greedy_schedule(arrival_times, processing_times, 1, 100, "spt")
+        lpt = greedy_schedule(arrival_times, processing_times, 1, 100, "lpt")
+
+        assert spt["start_time"].tolist() == [0, 8, 4, 5]
+        assert lpt["start_time"].tolist() == [0, 4, 12, 9]
+
+    def test_reports_every_strategy_and_the_winner(self):
+        """The best strategy should win and every strategy should be reported with its time."""
+        vessels = [
+            VesselData(vessel_id="V1", arrival_time=0, processing_time=2),
+            VesselData(vessel_id="V2", arrival_time=0, processing_time=2),
+            VesselData(vessel_id="V3", arrival_time=1, processing_time=10),
+            VesselData(vessel_id="V4", arrival_time=1, processing_time=2),
+        ]
+        vessel_ids = [v.vessel_id for v in vessels]
+        arrival_times = np.array([v.arrival_time for v in vessels])
+        processing_times = np.array([v.processing_time for v in vessels])
+
+        result = solve_portfolio(vessel_ids, arrival_times, processing_times, 2, 72, time_limit=0.4)
+
+        report = result["portfolio"]
+        assert result["makespan"] == 11
+        assert [entry["strategy"] for entry in report["strategies"]][:3] == ["fcfs", "spt", "lpt"]
+        assert all("solving_time" in entry for entry in report["strategies"])
+        winner = report["winner"]
+        assert {"strategy": winner["strategy"], "seed": winner["seed"], "makespan": 11} in [
+            {key: entry[key] for key in ("strategy", "seed", "makespan")} for entry in report["strategies"]
+        ]
+        assert min(entry["makespan"] for entry in report["strategies"]) == 11
+        assert result["lower_bound"] <= 11
+
+    def test_untimed_strategies_count_against_the_time_limit(self, monkeypatch):
+        """Slow single-pass strategies should not push the portfolio past its time limit."""
+        greedy = portfolio.greedy_schedule
+
+        def slow_greedy(*args, **kwargs):
+            if args[4] != "random_greedy":
+                time.sleep(0.2)
+            return greedy(*args, **kwargs)
+
+        monkeypatch.setattr(portfolio, "greedy_schedule", slow_greedy)
+        rng = random.Random(7)
+        arrival_times = np.array([rng.randint(0, 500) for _ in range(200)])
+        processing_times = np.array([rng.randint(1, 40) for _ in range(200)])
+
+        result = solve_portfolio([f"V{i}" for i in range(200)], arrival_times, processing_times, 4, 10**6,
+                                 time_limit=1.0)
+
+        assert result["solving_time"] < 1.0 + 0.3
+        assert len(result["schedule"]) == 200
+
+    def test_callback_can_stop_portfolio(self):
+        """Returning False from the progress callback should skip the remaining strategies."""
+        rng = random.Random(5)
+        arrival_times = np.array([rng.randint(0, 2000) for _ in range(2000)])
+        processing_times = np.array([rng.randint(1, 40) for _ in range(2000)])
+        vessel_ids = [f"V{i:04d}" for i in range(2000)]
+        updates = []
+
+        def callback(update):
+            updates.append(update)
+            return False
+
+        result = solve_portfolio(vessel_ids, arrival_times, processing_times, 10, 10**6, time_limit=30,
+                                 callback=callback)
+
+        assert result["solving_time"] < 5
+        assert len(result["schedule"]) == 2000
+        assert [entry["strategy"] for entry in result["portfolio"]["strategies"]] == ["fcfs"]
+        assert updates[0]["makespan"] == result["makespan"]
+        assert updates[0]["lower_bound"] == result["lower_bound"]
+
+    def test_infeasible_strategies_are_reported(self):
+        """A strategy that breaks the horizon should be reported as an error, not fail the portfolio."""
+        vessel_ids = ["A", "B", "C"]
+        arrival_times = np.array([0, 0, 0])
+        processing_times = np.array([1, 8, 1])
+
+        result = solve_portfolio(vessel_ids, arrival_times, processing_times, 1, 9, time_limit=0.2)
+
+        errors = [entry for entry in result["portfolio"]["strategies"] if "error" in entry]
+        assert result["makespan"] == 10
+        assert any(entry["strategy"] == "lpt" for entry in errors)
+        with pytest.raises(ValueError):
+            solve_portfolio(vessel_ids, arrival_times, processing_times, 1, 2, time_limit=0.2)
+
+
+def _assert_respects_berths(problem, result):
+    """Every vessel fits its berth, avoids its closures and no two vessels overlap."""
+    by_berth = {}
+    for vessel in problem.vessels:
+        entry = result["schedule"][vessel.vessel_id]
+        berth = problem.berths[entry["berth"]]
+        assert entry["start_time"] >= vessel.arrival_time
+        if vessel.length is not None and berth.max_length is not None:
+            assert vessel.length <= berth.max_length
+        if vessel.draft is not None and berth.max_draft is not None:
+            assert vessel.draft <= berth.max_draft
+        for start, end in berth.closures:
+            assert entry["end_time"] <= start or entry["start_time"] >= end
+        by_berth.setdefault(entry["berth"], []).append((entry["start_time"], entry["end_time"]))
+    for intervals in by_berth.values():
+        intervals.sort()
+        assert all(a[1] <= b[0] for a, b in zip(intervals, intervals[1:]))
+
+
+@pytest.mark.solver
+class TestBerthModel:
+    """Tests for berth limits, vessel sizes and berth closures."""
+
+    def _random_problem(self, rng, num_vessels, num_berths):
+        berths = [
+            BerthData(max_length=rng.choice([None, 200, 300]), max_draft=rng.choice([None, 10.0, 14.0]),
+                      closures=[(start, start + rng.randint(1, 6))
+                                for start in rng.sample(range(num_vessels * 2), rng.randint(0, 2))])
+            for _ in range(num_berths)
+        ]
+        berths[0].max_length = berths[0].max_draft = None
+        vessels = [
+            VesselData(vessel_id=f"V{i}", arrival_time=rng.randint(0, num_vessels * 2),
+                       processing_time=rng.randint(1, 6), length=rng.choice([None, 150, 250, 350]),
+                       draft=rng.choice([None, 8.0, 12.0, 15.0]))
+            for i in range(num_vessels)
+        ]
+        return BerthSchedulingProblem(vessels=vessels, planning_horizon=1000, num_berths=num_berths, berths=berths)
+
+    def test_closure_index_skips_closures(self):
+        """The earliest start should step over every closure the stay would overlap."""
+        closures = ClosureIndex([(10, 12), (5, 8), (13, 15), (7, 9)])
+
+        assert closures.starts == [5, 10, 13] and closures.ends == [9, 12, 15]
+        assert closures.earliest_start(0, 5) == 0
+        assert closures.earliest_start(0, 6) == 15
+        assert closures.earliest_start(9, 1) == 9
+        assert closures.earliest_start(9, 2) == 15
+        assert closures.earliest_start(12, 1) == 12
+        assert closures.earliest_start(20, 100) == 20
+
+    def test_compatibility_bitsets(self):
+        """Each vessel's bitset should hold exactly the berths long and deep enough for it."""
+        berths = [BerthData(max_length=200, max_draft=10.0), BerthData(max_length=400),
+                  BerthData(max_draft=16.0)]
+
+        model = BerthModel(berths, [150, 350, None, 500], [9.0, 12.0, 17.0, float("nan")])
+
+        assert model.masks == [0b111, 0b110, 0b010, 0b100]
+        with pytest.raises(ValueError, match="Vessel Big fits no berth"):
+            BerthModel(berths, [500], [17.0], ["Big"])
+
+    def test_queue_matches_berth_availability_without_limits(self, large_problem):
+        """With identical open berths the queue should pick the same berths as the plain heuristic."""
+        vessels = sorted(large_problem["vessels"], key=lambda v: v["arrival_time"])
+        queue = BerthQueue(BerthModel([BerthData()] * 3, [None] * len(vessels)))
+        availability = BerthAvailability(3)
+
+        for index, vessel in enumerate(vessels):
+            available_time, berth = availability.earliest()
+            start = max(vessel["arrival_time"], available_time)
+            availability.assign(start + vessel["processing_time"])
+            assert queue.place(index, vessel["arrival_time"], vessel["processing_time"]) == (berth, start)
+
+    def test_heuristic_respects_limits_and_closures(self):
+        """Vessels should only use berths they fit and wait for closures to end."""
+        problem = BerthSchedulingProblem(
+            vessels=[
+                VesselData(vessel_id="Big", arrival_time=0, processing_time=4, length=350),
+                VesselData(vessel_id="Deep", arrival_time=0, processing_time=3, draft=14.0),
+                VesselData(vessel_id="Small", arrival_time=1, processing_time=2),
+            ],
+            planning_horizon=72,
+            num_berths=2,
+            berths=[BerthData(max_length=400, max_draft=12.0, closures=[(2, 5)]), BerthData(max_length=250)]
+        )
+
+        result = solve_berth_scheduling(problem)
+
+        schedule = result["schedule"]
+        assert (schedule["Big"]["berth"], schedule["Big"]["start_time"]) == (0, 5)
+        assert (schedule["Deep"]["berth"], schedule["Deep"]["start_time"]) == (1, 0)
+        assert (schedule["Small"]["berth"], schedule["Small"]["start_time"]) == (1, 3)
+        assert result["makespan"] == 9
+
+    def test_columnar_matches_object_heuristic(self):
+        """The columnar heuristic should produce the same constrained schedule."""
+        rng = random.Random(7)
+        for _ in range(20):
+            problem = self._random_problem(rng, 30, 4)
+            expected = solve_berth_scheduling(problem)
+            vessel_ids = [v.vessel_id for v in problem.vessels]
+            arrival_times = np.array([v.arrival_time for v in problem.vessels])
+            processing_times = np.array([v.processing_time for v in problem.vessels])
+            lengths = np.array([np.nan if v.length is None else v.length for v in problem.vessels])
+            drafts = np.array([np.nan if v.draft is None else v.draft for v in problem.vessels])
+
+            result = solve_berth_scheduling_columnar(arrival_times, processing_times, 4, 1000, vessel_ids,
+                                                     berths=problem.berths, lengths=lengths, drafts=drafts)
+
+            assert schedule_from_columns(vessel_ids, arrival_times, processing_times, result) == expected["schedule"]
+            _assert_respects_berths(problem, expected)
+
+    def test_exact_and_local_search_respect_berths(self):
+        """Improved schedules should stay feasible and never be worse than the heuristic."""
+        rng = random.Random(3)
+        for _ in range(10):
+            problem = self._random_problem(rng, 8, 3)
+            heuristic = solve_berth_scheduling(problem)
+
+            exact = solve_berth_scheduling_exact(problem, time_limit=2.0)
+            improved = improve_schedule(problem, heuristic, time_limit=0.05)
+
+            _assert_respects_berths(problem, exact)
+            _assert_respects_berths(problem, improved)
+            assert exact["makespan"] <= improved["makespan"] <= heuristic["makespan"]
+
+    def test_exact_uses_only_compatible_berths(self):
+        """Without closures the exact solver should match brute force over compatible assignments."""
+        problem = BerthSchedulingProblem(
+            vessels=[
+                VesselData(vessel_id="A", arrival_time=0, processing_time=6, length=300),
+                VesselData(vessel_id="B", arrival_time=0, processing_time=2),
+                VesselData(vessel_id="C", arrival_time=1, processing_time=5, length=300),
+                VesselData(vessel_id="D", arrival_time=2, processing_time=2),
+            ],
+            planning_horizon=72,
+            num_berths=3,
+            berths=[BerthData(max_length=400), BerthData(max_length=200), BerthData(max_length=200)]
+        )
+
+        result = solve_berth_scheduling_exact(problem, time_limit=5.0)
+
+        assert result["status"] == "optimal"
+        assert result["makespan"] == 11
+        assert {result["schedule"][v]["berth"] for v in ("A", "C")} == {0}